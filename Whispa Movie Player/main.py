@@ -1,8 +1,17 @@
+import json
 import os
+import sys
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MOVIES_PATH = os.path.join(BASE_DIR, "movies.json")
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from backend.catalog_client import fetch_items
+from backend.sessions import verify_token
+from backend.sync_client import SyncedCollection
 
 from router import Router
 from ui_movies import MoviesFrame
@@ -10,8 +19,6 @@ from ui_mylist import MyListFrame
 from ui_preview import PreviewFrame
 from ui_player import PlayerFrame
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
 # Theme
 PRIMARY = "#b8a1f2"
 WINDOW_BG = "#c5b3f0"
@@ -36,8 +43,10 @@ FILENAME_TITLE_MAP = {
 }
 
 class App(tk.Tk):
-    def __init__(self):
+    def __init__(self, session_token=None):
         super().__init__()
+        # Signed token from the Whispa launcher; None when run standalone
+        self.session_token = session_token
         self.title("Whispa Movie Player")
         self.config(bg=WINDOW_BG)
         self.minsize(1440, 900)
@@ -61,7 +70,10 @@ class App(tk.Tk):
         self.container = tk.Frame(self, bg=WINDOW_BG)
         self.container.pack(side="top", fill="both", expand=True)
 
-        self.state = {"saved": [], "movies": []}
+        # My List persists locally per user and syncs with the backend in the background
+        saved = SyncedCollection("mylist", session_token, verify_token(session_token), item_type=int)
+        saved.sync_in_background()
+        self.state = {"saved": saved, "movies": []}
 
         self.load_movies()
 
@@ -155,140 +167,13 @@ class App(tk.Tk):
 
     #load movies
     def load_movies(self):
-        self.state["movies"] = [
-                    {
-                        "id": 1,
-                        "title": "Tangled",
-                        "poster": "Whispa Movie Player/assets/posters/movie1.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie1.mp4",
-                        "description": "Beautiful princess Rapunzel has been locked away in a tower since she was captured as a baby by an old hag. Her magical long blonde hair has the power to provide eternal youth, and the evil Gothel uses this power to keep her young. At the age of 18, Rapunzel becomes curious about the outside world, and when a prince uses her tower as a refuge, she asks him to help her escape.",
-                        "cast": "Mandy Moore, Zachary Levi",
-                        "genre": "Animation, Adventure, Family",
-                        "duration": "1h 40m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 2,
-                        "title": "Brave",
-                        "poster": "Whispa Movie Player/assets/posters/movie2.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie2.mp4",
-                        "description": "Merida (Kelly Macdonald), the impetuous but courageous daughter of Scottish King Fergus (Billy Connolly) and Queen Elinor (Emma Thompson), is a skilled archer who wants to carve out her own path in life. Her defiance of an age-old tradition angers the Highland lords and leads to chaos in the kingdom. Merida seeks help from an eccentric witch (Julie Walters), who grants her an ill-fated wish. Now, Merida must discover the true meaning of courage and undo a beastly curse before it's too late.",
-                        "cast": "Kelly Macdonald, Billy Connolly",
-                        "genre": "Animation, Adventure, Family",
-                        "duration": "1h 33m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 3,
-                        "title": "Mulan",
-                        "poster": "Whispa Movie Player/assets/posters/movie3.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie3.mp4",
-                        "description": "To keep her ailing father from serving in the Imperial Army, a fearless young woman disguises herself as a man and battles northern invaders in China.",
-                        "cast": "Ming-Na Wen, Eddie Murphy",
-                        "genre": "Animation, Action, Adventure",
-                        "duration": "1h 28m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 4,
-                        "title": "Beauty and the Beast",
-                        "poster": "Whispa Movie Player/assets/posters/movie4.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie4.mp4",
-                        "description": "An arrogant prince is cursed to live as a terrifying beast until he finds true love. Strangely, his chance comes when he captures an unwary clockmaker, whose place is then taken by his bold and beautiful daughter Belle. Helped by the Beast's similarly enchanted servants, including a clock, a teapot and a candelabra, Belle begins to see the sensitive soul behind the fearsome facade. But as time runs out, it soon becomes obvious that Belle's cocky suitor Gaston is the real beast of the piece.",
-                        "cast": "Paige O’Hara, Robby Benson",
-                        "genre": "Animation, Family, Fantasy",
-                        "duration": "1h 24m",
-                        "age": "G"
-                    },
-                    {
-                        "id": 5,
-                        "title": "Moana",
-                        "poster": "Whispa Movie Player/assets/posters/movie5.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie5.mp4",
-                        "description": "An adventurous teenager sails out on a daring mission to save her people. During her journey, Moana meets the once-mighty demigod Maui, who guides her in her quest to become a master way-finder. Together they sail across the open ocean on an action-packed voyage, encountering enormous monsters and impossible odds. Along the way, Moana fulfills the ancient quest of her ancestors and discovers the one thing she always sought: her own identity.",
-                        "cast": "Auli'i Cravalho, Dwayne Johnson",
-                        "genre": "Animation, Adventure, Comedy",
-                        "duration": "1h 47m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 6,
-                        "title": "The Little Mermaid",
-                        "poster": "Whispa Movie Player/assets/posters/movie6.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie6.mp4",
-                        "description": "In Disney's beguiling animated romp, rebellious 16-year-old mermaid Ariel (Ron Clements) is fascinated with life on land. On one of her visits to the surface, which are forbidden by her controlling father, King Triton, she falls for a human prince. Determined to be with her new love, Ariel makes a dangerous deal with the sea witch Ursula (John Musker) to become human for three days. But when plans go awry for the star-crossed lovers, the king must make the ultimate sacrifice for his daughter.",
-                        "cast": "Jodi Benson, Samuel E. Wright",
-                        "genre": "Animation, Family, Fantasy",
-                        "duration": "1h 23m",
-                        "age": "G"
-                    },
-                    {
-                        "id": 7,
-                        "title": "The Lion King",
-                        "poster": "Whispa Movie Player/assets/posters/movie7.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie7.mp4",
-                        "description": "Simba idolizes his father, King Mufasa, and takes to heart his own royal destiny on the plains of Africa. But not everyone in the kingdom celebrates the new cub's arrival. Scar, Mufasa's brother -- and former heir to the throne -- has plans of his own. The battle for Pride Rock is soon ravaged with betrayal, tragedy and drama, ultimately resulting in Simba's exile. Now, with help from a curious pair of newfound friends, Simba must figure out how to grow up and take back what is rightfully his.",
-                        "cast": "Matthew Broderick, James Earl Jones",
-                        "genre": "Animation, Adventure, Drama",
-                        "duration": "1h 28m",
-                        "age": "G"
-                    },
-                    {
-                        "id": 8,
-                        "title": "Aladdin",
-                        "poster": "Whispa Movie Player/assets/posters/movie8.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie8.mp4",
-                        "description": "Aladdin is a lovable street urchin who meets Princess Jasmine, the beautiful daughter of the sultan of Agrabah. While visiting her exotic palace, Aladdin stumbles upon a magic oil lamp that unleashes a powerful, wisecracking, larger-than-life genie. As Aladdin and the genie start to become friends, they must soon embark on a dangerous mission to stop the evil sorcerer Jafar from overthrowing young Jasmine's kingdom.",
-                        "cast": "Scott Weinger, Robin Williams",
-                        "genre": "Animation, Adventure, Comedy",
-                        "duration": "1h 28m",
-                        "age": "G"
-                    },
-                    {
-                        "id": 9,
-                        "title": "Encanto",
-                        "poster": "Whispa Movie Player/assets/posters/movie9.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie9.mp4",
-                        "description": "Encanto tells the tale of an extraordinary family, the Madrigals, who live hidden in the mountains of Colombia, in a magical house, in a vibrant town.",
-                        "cast": "Stephanie Beatriz, María Cecilia Botero",
-                        "genre": "Animation, Adventure, Comedy",
-                        "duration": "1h 39m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 10,
-                        "title": "Frozen",
-                        "poster": "Whispa Movie Player/assets/posters/movie10.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie10.mp4",
-                        "description": "When their kingdom becomes trapped in perpetual winter, fearless Anna (Kristen Bell) joins forces with mountaineer Kristoff (Jonathan Groff) and his reindeer sidekick to find Anna's sister, Snow Queen Elsa (Idina Menzel), and break her icy spell. Although their epic journey leads them to encounters with mystical trolls, a comedic snowman (Josh Gad), harsh conditions, and magic at every turn, Anna and Kristoff bravely push onward in a race to save their kingdom from winter's cold grip.",
-                        "cast": "Kristen Bell, Idina Menzel",
-                        "genre": "Animation, Adventure, Comedy",
-                        "duration": "1h 42m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 11,
-                        "title": "Coco",
-                        "poster": "Whispa Movie Player/assets/posters/movie11.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie11.mp4",
-                        "description": "Despite his family's generations-old ban on music, young Miguel dreams of becoming an accomplished musician like his idol Ernesto de la Cruz. Desperate to prove his talent, Miguel finds himself in the stunning and colorful Land of the Dead. After meeting a charming trickster named Héctor, the two new friends embark on an extraordinary journey to unlock the real story behind Miguel's family history.",
-                        "cast": "Anthony Gonzalez, Gael García Bernal",
-                        "genre": "Animation, Adventure, Family",
-                        "duration": "1h 45m",
-                        "age": "PG"
-                    },
-                    {
-                        "id": 12,
-                        "title": "Inside Out",
-                        "poster": "Whispa Movie Player/assets/posters/movie12.jpg",
-                        "trailer": "Whispa Movie Player/assets/trailers/movie12.mp4",
-                        "description": "Riley (Kaitlyn Dias) is a happy, hockey-loving 11-year-old Midwestern girl, but her world turns upside-down when she and her parents move to San Francisco. Riley's emotions -- led by Joy (Amy Poehler) -- try to guide her through this difficult, life-changing event. However, the stress of the move brings Sadness (Phyllis Smith) to the forefront. When Joy and Sadness are inadvertently swept into the far reaches of Riley's mind, the only emotions left in Headquarters are Anger, Fear and Disgust.",
-                        "cast": "Amy Poehler, Phyllis Smith",
-                        "genre": "Animation, Adventure, Comedy",
-                        "duration": "1h 35m",
-                        "age": "PG"
-                    }
-                ]
+        # From the backend's /catalog/movies, revalidated with ETags; offline,
+        # the copy fetched last time, or else the movies.json it serves
+        movies = fetch_items("/catalog/movies", "movies")
+        if movies is None:
+            with open(MOVIES_PATH, encoding="utf-8") as f:
+                movies = json.load(f)
+        self.state["movies"] = movies
 
     # search function
     def perform_search(self):
@@ -308,10 +193,23 @@ class App(tk.Tk):
                 matches = [m for m in scored if score(m) > 0]
         self.router.show("movies", params={"filter": matches})
 
+    # session check, done locally against the signed token (no database)
+    def session_valid(self):
+        if self.session_token is None:
+            return True
+        if verify_token(self.session_token) is None:
+            messagebox.showerror("Session expired", "Your Whispa session has expired. Please log in again.")
+            return False
+        return True
+
     #log out/back to home
     def back_to_home(app):
         app.destroy()
 
 if __name__ == "__main__":
-    app = App()
+    token = sys.argv[1] if len(sys.argv) > 1 else None
+    if token is not None and verify_token(token) is None:
+        messagebox.showerror("Session expired", "Your Whispa session has expired. Please log in again.")
+        sys.exit(1)
+    app = App(token)
     app.mainloop()
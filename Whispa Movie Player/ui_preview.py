@@ -163,11 +163,12 @@ class PreviewFrame(tk.Frame):
             messagebox.showinfo("No trailer", "No trailer file found for this movie.")
 
     def add_to_list(self):
-        if not self.movie:
+        if not self.movie or not self.app.session_valid():
             return
         sid = self.movie["id"]
         if sid not in self.app.state["saved"]:
-            self.app.state["saved"].append(sid)
+            self.app.state["saved"].add(sid)
+            self.app.state["saved"].sync_in_background()
             messagebox.showinfo("Added", f"\"{self.movie['title']}\" added to My List.")
         else:
             messagebox.showinfo("Already saved", f"\"{self.movie['title']}\" is already in My List.")
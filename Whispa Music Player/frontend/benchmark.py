@@ -0,0 +1,728 @@
+# frontend/benchmark.py
+# Benchmarks for the music player's playback path, run against the bundled
+# music/*.mp3. Run from the Whispa folder, e.g.:
+#   python "Whispa Music Player/frontend/benchmark.py" duration
+# No sound card needed: SDL's dummy audio driver is used unless one is set.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory isn't reported
+    resource = None
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keeps the children's stdout pure JSON
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MUSIC_FOLDER = os.path.join(BASE_DIR, "..", "music")
+COVER_FOLDER = os.path.join(BASE_DIR, "..", "covers")
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.dirname(os.path.dirname(BASE_DIR)))
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def bundled_tracks():
+    return sorted(os.path.join(MUSIC_FOLDER, f) for f in os.listdir(MUSIC_FOLDER) if f.endswith(".mp3"))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    return (f"p50 {percentile(latencies, 50) * 1000:8.2f} ms  p95 {percentile(latencies, 95) * 1000:8.2f} ms"
+            f"  max {max(latencies) * 1000:8.2f} ms")
+
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # bytes on macOS, KiB elsewhere
+
+
+def run_child(benchmark, args, *extra):
+    # Runs one case in a fresh interpreter, so peak memory belongs to that case alone
+    cmd = [sys.executable, os.path.abspath(__file__), benchmark, "--child", "--rounds", str(args.rounds), *extra]
+    return json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+DURATION_METHODS = ("sound", "probe", "probe-cached")
+
+
+def _measure_switches(method, rounds):
+    # What play_song does on a track change, with the length computed by `method`
+    import pygame
+    import mp3info
+    pygame.mixer.init()
+    tracks = bundled_tracks()
+    if method == "probe-cached":
+        for path in tracks:
+            mp3info.probe(path)
+    baseline = peak_rss_mib()
+    latencies, lengths = [], {}
+    for _ in range(rounds):
+        for path in tracks:
+            start = time.perf_counter()
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.play()
+            if method == "sound":
+                length = pygame.mixer.Sound(path).get_length()
+            else:
+                if method == "probe":
+                    mp3info._probe_cache.clear()
+                length = mp3info.duration(path)
+            latencies.append(time.perf_counter() - start)
+            lengths[os.path.basename(path)] = length
+    pygame.mixer.music.stop()
+    return {"latencies": latencies, "lengths": lengths, "baseline": baseline, "peak": peak_rss_mib()}
+
+
+def bench_duration(args):
+    if args.child:
+        print(json.dumps(_measure_switches(args.method, args.rounds)))
+        return
+
+    print(f"duration: {len(bundled_tracks())} tracks x {args.rounds} rounds, load + play + length per switch")
+    results = {}
+    for method in DURATION_METHODS:
+        result = results[method] = run_child("duration", args, "--method", method)
+        memory = ""
+        if result["peak"] is not None:
+            memory = f"  peak RSS {result['peak']:7.1f} MiB (+{result['peak'] - result['baseline']:.1f} MiB)"
+        print(f"  {method:<13} {latency_summary(result['latencies'])}{memory}")
+
+    drift = max(abs(results["sound"]["lengths"][name] - length)
+                for name, length in results["probe"]["lengths"].items())
+    print(f"  largest difference between decoded and probed length: {drift * 1000:.1f} ms")
+
+
+def _cover_sources(edge):
+    # The bundled covers, or copies upscaled to edge x edge JPEGs (typical embedded album art)
+    from PIL import Image
+    sources = sorted(os.path.join(COVER_FOLDER, f) for f in os.listdir(COVER_FOLDER) if f.endswith(".png"))
+    if not edge:
+        return sources
+    tmpdir = tempfile.mkdtemp(prefix="whispa-covers-")
+    scaled = []
+    for source in sources:
+        path = os.path.join(tmpdir, os.path.splitext(os.path.basename(source))[0] + ".jpg")
+        Image.open(source).convert("RGB").resize((edge, edge), Image.BICUBIC).save(path, quality=90)
+        scaled.append(path)
+    return scaled
+
+
+def bench_covers(args):
+    # Per song change: the old open + LANCZOS resize, a disk thumbnail, and an
+    # LRU hit. PhotoImage creation is included when a display is available.
+    os.environ["WHISPA_THUMB_DIR"] = tempfile.mkdtemp(prefix="whispa-thumbs-")
+    import tkinter as tk
+    from PIL import Image, ImageTk
+    import covers
+
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        to_photo = ImageTk.PhotoImage
+    except tk.TclError:
+        root, to_photo = None, lambda img: img
+        print("covers: no display, PhotoImage creation not timed")
+
+    def resize(source):
+        return to_photo(Image.open(source).resize(covers.THUMB_SIZE, Image.LANCZOS))
+
+    def thumbnail(source):
+        return to_photo(covers.load_thumbnail(source))
+
+    for edge in (0, args.cover_size):
+        sources = _cover_sources(edge)
+        for source in sources:
+            covers.thumbnail_path(source)  # built once, as on the first launch that shows the cover
+        cached = {source: thumbnail(source) for source in sources}
+        label = "bundled covers" if not edge else f"{edge}px JPEG covers"
+        print(f"covers: {label}, {len(sources)} images x {args.rounds} rounds")
+        for case, load in (("open + resize", resize), ("disk thumbnail", thumbnail), ("LRU hit", cached.get)):
+            latencies = []
+            for _ in range(args.rounds):
+                for source in sources:
+                    start = time.perf_counter()
+                    load(source)
+                    latencies.append(time.perf_counter() - start)
+            print(f"  {case:<15} {latency_summary(latencies)}")
+    if root is not None:
+        root.destroy()
+
+
+def _clip(source, start, seconds, destination):
+    # `seconds` of a track from `start` on, as a frame-aligned MP3 of its own
+    import mp3info
+    info = mp3info.probe(source)
+    frame_seconds = info.header.samples / info.header.sample_rate
+    skip, count = int(start / frame_seconds), int(seconds / frame_seconds)
+    with open(source, "rb") as f:
+        frames = list(mp3info.iter_frames(f, info.audio_start, info.audio_end, skip + count))[skip:]
+        first, last = frames[0][0], frames[-1][0] + frames[-1][1].frame_size
+        f.seek(first)
+        data = f.read(last - first)
+    with open(destination, "wb") as f:
+        f.write(data)
+    return destination
+
+
+def _play_chain(clips, method, poll=0.1):
+    # Plays the clips back to back the way the player does with `method`,
+    # reacting every `poll` seconds like update_slider
+    import pygame
+    import mp3info
+    music = pygame.mixer.music
+    music.load(clips[0])
+    music.play()
+    current = 0
+    if method == "queue":
+        music.queue(clips[1])
+    last = 0
+    while True:
+        time.sleep(poll)
+        pos = music.get_pos()
+        if method == "queue":
+            if pos < last - QUEUE_SWITCH_DROP_MS:
+                current += 1
+                if current + 1 < len(clips):
+                    music.queue(clips[current + 1])
+            if not music.get_busy():
+                return
+        elif pos / 1000 >= mp3info.duration(clips[current]) - 0.1 or not music.get_busy():
+            # the check update_slider used to make before next_song()
+            current += 1
+            music.stop()
+            if current == len(clips):
+                return
+            music.load(clips[current])
+            music.play()
+        last = pos
+
+
+def _silences(samples, rate, min_seconds=0.002):
+    # Digital silence (every channel exactly 0) in 16-bit stereo PCM:
+    # (leading, trailing, runs in between longer than min_seconds), in seconds
+    import numpy as np
+    sound = np.flatnonzero(np.abs(samples.reshape(-1, 2)).max(axis=1) > 0)
+    total = len(samples) // 2
+    if not len(sound):
+        return total / rate, 0.0, []
+    steps = np.diff(sound)
+    runs = (steps[steps > min_seconds * rate] - 1) / rate
+    return sound[0] / rate, (total - 1 - sound[-1]) / rate, list(runs)
+
+
+QUEUE_SWITCH_DROP_MS = 500  # get_pos() jitters back by a buffer or so; only a bigger drop is a new track
+
+
+def bench_gap(args):
+    # SDL's disk driver writes what would have gone to the sound card to a
+    # file, in real time. Silence at the transitions in that file, minus the
+    # silence the clips decode to on their own (their first frame is silent,
+    # being cut from mid-song), is the gap the player adds.
+    import numpy as np
+    tmpdir = tempfile.mkdtemp(prefix="whispa-gap-")
+    tracks = bundled_tracks()[:args.clips]
+    clips = [_clip(path, args.clip_start, args.clip_seconds, os.path.join(tmpdir, f"{i}.mp3"))
+             for i, path in enumerate(tracks)]
+    transitions = len(clips) - 1
+    rate = 44100
+    os.environ["SDL_AUDIODRIVER"] = "disk"
+    import pygame
+
+    print(f"gap: {transitions} transitions between {args.clip_seconds:g}s clips of the bundled tracks")
+    for method in ("stop/load/play", "queue"):
+        output = os.path.join(tmpdir, method.replace("/", "-") + ".raw")
+        os.environ["SDL_DISKAUDIOFILE"] = output
+        pygame.mixer.init(frequency=rate, size=-16, channels=2)
+        decoded = [np.frombuffer(pygame.mixer.Sound(clip).get_raw(), dtype=np.int16) for clip in clips]
+        _play_chain(clips, method)
+        pygame.mixer.quit()
+
+        own = [_silences(samples, rate) for samples in decoded]
+        audio = sum(len(samples) / 2 / rate - lead - trail - sum(runs)
+                    for samples, (lead, trail, runs) in zip(decoded, own))
+        played = np.fromfile(output, dtype=np.int16)
+        lead, trail, runs = _silences(played, rate)
+        expected = sum(own[i][1] + own[i + 1][0] for i in range(transitions)) + sum(sum(o[2]) for o in own)
+        added = sum(runs) - expected
+        cut = audio - (len(played) / 2 / rate - lead - trail - sum(runs))
+        print(f"  {method:<15} {added / transitions * 1000:6.1f} ms silence added"
+              f"  {cut / transitions * 1000:6.1f} ms audio cut off per transition")
+
+
+def _long_track(minutes, destination):
+    # The bundled tracks' audio frames back to back (no tags, no Info frames)
+    # until the file runs `minutes` long
+    import mp3info
+    seconds = 0.0
+    with open(destination, "wb") as out:
+        while seconds < minutes * 60:
+            for path in bundled_tracks():
+                info = mp3info.probe(path)
+                with open(path, "rb") as f:
+                    f.seek(info.audio_start)
+                    out.write(f.read(info.audio_end - info.audio_start))
+                seconds += info.duration
+    return destination
+
+
+def bench_seek(args):
+    # One slider release at the start, middle and end of a long track. The
+    # bundled tracks are all CBR; the frame scan a VBR file needs for its
+    # exact table is timed separately.
+    import pygame
+    import mp3info
+    path = _long_track(args.minutes, os.path.join(tempfile.mkdtemp(prefix="whispa-seek-"), "long.mp3"))
+    info = mp3info.probe(path)
+    pygame.mixer.init()
+    music = pygame.mixer.music
+
+    def reload(seconds):
+        music.stop()
+        music.load(path)
+        music.play(start=seconds)
+
+    def set_pos(seconds):
+        music.set_pos(seconds)
+
+    def seek_table(seconds):
+        _, offset = mp3info.seek_position(path, seconds, scan=False)
+        music.load(mp3info.FileView(path, offset), "mp3")
+        music.play()
+
+    print(f"seek: {info.duration / 60:.0f} min file ({os.path.getsize(path) / 2 ** 20:.0f} MiB, {info.source}),"
+          f" {args.rounds} seeks per position")
+    positions = (("start", 1.0), ("middle", info.duration / 2), ("end", info.duration - 5))
+    for case, seek in (("stop/load/play", reload), ("set_pos", set_pos), ("seek table", seek_table)):
+        row = []
+        for label, seconds in positions:
+            latencies = []
+            for _ in range(args.rounds):
+                # From the top each time: set_pos only scans from where playback is
+                music.load(path)
+                music.play()
+                start = time.perf_counter()
+                seek(seconds)
+                latencies.append(time.perf_counter() - start)
+            row.append(f"{label} {statistics.median(latencies) * 1000:7.2f} ms")
+        print(f"  {case:<15} " + "  ".join(row))
+    music.stop()
+
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        table = mp3info._table_from_scan(f, info)
+    print(f"  frame scan for an exact table: {(time.perf_counter() - start) * 1000:.0f} ms,"
+          f" {len(table.times)} entries")
+
+
+def _thread_wakeups():
+    # Times this thread went to sleep waiting and was woken again (Linux only)
+    try:
+        with open("/proc/thread-self/status") as f:
+            for line in f:
+                if line.startswith("voluntary_ctxt_switches:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def bench_wakeups(args):
+    # Main-thread wakeups while a song plays, while minimized and while paused:
+    # the old fixed 100 ms update_slider loop against the ticker. Runs on a
+    # plain Tcl interpreter, whose event loop is Tk's minus the windows;
+    # mainloop() needs a window, so its loop is spelled out.
+    import tkinter as tk
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    import mp3info
+    from ticker import PlaybackTicker
+    pygame.mixer.init()
+    pygame.display.init()
+    music = pygame.mixer.music
+    path = bundled_tracks()[0]
+    length = mp3info.duration(path)
+    root = tk.Tcl()
+    ticks = [0]
+
+    def position():
+        return music.get_pos() / 1000
+
+    def poll():
+        # what update_slider did on every tick before
+        root.after(100, poll)
+        ticks[0] += 1
+        if music.get_busy():
+            position()
+
+    def tick():
+        ticks[0] += 1
+        position()
+
+    ticker = PlaybackTicker(root, lambda: length, lambda: args.slider_width, tick)
+    print(f"wakeups: {os.path.basename(path)} ({length:.0f} s) on a {args.slider_width} px slider,"
+          f" {args.seconds:g} s per state")
+    for case in ("100 ms poll", "ticker"):
+        if case == "100 ms poll":
+            root.after(100, poll)
+        row = []
+        for state in ("playing", "minimized", "paused"):
+            music.load(path)
+            music.play()
+            if state == "paused":
+                music.pause()
+            if case == "ticker":
+                ticker.set_visible(state != "minimized")
+                ticker.start() if state != "paused" else ticker.stop()
+            ticks[0], wakeups, done = 0, _thread_wakeups(), []
+            root.after(int(args.seconds * 1000), done.append, True)
+            while not done:
+                root.dooneevent()
+            rate = f"{ticks[0] / args.seconds:5.1f} callbacks/s"
+            if wakeups is not None:
+                # minus the one that ends the measurement
+                rate += f" {(_thread_wakeups() - wakeups - 1) / args.seconds:5.1f} wakeups/s"
+            row.append(f"{state} {rate}")
+        ticker.stop()
+        for after_id in root.tk.call("after", "info"):
+            root.after_cancel(after_id)
+        print(f"  {case:<12} " + "  ".join(row))
+    music.stop()
+
+
+ENGINE_COMMANDS = (("ping",), ("status",), ("pause",), ("resume",), ("seek", 60.0))
+
+
+def _engine_round_trips(calls):
+    # Runs in a child whose environment points engine_client at a fresh engine
+    from engine_client import EngineClient
+    client = EngineClient().connect()
+    client.call("load", bundled_tracks())
+    client.call("play", 0)
+    latencies = {}
+    for command in ENGINE_COMMANDS:
+        times = latencies[command[0]] = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            client.call(*command)
+            times.append(time.perf_counter() - start)
+    robust = _engine_bad_clients(client)
+    client.call("shutdown")
+    client.close()
+    return {"latencies": latencies, "robust": robust}
+
+
+def _engine_bad_clients(client):
+    # A connection reset before sending anything, and one sending garbage or
+    # arguments out of range, must neither crash the engine nor run anything
+    # for another client
+    import socket
+    import struct
+    from engine_client import decode_lines, open_connection
+    before = client.call("status")["index"]
+    sock = open_connection()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))  # close() resets, on TCP
+    sock.close()
+    garbage = [b"not json", b"[1]", b'"next"', b"{}", b"[1, 2]",
+               b'[7, "seek", Infinity]', b'[8, "play", 1e400]', b'[9, "append", -1e400]']
+    sock = open_connection()
+    sock.sendall(b"\n".join(garbage) + b"\n")
+    replies, buffer = [], b""
+    sock.settimeout(5)
+    while len(replies) < len(garbage):
+        messages, buffer = decode_lines(buffer + sock.recv(65536))
+        replies += messages
+    sock.close()
+    errors = sum(1 for reply in replies if reply[1] is False)
+    return {"engine alive": client.call("ping") is None, "error reply per bad line": errors == len(garbage),
+            "track unchanged": client.call("status")["index"] == before}
+
+
+def bench_engine(args):
+    # Command round-trips to the playback engine, per transport: send, the
+    # engine runs the command, the reply is read back
+    if args.child:
+        print(json.dumps(_engine_round_trips(args.calls)))
+        return
+    import socket
+    transports = ("unix", "tcp") if hasattr(socket, "AF_UNIX") else ("tcp",)
+    print(f"engine: {args.calls} calls per command")
+    for transport in transports:
+        state_dir = tempfile.mkdtemp(prefix="whispa-engine-")
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        env = dict(os.environ, WHISPA_STATE_DIR=state_dir, WHISPA_ENGINE_TRANSPORT=transport,
+                   WHISPA_ENGINE_SOCKET=os.path.join(state_dir, "engine.sock"), WHISPA_ENGINE_PORT=str(port))
+        cmd = [sys.executable, os.path.abspath(__file__), "engine", "--child", "--calls", str(args.calls)]
+        result = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True, env=env).stdout)
+        print(f"  {transport}")
+        for command, latencies in result["latencies"].items():
+            print(f"    {command:<8} {latency_summary(latencies)}")
+        checks = result["robust"]
+        print("    bad clients: " + ", ".join(f"{check} {'yes' if ok else 'NO'}" for check, ok in checks.items()))
+        if not all(checks.values()):
+            sys.exit(1)
+
+
+def _synthetic_library(count, seed=7):
+    # (file name, (title, artist, album)) for `count` made-up tracks: words
+    # from the bundled tags plus invented ones, artists and albums shared
+    # between tracks the way a real collection has them
+    import random
+    import tags
+    rng = random.Random(seed)
+    vocabulary = set()
+    for path in bundled_tracks():
+        for value in tags.read_tags(path).values():
+            if isinstance(value, str):
+                vocabulary.update(value.split())
+    # Invented words from consonant-vowel(-consonant) syllables, so they share
+    # trigrams about as often as real ones do
+    syllables = [c + v + e for c in "bcdfghjklmnprstvwz" for v in "aeiouy" for e in ["", *"lmnrst"]]
+    while len(vocabulary) < 20000:
+        vocabulary.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize())
+    vocabulary = sorted(vocabulary)
+
+    def phrase(low, high):
+        return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(low, high)))
+    artists = [phrase(1, 3) for _ in range(count // 20 + 1)]
+    albums = [phrase(1, 4) for _ in range(count // 10 + 1)]
+    return [(f"{i:06d}.mp3", (phrase(1, 5), rng.choice(artists), rng.choice(albums))) for i in range(count)]
+
+
+SEARCH_QUERIES = ("beauty and the", "menzel", "wh ne wo", "let it go", "s", "ma ro")
+
+
+def bench_search(args):
+    # Search-as-you-type: every prefix of each query is a keystroke. Compared
+    # with a linear scan over the same normalized text.
+    from search import SearchIndex, normalize
+    entries = _synthetic_library(args.tracks)
+    baseline = peak_rss_mib()
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.sync(entries)
+    build = time.perf_counter() - start
+    memory = "" if baseline is None else f", +{peak_rss_mib() - baseline:.0f} MiB peak RSS"
+    print(f"search: {args.tracks} tracks, index built in {build * 1000:.0f} ms{memory}")
+
+    texts = [(name, normalize(" ".join(fields))) for name, fields in entries]
+
+    def scan(query):
+        words = normalize(query).split()
+        return [name for name, text in texts if all(word in text for word in words)]
+
+    keystrokes = [query[:n] for query in SEARCH_QUERIES for n in range(1, len(query) + 1)]
+    for case, search in (("linear scan", scan), ("index", index.search)):
+        latencies = []
+        for _ in range(args.rounds):
+            for query in keystrokes:
+                start = time.perf_counter()
+                search(query)
+                latencies.append(time.perf_counter() - start)
+        print(f"  {case:<14} {latency_summary(latencies)}  ({len(keystrokes)} keystrokes)")
+
+    latencies = []
+    for typo in ("beuty", "alladin", "menzle", "wold"):
+        start = time.perf_counter()
+        index.search(typo)
+        latencies.append(time.perf_counter() - start)
+    print(f"  {'typo (fuzzy)':<14} {latency_summary(latencies)}")
+
+    # A library rescan that found 100 tracks added, 100 removed and 100 retagged
+    changed = entries[100:]
+    changed[:100] = [(name, (fields[0] + " remix", fields[1], fields[2])) for name, fields in changed[:100]]
+    changed += [(f"new-{i}.mp3", fields) for i, (_, fields) in enumerate(entries[-100:])]
+    for case, update in (("300 changed", changed), ("unchanged", changed)):
+        start = time.perf_counter()
+        count = index.sync(update)
+        print(f"  sync, {case:<11} {(time.perf_counter() - start) * 1000:6.1f} ms ({count} re-indexed)")
+
+
+def _time_ops(operation, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_queue(args):
+    # Play queue operations on a library of --entries songs, and a check that a
+    # shuffle plays every song exactly once before repeating
+    import random
+    from play_queue import PlayQueue
+    size = args.entries
+    ops = min(size, 100000)
+    print(f"queue: {size} songs, {ops} operations each")
+
+    start = time.perf_counter()
+    songs = list(range(size))
+    random.shuffle(songs)
+    print(f"  {'full reshuffle':<14} {(time.perf_counter() - start) * 1000:8.2f} ms  (what each skip would cost reshuffling)")
+
+    start = time.perf_counter()
+    queue = PlayQueue(size, shuffle=True, repeat="off")
+    print(f"  {'new queue':<14} {(time.perf_counter() - start) * 1000:8.2f} ms")
+    rng = random.Random(1)
+    cases = (("next", queue.next), ("peek", queue.peek), ("prev", queue.prev),
+             ("play", lambda: queue.play(rng.randrange(size))),
+             ("play_next", lambda: queue.play_next(rng.randrange(size))),
+             ("append", lambda: queue.append(rng.randrange(size))),
+             ("shuffle on/off", lambda: queue.set_shuffle(not queue.shuffle)))
+    for case, operation in cases:
+        latencies = _time_ops(operation, ops)
+        print(f"  {case:<14} mean {statistics.mean(latencies) * 1e6:6.2f} us  p99 {percentile(latencies, 99) * 1e6:6.2f} us"
+              f"  max {max(latencies) * 1e6:8.2f} us")
+    queue.up_next.clear()
+
+    start = time.perf_counter()
+    saved = json.dumps(queue.to_dict())
+    restored = PlayQueue.from_dict(json.loads(saved))
+    print(f"  {'save + restore':<14} {(time.perf_counter() - start) * 1000:8.2f} ms"
+          f"  ({len(saved) / 1024:.0f} KiB after {len(cases) * ops} operations)")
+    same = [restored.next() for _ in range(100)] == [queue.next() for _ in range(100)]
+
+    # A fresh shuffle, played to the end with repeat off
+    queue = PlayQueue(size, shuffle=True, repeat="off")
+    start = time.perf_counter()
+    played = []
+    song = queue.next(auto=True)
+    while song is not None:
+        played.append(song)
+        song = queue.next(auto=True)
+    elapsed = time.perf_counter() - start
+    complete = len(played) == size and len(set(played)) == size
+
+    # peek() and peek_prev() name the songs Next and Prev go to: the player
+    # prefetches their covers
+    queue = PlayQueue(size, shuffle=True)
+    foreseen = True
+    for _ in range(ops):
+        move = rng.randrange(6)
+        if move == 0:
+            foreseen &= queue.peek(auto=False) == queue.next()
+        elif move == 1:
+            foreseen &= queue.peek_prev() == queue.prev()
+        elif move == 2:
+            queue.play(rng.randrange(size))
+        elif move == 3:
+            queue.play_next(rng.randrange(size))
+        elif move == 4:
+            queue.set_shuffle(not queue.shuffle)
+        else:
+            queue.set_repeat(rng.choice(("off", "all", "one")))
+    print(f"  {'full shuffle':<14} {elapsed * 1000:8.0f} ms  every song once: {'yes' if complete else 'NO'},"
+          f" restored queue continues the same: {'yes' if same else 'NO'},"
+          f" peeks match moves: {'yes' if foreseen else 'NO'}")
+    if not complete or not same or not foreseen:
+        sys.exit(1)
+
+
+def bench_loudness(args):
+    # Loudness analysis of the bundled tracks: decoding and measuring on one
+    # core, then the worker pool the engine uses, then the FFT filtering
+    # checked against the filters run sample by sample
+    import numpy as np
+    import pygame
+    import loudness
+    tracks = bundled_tracks()
+    pygame.mixer.init(loudness.ANALYSIS_RATE, -16, 2)
+    decode = analysis = audio = 0.0
+    for path in tracks:
+        start = time.process_time()
+        samples = np.frombuffer(pygame.mixer.Sound(path).get_raw(), dtype=np.int16).reshape(-1, 2)
+        middle = time.process_time()
+        loudness.measure(samples, loudness.ANALYSIS_RATE)
+        decode += middle - start
+        analysis += time.process_time() - middle
+        audio += len(samples) / loudness.ANALYSIS_RATE
+    cpu = decode + analysis
+    print(f"loudness: {len(tracks)} tracks, {audio / 60:.1f} min of audio")
+    print(f"  one core       {len(tracks) / cpu * 60:6.1f} tracks/min  ({audio / cpu:.0f}x real time;"
+          f" decode {decode:.1f} s, measure {analysis:.1f} s CPU)")
+
+    workers = args.workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with loudness.worker_pool(workers) as pool:
+        list(pool.map(loudness.analyze, tracks))
+    elapsed = time.perf_counter() - start
+    print(f"  pool of {workers:<6} {len(tracks) / elapsed * 60:6.1f} tracks/min,"
+          f" {len(tracks) / elapsed * 60 / workers:.1f} per core (wall clock, includes starting the workers)")
+
+    clip = samples[:loudness.ANALYSIS_RATE * 10]
+    start = time.perf_counter()
+    fast = loudness._segment_powers(clip, loudness.ANALYSIS_RATE)
+    fast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    exact = []
+    for channel in clip.T:
+        filtered = (channel / 32768).tolist()
+        for b, a in loudness.k_weighting_filters(loudness.ANALYSIS_RATE):
+            filtered = loudness.biquad(b, a, filtered)
+        exact.append(np.array(filtered))
+    slow_time = time.perf_counter() - start
+    segment = len(clip) // len(fast)
+    exact = np.stack([(y[:len(fast) * segment] ** 2).reshape(-1, segment).mean(axis=1) for y in exact], axis=1)
+    audible = exact > 1e-10  # above -100 dB: digital silence compares 0 with 0
+    error = np.max(np.abs(10 * np.log10(fast[audible] / exact[audible])))
+    print(f"  10 s clip      FFT {fast_time * 1000:.1f} ms vs per sample {slow_time * 1000:.0f} ms,"
+          f" largest difference {error:.2g} dB")
+
+
+BENCHMARKS = {
+    "duration": bench_duration,
+    "covers": bench_covers,
+    "gap": bench_gap,
+    "seek": bench_seek,
+    "wakeups": bench_wakeups,
+    "engine": bench_engine,
+    "search": bench_search,
+    "queue": bench_queue,
+    "loudness": bench_loudness,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Whispa music player benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the bundled tracks")
+    parser.add_argument("--cover-size", type=int, default=1200, help="edge of the upscaled covers (covers)")
+    parser.add_argument("--clips", type=int, default=6, help="bundled tracks to clip and chain (gap)")
+    parser.add_argument("--clip-start", type=float, default=30, help="where in each track clips start (gap)")
+    parser.add_argument("--clip-seconds", type=float, default=3, help="length of each clip (gap)")
+    parser.add_argument("--minutes", type=float, default=90, help="length of the generated track (seek)")
+    parser.add_argument("--seconds", type=float, default=10, help="how long each state is measured (wakeups)")
+    parser.add_argument("--slider-width", type=int, default=400, help="slider width in pixels (wakeups)")
+    parser.add_argument("--calls", type=int, default=1000, help="round-trips per command (engine)")
+    parser.add_argument("--tracks", type=int, default=50000, help="size of the generated library (search)")
+    parser.add_argument("--entries", type=int, default=1000000, help="songs in the play queue (queue)")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes, default one per core (loudness)")
+    parser.add_argument("--method", choices=DURATION_METHODS, default="probe", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# frontend/covers.py
+# Cover art for the player. Scaled thumbnails are kept on disk, named after
+# a hash of the source image, so the LANCZOS resize runs once per image ever
+# and all tracks of an album with the same embedded art share one file.
+# Ready PhotoImages sit in a small LRU, and the covers of the neighbouring
+# songs are loaded on a worker thread so prev/next never wait on a decode.
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict, namedtuple
+
+from PIL import Image, ImageTk
+
+import tags
+from runner import BackgroundRunner
+
+THUMB_DIR = os.environ.get("WHISPA_THUMB_DIR",
+                           os.path.join(os.path.expanduser("~"), ".whispa", "thumbnails"))
+THUMB_SIZE = (200, 200)
+PHOTO_CACHE_SIZE = 32  # about 160 KB of pixels each
+
+logger = logging.getLogger(__name__)
+
+# A picture inside a track's ID3 tag; the digest is the hash of its bytes
+EmbeddedCover = namedtuple("EmbeddedCover", "track digest")
+
+_digests = {}   # (image path, size, mtime_ns) -> content hash
+_embedded = {}  # (track path, size, mtime_ns) -> hash of its embedded picture, or None
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+# -----------------------------
+# Sources
+# -----------------------------
+def source_digest(source):
+    if isinstance(source, EmbeddedCover):
+        return source.digest
+    stat = os.stat(source)
+    key = (source, stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(key)
+    if digest is None:
+        with open(source, "rb") as f:
+            digest = _digests[key] = _digest(f.read())
+    return digest
+
+def embedded_cover(track):
+    # EmbeddedCover for a track with art in its tag, else None. The picture is
+    # read (a seek into the tag, no audio) once per track per session; after
+    # that only its hash is kept, and the bytes are needed again only if its
+    # thumbnail doesn't exist yet.
+    stat = os.stat(track)
+    key = (track, stat.st_size, stat.st_mtime_ns)
+    if key not in _embedded:
+        picture = tags.read_picture(track)
+        _embedded[key] = _digest(picture) if picture else None
+    digest = _embedded[key]
+    return EmbeddedCover(track, digest) if digest else None
+
+def _open_source(source):
+    if isinstance(source, EmbeddedCover):
+        picture = tags.read_picture(source.track)
+        if picture is None:
+            raise ValueError(f"no embedded picture in {source.track}")
+        return Image.open(io.BytesIO(picture))
+    return Image.open(source)
+
+# -----------------------------
+# Thumbnails on disk
+# -----------------------------
+def thumbnail_path(source, size=THUMB_SIZE):
+    # Builds the thumbnail the first time a source image is seen; identical
+    # images (same file under two names, one album's embedded art) share one file
+    path = os.path.join(THUMB_DIR, f"{source_digest(source)}-{size[0]}x{size[1]}.png")
+    if not os.path.exists(path):
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        img = _open_source(source).convert("RGBA").resize(size, Image.LANCZOS)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        img.save(tmp_path, "PNG")
+        os.replace(tmp_path, path)  # a concurrent reader never sees half a file
+    return path
+
+def load_thumbnail(source, size=THUMB_SIZE):
+    # Decoded pixels, ready for ImageTk; safe to call off the Tk thread
+    img = Image.open(thumbnail_path(source, size))
+    img.load()
+    return img
+
+# -----------------------------
+# PhotoImage cache
+# -----------------------------
+class CoverCache:
+    def __init__(self, root, resolve, size=THUMB_SIZE, capacity=PHOTO_CACHE_SIZE):
+        # resolve(song name) -> image path or EmbeddedCover, or None
+        self.resolve = resolve
+        self.size = size
+        self.capacity = capacity
+        self._photos = OrderedDict()  # song name -> PhotoImage
+        self._pending = set()
+        self._runner = BackgroundRunner(root)
+
+    def get(self, song):
+        # Tk thread only. Returns None when the song has no usable cover.
+        photo = self._photos.get(song)
+        if photo is not None:
+            self._photos.move_to_end(song)
+            return photo
+        source = self.resolve(song)
+        if source is None:
+            return None
+        try:
+            return self._store(song, load_thumbnail(source, self.size))
+        except (OSError, ValueError) as e:
+            logger.warning("Error loading cover art for %s: %s", song, e)
+            return None
+
+    def prefetch(self, songs):
+        for song in songs:
+            if song in self._photos or song in self._pending:
+                continue
+            self._pending.add(song)
+            # Resolving may read a tag, so it happens on the worker too
+            self._runner.submit(lambda song=song: self._load(song),
+                                lambda img, song=song: self._prefetched(song, img),
+                                lambda error, song=song: self._pending.discard(song))
+
+    def _load(self, song):
+        source = self.resolve(song)
+        return None if source is None else load_thumbnail(source, self.size)
+
+    def _prefetched(self, song, img):
+        self._pending.discard(song)
+        if img is not None and song not in self._photos:
+            self._store(song, img)
+
+    def _store(self, song, img):
+        # PhotoImages belong to the Tk interpreter, so they're only created here
+        photo = self._photos[song] = ImageTk.PhotoImage(img)
+        while len(self._photos) > self.capacity:
+            self._photos.popitem(last=False)
+        return photo
+
+    def close(self):
+        self._runner.cancel()
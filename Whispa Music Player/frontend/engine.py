@@ -0,0 +1,503 @@
+# frontend/engine.py
+# Playback engine: a process of its own that owns pygame.mixer, so playback
+# bookkeeping (gapless queueing, end of track, seeking) never waits on a busy
+# UI thread, and closing the window doesn't stop the music. Windows and the
+# command line attach through engine_client.py, which also describes the
+# protocol. One thread: a selector loop that sleeps until a client sends
+# something, a subscriber is due an event or the current track is due to end.
+# Started on demand by the first client; exits after a while stopped with
+# no one attached. The playlist and the play queue are saved to the state
+# folder, so a restarted engine picks up where the last one left off.
+# Each track plays at the gain measured by loudness.py, in the background.
+import json
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # never opens a window; SDL's event queue comes with video
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import loudness
+import mp3info
+from engine_client import STATE_DIR, EngineError, encode, engine_address, open_connection
+from play_queue import REPEAT_MODES, PlayQueue
+
+TRACK_END = pygame.USEREVENT + 1
+END_MARGIN = 0.02     # look for the end event this long after the track should have ended
+END_RETRY = 0.05      # get_pos() runs a little ahead of the audio on some drivers
+IDLE_EXIT = 300       # seconds stopped with no client attached before the engine exits
+MAX_PENDING = 1 << 20  # bytes queued for a client that doesn't read, or of a line that doesn't end, before it's dropped
+RECV_SIZE = 64 * 1024
+PLAYLIST_FILE = os.path.join(STATE_DIR, "playlist.json")
+QUEUE_FILE = os.path.join(STATE_DIR, "queue.json")
+
+# -----------------------------
+# Playback state
+# -----------------------------
+class Engine:
+    COMMANDS = ("load", "play", "pause", "resume", "toggle", "stop", "next", "prev", "seek", "play_next",
+                "append", "shuffle", "repeat", "volume", "status", "ping", "shutdown")
+
+    def __init__(self):
+        pygame.mixer.init()
+        pygame.display.init()
+        pygame.mixer.music.set_endevent(TRACK_END)
+        self.music = pygame.mixer.music
+        self.playlist = []   # file paths
+        self.queue = PlayQueue(0)
+        self.index = 0
+        self.queued = None   # index handed to the mixer to start when the current one ends
+        self.gains = loudness.GainScanner()
+        self.volume_level = 1.0  # set by the user, on top of the track's gain
+        self.offset = 0.0    # where in the track the last play() started
+        self.length = 0.0
+        self.state = "stopped"
+        self.changed = False  # subscribers haven't been told about the latest change yet
+        self.running = True
+        self._restore()
+
+    def position(self):
+        if self.state == "stopped":
+            return 0.0
+        # get_pos() counts from the last play(), which after a seek started mid-song
+        return max(0, self.music.get_pos()) / 1000 + self.offset
+
+    def status(self):
+        return {"index": self.index, "path": self.playlist[self.index] if self.playlist else None,
+                "position": round(self.position(), 3), "length": self.length, "state": self.state,
+                "queued": self.queued, "next": self.queue.peek(auto=False), "previous": self.queue.peek_prev(),
+                "count": len(self.playlist), "shuffle": self.queue.shuffle,
+                "repeat": self.queue.repeat, "up_next": len(self.queue.up_next), "volume": self.volume_level,
+                "gain": self.gains.gain(self.playlist[self.index]) if self.playlist else None}
+
+    def event(self):
+        return ["pos", self.index, round(self.position(), 3), self.length, self.state]
+
+    def until_end(self):
+        # Seconds until the end event should be read, or None while nothing plays
+        if self.state != "playing" or self.length <= 0:
+            return None
+        return max(END_RETRY, self.length - self.position() + END_MARGIN)
+
+    # -----------------------------
+    # Commands
+    # -----------------------------
+    def load(self, paths):
+        # Replaces the playlist; a song that's playing and still in it carries
+        # on, and so do queued songs and the history
+        paths = [str(path) for path in paths]
+        if paths == self.playlist:
+            return self.status()
+        current = self.playlist[self.index] if self.playlist else None
+        positions = {path: i for i, path in enumerate(paths)}
+        old = self.playlist
+        self.playlist = paths
+        self.queue.resize(len(paths), lambda i: positions.get(old[i]))
+        if current in positions:
+            self.index = positions[current]
+            if self.state != "stopped":
+                self._queue_next()
+        else:
+            self.stop()
+            self.index = 0
+        self.changed = True
+        self._save(playlist=True)
+        self._measure()
+        return self.status()
+
+    def play(self, index=None):
+        if not self.playlist:
+            raise EngineError("nothing loaded")
+        if index is not None:
+            self.index = self.queue.play(int(index) % len(self.playlist))
+        elif self.queue.current is None:
+            self.index = self.queue.play(self.index)
+        self.music.load(self.playlist[self.index])
+        self.music.play()
+        self._started(0.0)
+        return self.status()
+
+    def pause(self):
+        if self.state == "playing":
+            self.music.pause()
+            self.state = "paused"
+            self.changed = True
+        return self.status()
+
+    def resume(self):
+        if self.state == "paused":
+            self.music.unpause()
+            self.state = "playing"
+            self.changed = True
+        return self.status()
+
+    def toggle(self):
+        if self.state == "playing":
+            return self.pause()
+        if self.state == "paused":
+            return self.resume()
+        return self.play()
+
+    def stop(self):
+        self.music.stop()
+        pygame.event.clear(TRACK_END)  # stop() posts one too
+        self.state = "stopped"
+        self.offset = 0.0
+        self.queued = None
+        self.changed = True
+        return self.status()
+
+    def next(self):
+        if not self.playlist:
+            raise EngineError("nothing loaded")
+        self.index = self.queue.next()
+        return self.play()
+
+    def prev(self):
+        if not self.playlist:
+            raise EngineError("nothing loaded")
+        self.index = self.queue.prev()
+        return self.play()
+
+    def seek(self, seconds):
+        # Starts decoding at the frame nearest to `seconds`, handing the mixer
+        # the file from that frame on: play(start=) would have the decoder read
+        # every frame before it
+        if self.state == "stopped":
+            raise EngineError("nothing playing")
+        path = self.playlist[self.index]
+        frame_time, offset = mp3info.seek_position(path, float(seconds), scan=False)
+        paused = self.state == "paused"
+        self.music.load(mp3info.FileView(path, offset), "mp3")
+        self.music.play()
+        self._started(frame_time, seeking=True)
+        if paused:
+            self.pause()
+        return self.status()
+
+    def play_next(self, index):
+        # Ahead of everything queued so far
+        self.queue.play_next(self._song(index))
+        return self._queue_changed()
+
+    def append(self, index):
+        # Behind everything queued so far
+        self.queue.append(self._song(index))
+        return self._queue_changed()
+
+    def shuffle(self, on):
+        self.queue.set_shuffle(bool(on))
+        return self._queue_changed()
+
+    def repeat(self, mode):
+        if mode not in REPEAT_MODES:
+            raise EngineError(f"repeat: one of {', '.join(REPEAT_MODES)}")
+        self.queue.set_repeat(mode)
+        return self._queue_changed()
+
+    def ping(self):
+        return None
+
+    def volume(self, level):
+        self.volume_level = min(1.0, max(0.0, float(level)))
+        self._apply_gain()
+        return self.status()
+
+    def shutdown(self):
+        self.stop()
+        self.gains.stop()
+        self.running = False
+        return None
+
+    def _song(self, index):
+        if not self.playlist:
+            raise EngineError("nothing loaded")
+        index = int(index)
+        if not 0 <= index < len(self.playlist):
+            raise EngineError(f"no song {index}")
+        return index
+
+    def _queue_changed(self):
+        # What follows the current song may be different now
+        if self.state != "stopped":
+            self._queue_next()
+        self._save()
+        return self.status()
+
+    # -----------------------------
+    # Track changes
+    # -----------------------------
+    def _started(self, offset, seeking=False):
+        # After every play(). A seek carries on in the same track: nothing to
+        # save, and its length and seek table are known already
+        pygame.event.clear(TRACK_END)
+        self.offset = offset
+        self.state = "playing"
+        if seeking:
+            self._apply_gain()  # load() resets the volume
+            self._queue_next()
+            self.changed = True
+        else:
+            self._track_changed()
+
+    def _track_changed(self):
+        path = self.playlist[self.index]
+        self.length = mp3info.duration(path)
+        self._apply_gain()
+        self._queue_next()
+        self._save()
+        # A VBR file's seek table takes one pass over its frame headers;
+        # build it now so the first seek doesn't wait for it
+        threading.Thread(target=mp3info.seek_table, args=(path,), daemon=True).start()
+        self.changed = True
+
+    def _apply_gain(self):
+        # Also right after the mixer moved on to a queued song by itself: its
+        # first moments play at the previous song's volume
+        if self.playlist:
+            self.music.set_volume(self.volume_level * self.gains.volume(self.playlist[self.index]))
+
+    def _measure(self):
+        # Loudness of the songs not measured yet, starting with the one playing
+        self.gains.scan(self.playlist[self.index:] + self.playlist[:self.index])
+
+    def _queue_next(self):
+        # The mixer starts a queued file the moment the current one ends, with
+        # no gap. Loading or seeking drops the queue, so this follows every play().
+        self.queued = self.queue.peek(auto=True)
+        if self.queued is None:
+            return  # repeat is off and this is the last song
+        try:
+            self.music.queue(self.playlist[self.queued])
+        except pygame.error as e:
+            print(f"Error queueing {self.playlist[self.queued]}: {e}", file=sys.stderr)
+            self.queued = None
+
+    def pump(self):
+        # The end event comes both when the mixer moved on to the queued song
+        # by itself and when playback really stopped
+        for _ in pygame.event.get(TRACK_END):
+            if self.queued is not None and self.music.get_busy():
+                self.index = self.queue.next(auto=True)  # the song peeked at for the mixer
+                self.offset = 0.0
+                self._track_changed()
+            elif self.state == "playing":
+                song = self.queue.next(auto=True)  # nothing was queued: the end, or queueing failed
+                if song is None:
+                    self.stop()
+                else:
+                    self.index = song
+                    self.play()
+
+    # -----------------------------
+    # Saved state
+    # -----------------------------
+    def _save(self, playlist=False):
+        # The playlist only when it changes; the queue is small and goes every time
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            if playlist:
+                _write_json(PLAYLIST_FILE, self.playlist)
+            _write_json(QUEUE_FILE, {"index": self.index, "queue": self.queue.to_dict()})
+        except OSError as e:
+            print(f"Error saving the play queue: {e}", file=sys.stderr)
+
+    def _restore(self):
+        try:
+            with open(PLAYLIST_FILE, encoding="utf-8") as f:
+                playlist = json.load(f)
+            with open(QUEUE_FILE, encoding="utf-8") as f:
+                saved = json.load(f)
+            queue = PlayQueue.from_dict(saved["queue"])
+            index = saved["index"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return  # nothing saved yet, or from another version
+        if isinstance(playlist, list) and queue.size == len(playlist):
+            if not isinstance(index, int) or not 0 <= index < len(playlist):
+                index = 0
+            self.playlist, self.queue, self.index = playlist, queue, index
+            self._measure()
+
+
+def _write_json(path, data):
+    # Whole or not at all: a crash mid-write leaves the previous file
+    temp = path + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(temp, path)
+
+# -----------------------------
+# Server
+# -----------------------------
+class Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbox = b""
+        self.outbox = bytearray()
+        self.writing = False  # registered for EVENT_WRITE
+        self.subscribed = False
+        self.interval = 0.0  # seconds between periodic events, 0 for changes only
+        self.next_event = 0.0
+
+
+def _listen():
+    family, address = engine_address()
+    if family == socket.AF_UNIX:
+        try:
+            open_connection().close()
+            sys.exit("playback engine already running")
+        except OSError:
+            pass
+        if os.path.exists(address):
+            os.unlink(address)  # left behind by an engine that didn't exit cleanly
+        os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.bind(address)
+    if family == socket.AF_UNIX:
+        os.chmod(address, 0o600)  # only this user controls the player
+    listener.listen()
+    listener.setblocking(False)
+    return listener
+
+
+def _handle(engine, conn, line):
+    # One request line; anything that isn't [seq, command, *args] gets an
+    # error reply with a null seq, and the connection carries on
+    try:
+        message = json.loads(line)
+    except ValueError:
+        message = None
+    if not (isinstance(message, list) and len(message) >= 2 and isinstance(message[1], str)):
+        conn.outbox += encode([None, False, "malformed request"])
+        return
+    seq, command, *args = message
+    try:
+        if command == "subscribe":
+            # [interval_ms]: also send the position this often while playing
+            conn.subscribed = True
+            conn.interval = float(args[0]) / 1000 if args else 0.0
+            conn.next_event = time.monotonic() + conn.interval
+            result = engine.status()
+        elif command == "unsubscribe":
+            conn.subscribed = False
+            result = None
+        elif command in Engine.COMMANDS:
+            result = getattr(engine, command)(*args)
+        else:
+            raise EngineError(f"unknown command: {command}")
+        conn.outbox += encode([seq, True, result])
+    except Exception as e:  # whatever a request's arguments break (Infinity, a bad index...), the engine stays up
+        conn.outbox += encode([seq, False, str(e) or type(e).__name__])
+
+
+def _timeout(engine, clients, idle_since, now):
+    # How long the loop may sleep: None means until a client sends something
+    deadlines = []
+    until_end = engine.until_end()
+    if until_end is not None:
+        deadlines.append(until_end)
+    if engine.state == "playing":
+        deadlines += [conn.next_event - now for conn in clients.values() if conn.subscribed and conn.interval]
+    if idle_since is not None:
+        deadlines.append(idle_since + IDLE_EXIT - now)
+    return max(0.0, min(deadlines)) if deadlines else None
+
+
+def serve():
+    listener = _listen()
+    engine = Engine()
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    clients = {}  # socket -> Connection
+    idle_since = time.monotonic()
+
+    def drop(conn):
+        selector.unregister(conn.sock)
+        conn.sock.close()
+        del clients[conn.sock]
+
+    while engine.running:
+        now = time.monotonic()
+        for key, mask in selector.select(_timeout(engine, clients, idle_since, now)):
+            if key.fileobj is listener:
+                try:
+                    sock, _ = listener.accept()
+                except OSError:
+                    continue
+                sock.setblocking(False)
+                if sock.family == socket.AF_INET:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                clients[sock] = Connection(sock)
+                selector.register(sock, selectors.EVENT_READ)
+                continue
+            conn = clients.get(key.fileobj)
+            if conn is None:
+                continue
+            if mask & selectors.EVENT_READ:
+                try:
+                    data = conn.sock.recv(RECV_SIZE)
+                except OSError:
+                    data = None  # reset
+                if not data:
+                    drop(conn)
+                    continue
+                *lines, conn.inbox = (conn.inbox + data).split(b"\n")
+                for line in lines:
+                    if line:
+                        _handle(engine, conn, line)
+                if len(conn.inbox) > MAX_PENDING:
+                    drop(conn)  # a line that never ends
+
+        engine.pump()
+        now = time.monotonic()
+        if engine.changed:
+            event = encode(engine.event())
+            for conn in clients.values():
+                if conn.subscribed:
+                    conn.outbox += event
+                    conn.next_event = now + conn.interval
+            engine.changed = False
+        elif engine.state == "playing":
+            for conn in clients.values():
+                if conn.subscribed and conn.interval and now >= conn.next_event:
+                    conn.outbox += encode(engine.event())
+                    conn.next_event = now + conn.interval
+
+        for conn in list(clients.values()):
+            if conn.outbox:
+                try:
+                    sent = conn.sock.send(conn.outbox)
+                    del conn.outbox[:sent]
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    drop(conn)
+                    continue
+            if len(conn.outbox) > MAX_PENDING:
+                drop(conn)
+            elif conn.writing != bool(conn.outbox):
+                conn.writing = bool(conn.outbox)
+                selector.modify(conn.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if conn.writing else 0))
+
+        if clients or engine.state != "stopped":
+            idle_since = None
+        elif idle_since is None:
+            idle_since = now
+        elif now - idle_since >= IDLE_EXIT:
+            engine.running = False
+
+    engine.gains.stop()
+    for conn in list(clients.values()):
+        drop(conn)
+    listener.close()
+    if listener.family == socket.AF_UNIX:
+        os.unlink(engine_address()[1])
+    pygame.mixer.quit()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,203 @@
+# frontend/engine_client.py
+# Client side of the playback engine (engine.py), for the player window and
+# the command line. The engine is a process of its own that owns the mixer:
+# a window attaches, sends commands and gets state pushed to it, and when
+# it closes the music keeps playing.
+#
+# Protocol: one JSON array per line, no spaces.
+#   request  [seq, command, *args]
+#   reply    [seq, true, result] or [seq, false, "error message"]
+#   event    ["pos", index, position, length, state]   state: playing/paused/stopped
+# Events go to connections that subscribed: right away whenever the state
+# changes (new track, pause, seek...) and, with an interval, periodically
+# while playing.
+import argparse
+import json
+import os
+import select
+import socket
+import subprocess
+import sys
+import time
+
+STATE_DIR = os.environ.get("WHISPA_STATE_DIR", os.path.join(os.path.expanduser("~"), ".whispa"))
+# A Unix socket where there is one; Windows talks TCP on the loopback interface
+ENGINE_TRANSPORT = os.environ.get("WHISPA_ENGINE_TRANSPORT", "unix" if hasattr(socket, "AF_UNIX") else "tcp")
+ENGINE_SOCKET = os.environ.get("WHISPA_ENGINE_SOCKET", os.path.join(STATE_DIR, "engine.sock"))
+ENGINE_PORT = int(os.environ.get("WHISPA_ENGINE_PORT", "47800"))
+ENGINE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.py")
+ENGINE_LOG = os.path.join(STATE_DIR, "engine.log")
+CALL_TIMEOUT = 5    # seconds
+START_TIMEOUT = 10  # seconds for a freshly started engine to accept connections
+RECV_SIZE = 64 * 1024
+
+
+class EngineError(Exception):
+    pass
+
+# -----------------------------
+# Wire format
+# -----------------------------
+def encode(message):
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode_lines(buffer):
+    # -> (complete messages, bytes of an unfinished line)
+    *lines, rest = buffer.split(b"\n")
+    return [json.loads(line) for line in lines if line], rest
+
+
+def engine_address():
+    if ENGINE_TRANSPORT == "unix":
+        return socket.AF_UNIX, ENGINE_SOCKET
+    return socket.AF_INET, ("127.0.0.1", ENGINE_PORT)
+
+
+def open_connection():
+    family, address = engine_address()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    if family == socket.AF_INET:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # small messages, no batching delay
+    return sock
+
+
+def start_engine():
+    # Detached, so it outlives the window that started it
+    os.makedirs(STATE_DIR, exist_ok=True)
+    options = {}
+    if os.name == "nt":
+        options["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options["start_new_session"] = True
+    with open(ENGINE_LOG, "ab") as log:
+        subprocess.Popen([sys.executable, ENGINE_SCRIPT], stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                         close_fds=True, **options)
+
+# -----------------------------
+# Client
+# -----------------------------
+class EngineClient:
+    def __init__(self, on_event=None):
+        # on_event(event) runs for every event received, from call() or poll()
+        self.on_event = on_event
+        self.sock = None
+        self._seq = 0
+        self._buffer = b""
+
+    def connect(self, start=True):
+        # Attaches to the running engine, starting one if there is none
+        try:
+            self.sock = open_connection()
+        except OSError:
+            if not start:
+                raise EngineError("playback engine is not running")
+            start_engine()
+            deadline = time.monotonic() + START_TIMEOUT
+            while self.sock is None:
+                time.sleep(0.05)
+                try:
+                    self.sock = open_connection()
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise EngineError(f"playback engine did not start, see {ENGINE_LOG}")
+        return self
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def call(self, command, *args):
+        # Sends a command and waits for its reply; events that arrive first are dispatched
+        if self.sock is None:
+            raise EngineError("not connected to the playback engine")
+        self._seq += 1
+        seq = self._seq
+        self.sock.sendall(encode([seq, command, *args]))
+        deadline = time.monotonic() + CALL_TIMEOUT
+        reply = None
+        while reply is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise EngineError(f"no reply to {command} from the playback engine")
+            for message in self._receive(remaining):
+                if message[0] == seq:
+                    reply = message
+                elif isinstance(message[0], str):
+                    self._dispatch(message)
+                # replies to calls that timed out earlier are dropped
+        if not reply[1]:
+            raise EngineError(reply[2])
+        return reply[2]
+
+    def poll(self):
+        # Handles whatever the engine has sent, without waiting for more
+        while self.sock is not None and select.select([self.sock], [], [], 0)[0]:
+            for message in self._receive(0):
+                if isinstance(message[0], str):
+                    self._dispatch(message)
+
+    def close(self):
+        # Detaches; the engine carries on playing
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def _receive(self, timeout):
+        if not select.select([self.sock], [], [], timeout)[0]:
+            return []
+        data = self.sock.recv(RECV_SIZE)
+        if not data:
+            self.close()
+            raise EngineError("playback engine closed the connection")
+        messages, self._buffer = decode_lines(self._buffer + data)
+        return messages
+
+    def _dispatch(self, event):
+        if self.on_event is not None:
+            self.on_event(event)
+
+# -----------------------------
+# Command line
+# -----------------------------
+def _argument(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Control the Whispa playback engine")
+    parser.add_argument("command", help="play [index], pause, resume, toggle, stop, next, prev, seek <seconds>,"
+                                        " play_next <index>, append <index>, shuffle true|false,"
+                                        " repeat off|all|one, volume <0-1>, load <file>..., status, watch, shutdown")
+    parser.add_argument("args", nargs="*")
+    args = parser.parse_args(argv)
+
+    client = EngineClient(on_event=lambda event: print(*event[1:], flush=True))
+    try:
+        client.connect(start=args.command in ("load", "play"))
+        if args.command == "load":
+            print(json.dumps(client.call("load", [os.path.abspath(path) for path in args.args]), indent=2))
+        elif args.command == "watch":
+            client.call("subscribe", int(args.args[0]) if args.args else 1000)
+            while True:
+                select.select([client.sock], [], [])
+                client.poll()
+        else:
+            print(json.dumps(client.call(args.command, *map(_argument, args.args)), indent=2))
+    except EngineError as e:
+        sys.exit(f"Error: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
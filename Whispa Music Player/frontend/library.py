@@ -0,0 +1,162 @@
+# frontend/library.py
+# Persistent index of the music folder. Tags and duration come from file
+# headers only and are stored with each file's size and mtime, so a launch
+# re-reads just the files that changed, and no file at all when the folder
+# itself hasn't changed since the last scan.
+import os
+import sqlite3
+from collections import namedtuple
+
+import mp3info
+import tags
+
+LIBRARY_DB = os.environ.get("WHISPA_LIBRARY_DB",
+                            os.path.join(os.path.expanduser("~"), ".whispa", "library.db"))
+AUDIO_EXTENSIONS = (".mp3",)
+
+Track = namedtuple("Track", "name size mtime_ns title artist album duration")
+
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS tracks (
+            folder TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            album TEXT NOT NULL,
+            duration REAL NOT NULL,
+            PRIMARY KEY (folder, name)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS folders (
+            folder TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL
+        )
+        """,
+    ]),
+    (2, [
+        # Durations were bitrate estimates; forget them so the next scan re-probes every file
+        "DELETE FROM tracks",
+        "DELETE FROM folders",
+    ]),
+    (3, [
+        # Loudness normalization (loudness.py): dB to apply and sample peak, NULL until measured
+        "ALTER TABLE tracks ADD COLUMN gain REAL",
+        "ALTER TABLE tracks ADD COLUMN peak REAL",
+    ]),
+]
+
+SELECT_TRACKS = "SELECT name, size, mtime_ns, title, artist, album, duration FROM tracks WHERE folder = ?"
+UPSERT_TRACK = """
+    INSERT INTO tracks (folder, name, size, mtime_ns, title, artist, album, duration)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (folder, name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns,
+        title = excluded.title, artist = excluded.artist, album = excluded.album, duration = excluded.duration,
+        gain = NULL, peak = NULL
+"""
+DELETE_TRACK = "DELETE FROM tracks WHERE folder = ? AND name = ?"
+SELECT_GAINS = "SELECT name, gain FROM tracks WHERE folder = ? AND gain IS NOT NULL"
+# Only if the file is still the one that was measured
+UPDATE_GAIN = """
+    UPDATE tracks SET gain = ?, peak = ? WHERE folder = ? AND name = ? AND size = ? AND mtime_ns = ?
+"""
+SELECT_FOLDER_MTIME = "SELECT mtime_ns FROM folders WHERE folder = ?"
+UPSERT_FOLDER_MTIME = """
+    INSERT INTO folders (folder, mtime_ns) VALUES (?, ?)
+    ON CONFLICT (folder) DO UPDATE SET mtime_ns = excluded.mtime_ns
+"""
+
+# -----------------------------
+# Index database
+# -----------------------------
+def connect(db_path=LIBRARY_DB):
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current < MIGRATIONS[-1][0]:
+        with conn:
+            for version, statements in MIGRATIONS:
+                if version > current:
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f"PRAGMA user_version = {version}")
+    return conn
+
+
+def read_gains(conn, folder):
+    # file name -> gain in dB, for the measured tracks of a folder
+    return dict(conn.execute(SELECT_GAINS, (os.path.abspath(folder),)))
+
+
+def store_gain(conn, folder, name, size, mtime_ns, gain, peak):
+    with conn:
+        conn.execute(UPDATE_GAIN, (gain, peak, os.path.abspath(folder), name, size, mtime_ns))
+
+def read_track(path, name, stat):
+    # Header-only metadata; a damaged file still gets listed under its file name
+    fields = {}
+    try:
+        fields = tags.read_tags(path)
+    except (OSError, ValueError) as e:
+        print(f"Error reading tags of {name}: {e}")
+    # Frame headers are exact; TLEN is whatever the tagger wrote, so it's only a fallback
+    try:
+        duration = mp3info.duration(path)
+    except OSError:
+        duration = 0.0
+    duration = duration or fields.get("length", 0.0)
+    return Track(name, stat.st_size, stat.st_mtime_ns, fields.get("title") or os.path.splitext(name)[0],
+                 fields.get("artist", ""), fields.get("album", ""), duration)
+
+# -----------------------------
+# Library
+# -----------------------------
+class Library:
+    def __init__(self, folder, db_path=LIBRARY_DB):
+        self.folder = os.path.abspath(folder)
+        self.conn = connect(db_path)
+        self.tracks = {}  # file name -> Track
+        self.folder_mtime = None  # as of the last scan
+
+    def names(self):
+        return sorted(self.tracks, key=str.lower)
+
+    def needs_scan(self):
+        # One stat: adding, removing or renaming a file changes the folder's mtime
+        return os.stat(self.folder).st_mtime_ns != self.folder_mtime
+
+    def scan(self, full=False):
+        # Brings the index up to date with the folder; returns how many files
+        # were (re)read. Editing a file in place doesn't touch the folder's
+        # mtime, so full=True stats every file even when the folder looks unchanged.
+        folder_mtime = os.stat(self.folder).st_mtime_ns  # before listing: a change mid-scan triggers a rescan
+        indexed = {row[0]: Track(*row) for row in self.conn.execute(SELECT_TRACKS, (self.folder,))}
+        stored = self.conn.execute(SELECT_FOLDER_MTIME, (self.folder,)).fetchone()
+        self.folder_mtime = folder_mtime
+        if not full and stored and stored[0] == folder_mtime:
+            self.tracks = indexed
+            return 0
+
+        current, changed = {}, []
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            track = indexed.get(entry.name)
+            if track is None or track.size != stat.st_size or track.mtime_ns != stat.st_mtime_ns:
+                track = read_track(entry.path, entry.name, stat)
+                changed.append(track)
+            current[entry.name] = track
+
+        with self.conn:
+            self.conn.executemany(UPSERT_TRACK, [(self.folder,) + tuple(track) for track in changed])
+            self.conn.executemany(DELETE_TRACK, [(self.folder, name) for name in indexed.keys() - current.keys()])
+            self.conn.execute(UPSERT_FOLDER_MTIME, (self.folder, folder_mtime))
+        self.tracks = current
+        return len(changed)
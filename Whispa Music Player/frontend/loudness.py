@@ -0,0 +1,257 @@
+# frontend/loudness.py
+# Loudness normalization. Each track is decoded once, in a pool of
+# low-priority worker processes, and measured the way ReplayGain 2.0 and
+# EBU R128 do (ITU-R BS.1770): K-weighted, gated integrated loudness, plus
+# the sample peak. The gain that brings a track to TARGET_LUFS goes into the
+# library index next to the file's size and mtime, so a track is decoded
+# again only when the file changes.
+#
+# pygame.mixer.music can only turn the volume down: loud tracks come down
+# to the target, quieter ones play at full volume.
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import numpy as np
+import pygame
+
+import library
+
+TARGET_LUFS = -18.0     # ReplayGain 2.0 reference level
+ANALYSIS_RATE = 44100   # tracks are decoded at this rate, stereo
+SEGMENT_SECONDS = 0.1   # gating blocks are 4 segments long (400 ms) and a segment apart
+ABSOLUTE_GATE = -70.0   # LUFS
+RELATIVE_GATE = -10.0   # LU below the loudness of the blocks above the absolute gate
+CHUNK_SEGMENTS = 100    # filtered this many segments at a time, to bound memory
+RESPONSE_TAPS = 4096    # the filters' impulse response has died away well before this
+WORKER_NICENESS = 10
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Measuring
+# -----------------------------
+def k_weighting_filters(rate):
+    # BS.1770's two biquads, a high shelf then a high pass, as (b, a) pairs for
+    # any sample rate (same design as libebur128; at 48 kHz these are the
+    # coefficients in the standard)
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = ([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0],
+             [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / rate)
+    a0 = 1 + k / q + k * k
+    high_pass = ([1.0, -2.0, 1.0], [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+    return shelf, high_pass
+
+
+def biquad(b, a, x):
+    # Direct form I, one sample at a time: only ever run on short signals
+    y = [0.0] * len(x)
+    x1 = x2 = y1 = y2 = 0.0
+    for i, x0 in enumerate(x):
+        y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        x2, x1, y2, y1 = x1, x0, y1, y0
+        y[i] = y0
+    return y
+
+
+@lru_cache(maxsize=4)
+def k_weighting_response(rate):
+    # Impulse response of the two filters in a row. Filtering then becomes a
+    # convolution, which NumPy does a chunk at a time with FFTs.
+    response = [1.0] + [0.0] * (RESPONSE_TAPS - 1)
+    for b, a in k_weighting_filters(rate):
+        response = biquad(b, a, response)
+    return np.array(response, dtype=np.float32)
+
+
+@lru_cache(maxsize=8)
+def _response_spectrum(rate, size):
+    return np.fft.rfft(k_weighting_response(rate), size)[:, None]
+
+
+def _segment_powers(samples, rate):
+    # Mean square of the K-weighted signal per segment and channel, by
+    # overlap-add convolution; a trailing partial segment is dropped. Single
+    # precision FFTs: a fifth faster, and 16-bit audio doesn't need more.
+    segment = int(rate * SEGMENT_SECONDS)
+    taps = len(k_weighting_response(rate))
+    chunk = segment * CHUNK_SEGMENTS
+    whole = len(samples) // segment * segment
+    powers, tail = [], None
+    for start in range(0, whole, chunk):
+        x = samples[start:min(start + chunk, whole)].astype(np.float32) / 32768
+        length = len(x) + taps - 1
+        size = 1 << (length - 1).bit_length()
+        y = np.fft.irfft(np.fft.rfft(x, size, axis=0) * _response_spectrum(rate, size), size, axis=0)[:length]
+        if tail is not None:
+            y[:len(tail)] += tail
+        y, tail = y[:len(x)], y[len(x):]
+        powers.append((y * y).reshape(-1, segment, x.shape[1]).mean(axis=1, dtype=np.float64))
+    return np.concatenate(powers) if powers else np.zeros((0, samples.shape[1]))
+
+
+def measure(samples, rate):
+    # samples: int16 array (frames, channels). Returns (integrated loudness
+    # in LUFS, or None for silence; sample peak, 1.0 = full scale).
+    peak = max(int(samples.max()), -int(samples.min())) / 32768 if len(samples) else 0.0  # abs() of -32768 overflows
+    powers = _segment_powers(samples, rate)
+    if len(powers) < 4:
+        return None, peak  # shorter than one gating block
+    # Blocks of 4 segments, each channel weighted 1 (left and right)
+    cumulative = np.concatenate([np.zeros(1), np.cumsum(powers.sum(axis=1))])
+    blocks = (cumulative[4:] - cumulative[:-4]) / 4
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[loudness > ABSOLUTE_GATE]
+    if not len(gated):
+        return None, peak
+    relative = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE
+    gated = blocks[(loudness > ABSOLUTE_GATE) & (loudness > relative)]
+    return float(-0.691 + 10 * np.log10(gated.mean())), peak
+
+
+def track_gain(loudness):
+    # dB to bring a track to the target; silence is left alone
+    return 0.0 if loudness is None else TARGET_LUFS - loudness
+
+
+def gain_volume(gain):
+    # set_volume() value for a gain: 1.0 at most, it can't go louder
+    return 1.0 if gain is None else min(1.0, 10 ** (gain / 20))
+
+# -----------------------------
+# Worker processes
+# -----------------------------
+def lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICENESS)
+    elif os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), 0x4000)  # BELOW_NORMAL_PRIORITY_CLASS
+
+
+def init_worker():
+    # Decoding goes through the mixer, which never opens the sound card here
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    lower_priority()
+    pygame.mixer.init(ANALYSIS_RATE, -16, 2)
+
+
+def analyze(path):
+    # -> (size, mtime_ns, loudness, peak); size and mtime as of before the
+    # decode, so a file that changes meanwhile isn't stored as measured
+    stat = os.stat(path)
+    samples = np.frombuffer(pygame.mixer.Sound(path).get_raw(), dtype=np.int16).reshape(-1, 2)
+    loudness, peak = measure(samples, ANALYSIS_RATE)
+    return stat.st_size, stat.st_mtime_ns, loudness, peak
+
+
+def worker_pool(workers):
+    # Spawned, not forked: the engine that owns this pool has SDL running
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker)
+
+# -----------------------------
+# Background scanner
+# -----------------------------
+class GainScanner:
+    # Keeps the gain of each playlist track at hand for the engine. Gains
+    # come from the library index; tracks without one are measured in the
+    # background and stored there. volume() is safe to call from any thread.
+    def __init__(self, db_path=library.LIBRARY_DB, workers=None):
+        self.db_path = db_path
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)  # a core left for playback and the window
+        self._gains = {}  # path -> dB
+        self._wanted = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def gain(self, path):
+        with self._lock:
+            return self._gains.get(path)
+
+    def volume(self, path):
+        return gain_volume(self.gain(path))
+
+    def scan(self, paths):
+        # Measures whichever of `paths` aren't yet, in order; replaces the
+        # previous request, so pass the song playing first
+        with self._lock:
+            self._wanted = list(paths)
+        self._wake.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="loudness", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _run(self):
+        conn = library.connect(self.db_path)  # sqlite connections stay in the thread that made them
+        pool = None
+        try:
+            while not self._stopped:
+                self._wake.wait()
+                self._wake.clear()
+                with self._lock:
+                    wanted = self._wanted
+                todo = self._cached(conn, wanted)
+                if not todo or self._stopped:
+                    continue
+                if pool is None:
+                    pool = worker_pool(self.workers)
+                try:
+                    futures = {pool.submit(analyze, path): path for path in todo}
+                    for future in as_completed(futures):
+                        if self._stopped or self._wake.is_set():
+                            for pending in futures:
+                                pending.cancel()  # a new playlist: start over with it
+                            break
+                        self._store(conn, futures[future], future)
+                except BrokenProcessPool:
+                    # A worker died (killed, out of memory) and the pool takes no
+                    # more work: go round again with a new one. Tracks handed to
+                    # the broken pool are done for this session (see _store).
+                    logger.warning("Loudness workers stopped unexpectedly, restarting them")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = None
+                    self._wake.set()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            conn.close()
+
+    def _cached(self, conn, paths):
+        # Fills in the gains the index already has; returns the paths still to measure
+        stored = {}
+        for folder in {os.path.dirname(path) for path in paths if path not in self._gains}:
+            for name, gain in library.read_gains(conn, folder).items():
+                stored[os.path.join(folder, name)] = gain
+        with self._lock:
+            self._gains.update(stored)
+        return [path for path in paths if path not in self._gains]
+
+    def _store(self, conn, path, future):
+        try:
+            size, mtime_ns, loudness, peak = future.result()
+        except Exception as e:  # undecodable file, or a worker that died
+            logger.warning("Error measuring loudness of %s: %s", path, e)
+            gain = 0.0  # this session only: tried again next time
+        else:
+            gain = track_gain(loudness)
+            library.store_gain(conn, os.path.dirname(path), os.path.basename(path), size, mtime_ns, gain, peak)
+        with self._lock:
+            self._gains[path] = gain
@@ -0,0 +1,309 @@
+# frontend/mp3info.py
+# MPEG audio frame headers: where the audio starts and how long it runs,
+# read from a few header bytes instead of decoding the file. Duration comes
+# from the Xing/Info or VBRI header when the encoder wrote one, otherwise
+# from the frame headers themselves.
+import io
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+
+FrameHeader = namedtuple("FrameHeader", "version layer bitrate sample_rate padding channels frame_size samples")
+# toc: Xing table of contents (100 bytes), or None
+Mp3Info = namedtuple("Mp3Info", "duration audio_start audio_end frames header toc source")
+
+SYNC_SEARCH_BYTES = 64 * 1024  # how far past the ID3 tag to look for the first frame
+CBR_CHECK_FRAMES = 32          # frames sampled before trusting a file without VBR header to be CBR
+SCAN_CHUNK = 256 * 1024
+PROBE_CACHE_SIZE = 1024
+SEEK_STEP_FRAMES = 10     # one seek table entry per ~0.25 s of audio
+SEEK_CACHE_SIZE = 64
+
+# -----------------------------
+# Frame headers
+# -----------------------------
+_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+_LAYERS = {1: 3, 2: 2, 3: 1}
+_BITRATES = {  # (MPEG1 or MPEG2/2.5, layer) -> kbit/s by bitrate index
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+def parse_frame_header(data, pos=0):
+    # Returns a FrameHeader for the 4 bytes at data[pos], or None if they aren't one
+    if len(data) < pos + 4:
+        return None
+    b0, b1, b2, b3 = data[pos:pos + 4]
+    if b0 != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = _VERSIONS.get((b1 >> 3) & 3)
+    layer = _LAYERS.get((b1 >> 1) & 3)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    # Free-format (index 0) streams are rare enough to treat as "not a frame"
+    if version is None or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    channels = 1 if b3 >> 6 == 3 else 2
+    if layer == 1:
+        samples = 384
+        frame_size = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        frame_size = samples // 8 * bitrate // sample_rate + padding
+    return FrameHeader(version, layer, bitrate, sample_rate, padding, channels, frame_size, samples)
+
+# -----------------------------
+# File layout
+# -----------------------------
+def id3v2_size(f):
+    # Bytes taken by a leading ID3v2 tag (0 if there is none)
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+def audio_end(f, file_size):
+    # Audio stops before a trailing 128-byte ID3v1 tag, if any
+    if file_size >= 128:
+        f.seek(file_size - 128)
+        if f.read(3) == b"TAG":
+            return file_size - 128
+    return file_size
+
+def find_first_frame(f, start):
+    # First sync word followed by a second valid frame right where the first
+    # one says it ends, so stray 0xFF bytes in leftover tag data don't match
+    f.seek(start)
+    data = f.read(SYNC_SEARCH_BYTES)
+    pos = data.find(b"\xff")
+    while pos != -1:
+        header = parse_frame_header(data, pos)
+        if header is not None:
+            following = pos + header.frame_size
+            if following + 4 > len(data) or parse_frame_header(data, following) is not None:
+                return start + pos, header
+        pos = data.find(b"\xff", pos + 1)
+    return None, None
+
+def iter_frames(f, start, end, limit=None):
+    # Walks frame headers from `start`, reading the file in chunks and only
+    # the 4 header bytes of each frame; yields (offset, FrameHeader)
+    pos, count = start, 0
+    buffer, buffer_start = b"", start
+    while pos + 4 <= end and (limit is None or count < limit):
+        if pos + 4 > buffer_start + len(buffer):
+            f.seek(pos)
+            buffer, buffer_start = f.read(min(SCAN_CHUNK, end - pos)), pos
+        header = parse_frame_header(buffer, pos - buffer_start)
+        if header is None:
+            return  # lost sync (trailing junk or a damaged frame)
+        yield pos, header
+        pos += header.frame_size
+        count += 1
+
+# -----------------------------
+# VBR headers
+# -----------------------------
+def _side_info_size(header):
+    if header.version == 1:
+        return 17 if header.channels == 1 else 32
+    return 9 if header.channels == 1 else 17
+
+def parse_xing(frame, header):
+    # Xing (VBR) or Info (CBR, written by LAME/ffmpeg) header inside the first
+    # frame: returns (tag, frame count, table of contents) or None
+    pos = 4 + _side_info_size(header)
+    tag = frame[pos:pos + 4]
+    if tag not in (b"Xing", b"Info"):
+        return None
+    flags = int.from_bytes(frame[pos + 4:pos + 8], "big")
+    pos += 8
+    frames = toc = None
+    if flags & 0x1:
+        frames = int.from_bytes(frame[pos:pos + 4], "big")
+        pos += 4
+    if flags & 0x2:
+        pos += 4  # byte count
+    if flags & 0x4 and len(frame) >= pos + 100:
+        toc = frame[pos:pos + 100]
+    return tag, frames, toc
+
+def parse_vbri(frame):
+    # Fraunhofer VBRI header, always 32 bytes after the frame header
+    if frame[36:40] != b"VBRI":
+        return None
+    return int.from_bytes(frame[50:54], "big")
+
+# -----------------------------
+# Probing
+# -----------------------------
+_probe_cache = OrderedDict()  # (path, size, mtime_ns) -> Mp3Info
+_seek_cache = OrderedDict()   # (path, size, mtime_ns) -> SeekTable
+_cache_lock = threading.Lock()  # seek tables get built on a worker thread
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns), stat.st_size
+
+def _cache_get(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+def _cache_put(cache, key, value, limit):
+    with _cache_lock:
+        cache[key] = value
+        if len(cache) > limit:
+            cache.popitem(last=False)
+
+def _probe(f, file_size):
+    start = id3v2_size(f)
+    end = audio_end(f, file_size)
+    offset, header = find_first_frame(f, start)
+    if header is None:
+        return Mp3Info(0.0, start, end, 0, None, None, "none")
+    seconds_per_frame = header.samples / header.sample_rate
+
+    f.seek(offset)
+    frame = f.read(header.frame_size)
+    xing = parse_xing(frame, header)
+    if xing and xing[1]:
+        # The Xing/Info frame itself carries no audio. "Info" marks a CBR file.
+        tag, frames, toc = xing
+        return Mp3Info(frames * seconds_per_frame, offset + header.frame_size, end, frames, header, toc,
+                       "info" if tag == b"Info" else "xing")
+    frames = parse_vbri(frame)
+    if frames:
+        return Mp3Info(frames * seconds_per_frame, offset + header.frame_size, end, frames, header, None, "vbri")
+
+    # No VBR header: if the first frames share one bitrate it's CBR and the
+    # size gives the duration; otherwise count every frame
+    sample = list(iter_frames(f, offset, end, CBR_CHECK_FRAMES))
+    if all(h.bitrate == header.bitrate for _, h in sample):
+        frames = (end - offset) * 8 / header.bitrate / seconds_per_frame
+        return Mp3Info(frames * seconds_per_frame, offset, end, int(frames), header, None, "cbr")
+    duration, frames = 0.0, 0
+    for _, h in iter_frames(f, offset, end):
+        duration += h.samples / h.sample_rate
+        frames += 1
+    return Mp3Info(duration, offset, end, frames, header, None, "scan")
+
+def probe(path):
+    # Cached per file version, so switching back to a track costs one stat()
+    key, size = _file_key(path)
+    info = _cache_get(_probe_cache, key)
+    if info is None:
+        with open(path, "rb") as f:
+            info = _probe(f, size)
+        _cache_put(_probe_cache, key, info, PROBE_CACHE_SIZE)
+    return info
+
+def duration(path):
+    # Seconds of audio, without decoding any of it
+    return probe(path).duration
+
+# -----------------------------
+# Seeking
+# -----------------------------
+# times[i] (seconds) -> offsets[i] (byte offset of a frame start, or an
+# estimate of one when aligned is False)
+SeekTable = namedtuple("SeekTable", "times offsets aligned")
+
+def _table_from_scan(f, info):
+    times, offsets, elapsed = [], [], 0.0
+    for n, (offset, header) in enumerate(iter_frames(f, info.audio_start, info.audio_end)):
+        if n % SEEK_STEP_FRAMES == 0:
+            times.append(elapsed)
+            offsets.append(offset)
+        elapsed += header.samples / header.sample_rate
+    return SeekTable(times, offsets, True)
+
+def _table_linear(info):
+    # Time mapped straight onto bytes: exact for CBR, a guess for anything else
+    return SeekTable([0.0, info.duration], [info.audio_start, info.audio_end], False)
+
+def _table_from_toc(info):
+    # Xing table of contents: byte position (in 256ths) at each percent of the duration
+    audio_bytes = info.audio_end - info.audio_start
+    return SeekTable([info.duration * i / 100 for i in range(100)],
+                     [info.audio_start + info.toc[i] * audio_bytes // 256 for i in range(100)], False)
+
+def seek_table(path, scan=True):
+    # CBR files need no table beyond start and end. VBR files get one from a
+    # one-time frame scan, cached per file version; with scan=False and no
+    # scan cached yet, the Xing TOC (or a linear guess) stands in.
+    key, _ = _file_key(path)
+    table = _cache_get(_seek_cache, key)
+    if table is not None:
+        return table
+    info = probe(path)
+    if info.header is None:
+        return SeekTable([0.0], [info.audio_start], False)
+    if info.source in ("info", "cbr"):
+        table = _table_linear(info)
+    elif scan:
+        with open(path, "rb") as f:
+            table = _table_from_scan(f, info)
+    else:
+        return _table_from_toc(info) if info.toc is not None else _table_linear(info)
+    _cache_put(_seek_cache, key, table, SEEK_CACHE_SIZE)
+    return table
+
+def seek_position(path, seconds, scan=True):
+    # (time, byte offset) of the frame to start decoding from to play at `seconds`
+    table = seek_table(path, scan)
+    i = max(0, bisect_right(table.times, seconds) - 1)
+    time, offset = table.times[i], table.offsets[i]
+    if table.aligned:
+        return time, offset
+    # An estimate: interpolate between entries, then find the next real frame
+    if i + 1 < len(table.times) and seconds > time:
+        offset += int((seconds - time) / (table.times[i + 1] - time) * (table.offsets[i + 1] - offset))
+        time = seconds
+    with open(path, "rb") as f:
+        frame_offset, _ = find_first_frame(f, offset)
+    return time, offset if frame_offset is None else frame_offset
+
+class FileView(io.RawIOBase):
+    # The file from `start` on, as if that were the whole file: lets the
+    # decoder begin at a frame in the middle without reading up to it
+    def __init__(self, path, start):
+        super().__init__()
+        self._f = open(path, "rb")
+        self._start = start
+        self._f.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._f.readinto(buffer)
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos += self._start
+        return self._f.seek(pos, whence) - self._start
+
+    def tell(self):
+        return self._f.tell() - self._start
+
+    def close(self):
+        self._f.close()
+        super().close()
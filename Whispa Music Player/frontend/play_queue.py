@@ -0,0 +1,234 @@
+# frontend/play_queue.py
+# What plays next: the library in order, or shuffled, behind the songs the
+# user queued ("play next" / "add to queue"), with a history for Prev and
+# three repeat modes. Every operation is O(1), however big the library:
+# - the shuffle is a Fisher-Yates shuffle drawn one song at a time, storing
+#   only the positions it has touched, so no song repeats until all have
+#   played and nothing is reshuffled on a skip
+# - each draw comes from a hash of the shuffle's seed and the position, so
+#   to_dict() needs only the seed and the positions touched: saving and
+#   restoring costs the same for ten songs as for a million, and a restored
+#   shuffle carries on exactly as it would have
+import random
+from collections import deque
+
+REPEAT_MODES = ("off", "all", "one")
+HISTORY_SIZE = 1000  # songs Prev can go back through
+_MASK = (1 << 64) - 1
+
+
+def _mix(x):
+    # splitmix64: a well-spread 64-bit number for each x
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+class PlayQueue:
+    def __init__(self, size, shuffle=False, repeat="all"):
+        # Songs are numbered 0..size-1, in library order
+        if repeat not in REPEAT_MODES:
+            raise ValueError(f"repeat must be one of {', '.join(REPEAT_MODES)}")
+        self.size = size
+        self.shuffle = shuffle
+        self.repeat = repeat
+        self.current = None      # song playing, or last played
+        self.up_next = deque()   # queued by the user, played before the order resumes
+        self.history = deque(maxlen=HISTORY_SIZE)  # played before current, latest last
+        self.forward = []        # songs backed out of with prev(), for next() to return to
+        self._reset_order()
+
+    def __len__(self):
+        return self.size
+
+    # -----------------------------
+    # Order
+    # -----------------------------
+    def _reset_order(self):
+        self._seed = random.getrandbits(64)
+        self._swaps = {}  # position -> song, where the shuffle differs from 0..size-1
+        self._where = {}  # song -> position, the inverse
+        self._drawn = 0   # positions of the shuffle decided so far
+        self._pos = -1    # position in the order of the last song played from it
+
+    def _at(self, pos):
+        return self._swaps.get(pos, pos)
+
+    def _position(self, song):
+        return self._where.get(song, song)
+
+    def _swap(self, a, b):
+        song_a, song_b = self._at(a), self._at(b)
+        self._swaps[a], self._where[song_b] = song_b, a
+        self._swaps[b], self._where[song_a] = song_a, b
+
+    def _draw(self):
+        # Decides the next position of the shuffle: one Fisher-Yates step
+        remaining = self.size - self._drawn
+        self._swap(self._drawn, self._drawn + _mix(self._seed + self._drawn) % remaining)
+        self._drawn += 1
+
+    def _upcoming(self, wrap):
+        # Position in the order of the song after the last one played from it,
+        # or None at the end. In a shuffle, the draw is kept: asking twice gives
+        # the same song.
+        pos = self._pos + 1
+        if pos >= self.size:
+            if not wrap or not self.size:
+                return None
+            pos = 0
+            if self.shuffle:
+                # Every song has played: a new shuffle, not starting with the one just heard
+                self._reset_order()
+                self._draw()
+                if self._at(0) == self.current and self.size > 1:
+                    self._swap(0, 1 + _mix(self._seed - 1) % (self.size - 1))
+        if self.shuffle and pos >= self._drawn:
+            self._draw()
+        return pos
+
+    # -----------------------------
+    # Moving
+    # -----------------------------
+    def peek(self, auto=True):
+        # What next() would return, without moving
+        if auto and self.repeat == "one" and self.current is not None:
+            return self.current
+        if self.forward:
+            return self.forward[-1]
+        if self.up_next:
+            return self.up_next[0]
+        pos = self._upcoming(wrap=self.repeat == "all" or not auto)
+        return None if pos is None else self._at(pos)
+
+    def peek_prev(self):
+        # What prev() would return, without moving
+        if self.current is None:
+            return self.peek(auto=False)
+        if self.history:
+            return self.history[-1]
+        return self.current if self.shuffle else (self.current - 1) % self.size
+
+    def next(self, auto=False):
+        # auto: the song ended by itself, rather than Next being pressed. Then
+        # "repeat one" plays it again and "repeat off" stops at the end.
+        # Returns the song to play, or None.
+        if auto and self.repeat == "one" and self.current is not None:
+            return self.current
+        if self.forward:
+            song = self.forward.pop()
+        elif self.up_next:
+            song = self.up_next.popleft()
+        else:
+            pos = self._upcoming(wrap=self.repeat == "all" or not auto)
+            if pos is None:
+                return None
+            self._pos = pos
+            song = self._at(pos)
+        self._move_to(song)
+        return song
+
+    def prev(self):
+        # Back through the history; with none, the song before in library
+        # order (or the same song again, when shuffled)
+        if self.current is None:
+            return self.next()
+        if self.history:
+            self.forward.append(self.current)
+            self.current = self.history.pop()
+        elif not self.shuffle:
+            self.current = self._pos = (self.current - 1) % self.size
+        return self.current
+
+    def play(self, song):
+        # A song picked by the user; the order carries on after it
+        if not 0 <= song < self.size:
+            raise IndexError("song out of range")
+        self.forward.clear()
+        if not self.shuffle:
+            self._pos = song
+        elif self._position(song) > self._pos:
+            # Not played yet in this shuffle: it takes the next position
+            self._pos += 1
+            self._swap(self._pos, self._position(song))
+            self._drawn = max(self._drawn, self._pos + 1)
+        self._move_to(song)
+        return song
+
+    def _move_to(self, song):
+        if self.current is not None and self.current != song:
+            self.history.append(self.current)
+        self.current = song
+
+    # -----------------------------
+    # Queueing and modes
+    # -----------------------------
+    def play_next(self, song):
+        if not 0 <= song < self.size:
+            raise IndexError("song out of range")
+        self.up_next.appendleft(song)
+
+    def append(self, song):
+        if not 0 <= song < self.size:
+            raise IndexError("song out of range")
+        self.up_next.append(song)
+
+    def set_shuffle(self, shuffle):
+        # A fresh shuffle each time it's turned on, starting from the song playing
+        if shuffle == self.shuffle:
+            return
+        self.shuffle = shuffle
+        self._reset_order()
+        if self.current is None:
+            return
+        if shuffle:
+            self._swap(0, self.current)
+            self._drawn = 1
+            self._pos = 0
+        else:
+            self._pos = self.current
+
+    def set_repeat(self, repeat):
+        if repeat not in REPEAT_MODES:
+            raise ValueError(f"repeat must be one of {', '.join(REPEAT_MODES)}")
+        self.repeat = repeat
+
+    def resize(self, size, new_index):
+        # The playlist changed: new_index(old) -> the song's new number, or None
+        # if it's gone. Queued songs and history follow their songs; the order
+        # starts over from the song playing.
+        def moved(songs):
+            return [new for new in map(new_index, songs) if new is not None]
+        self.size = size
+        self.current = new_index(self.current) if self.current is not None else None
+        self.up_next = deque(moved(self.up_next))
+        self.history = deque(moved(self.history), maxlen=HISTORY_SIZE)
+        self.forward = moved(self.forward)
+        shuffle, self.shuffle = self.shuffle, False
+        self._reset_order()
+        self._pos = -1 if self.current is None else self.current
+        self.set_shuffle(shuffle)
+
+    # -----------------------------
+    # Saving
+    # -----------------------------
+    def to_dict(self):
+        # JSON-ready; the size of what has been played and queued, not of the library
+        return {"size": self.size, "shuffle": self.shuffle, "repeat": self.repeat, "current": self.current,
+                "up_next": list(self.up_next), "history": list(self.history), "forward": self.forward,
+                "swaps": [[pos, song] for pos, song in self._swaps.items() if pos != song],
+                "seed": self._seed, "drawn": self._drawn, "pos": self._pos}
+
+    @classmethod
+    def from_dict(cls, data):
+        queue = cls(data["size"], data["shuffle"], data["repeat"])
+        queue.current = data["current"]
+        queue.up_next.extend(data["up_next"])
+        queue.history.extend(data["history"])
+        queue.forward = list(data["forward"])
+        for pos, song in data["swaps"]:
+            queue._swaps[pos] = song
+            queue._where[song] = pos
+        queue._seed, queue._drawn, queue._pos = data["seed"], data["drawn"], data["pos"]
+        return queue
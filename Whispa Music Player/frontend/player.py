@@ -1,16 +1,26 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 from PIL import Image, ImageDraw, ImageTk
-import pygame
 import sys
 import os
+import time
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
 sys.path.append(parent_dir)
 sys.path.append(current_dir)
-
-pygame.mixer.init()
+sys.path.append(root_dir)
+
+from backend.sessions import verify_token
+from backend.sync_client import SyncedCollection
+from library import Library
+from covers import CoverCache, embedded_cover
+from ticker import PlaybackTicker
+from engine_client import EngineClient, EngineError
+from search import SearchIndex
+from songlist import SongList
+import mp3info
 
 #PATHS
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,9 +31,14 @@ COVER_FOLDER = os.path.join(BASE_DIR, "..", "covers")
 DEFAULT_COVER_FILENAME = "image_773db5.png"  # fallback cover image
 DEFAULT_COVER_PATH = os.path.join(COVER_FOLDER, DEFAULT_COVER_FILENAME)
 USER_ICON_PATH = os.path.join(BASE_DIR, "user_icon.png")
+ENGINE_POLL_MS = 250  # where Tk can't watch the engine's socket (Windows)
+
+# Session token handed over by the Whispa launcher (absent when run standalone)
+SESSION_TOKEN = sys.argv[1] if len(sys.argv) > 1 else None
 
 # Global State
-USER_FAVORITES = []
+# Favorites persist locally per user and sync with the backend in the background
+USER_FAVORITES = SyncedCollection("favorites", SESSION_TOKEN, verify_token(SESSION_TOKEN))
 is_playing = False
 is_seeking = False
 current_index = 0
@@ -32,34 +47,63 @@ user_icon_photo = None
 heart_icon_photo = None
 heart_filled_photo = None
 song_length = 0
-update_timer_id = None
-current_offset = 0
+playback_state = "stopped"  # as last reported by the engine: playing/paused/stopped
+shuffle_on = False
+repeat_mode = "all"         # off/all/one
+shown_index = None          # song whose title and cover are on screen
+last_position = 0           # position the engine last reported, and when
+last_position_time = 0
+engine_fd = None
 
 if not os.path.exists(COVER_FOLDER):
     os.makedirs(COVER_FOLDER)
 
-songs = [f for f in os.listdir(MUSIC_FOLDER) if f.endswith(".mp3")]
+# Persistent header-only index: only new or changed files are read at startup
+library = Library(MUSIC_FOLDER)
+library.scan()
+songs = library.names()
+song_positions = {name: i for i, name in enumerate(songs)}
+search_index = SearchIndex()
+
+def display_name(song_name):
+    track = library.tracks[song_name]
+    return f"{track.title} — {track.artist}" if track.artist else track.title
 
 #FUNCTIONS
+def cover_source(song_name):
+    # covers/<song>.png, else the art embedded in the MP3, else the default cover
+    base_name = os.path.splitext(song_name)[0]
+    cover_path = os.path.join(COVER_FOLDER, base_name + ".png")
+    if os.path.exists(cover_path):
+        return cover_path
+    try:
+        embedded = embedded_cover(os.path.join(MUSIC_FOLDER, song_name))
+    except OSError:
+        embedded = None
+    if embedded is not None:
+        return embedded
+    return DEFAULT_COVER_PATH if os.path.exists(DEFAULT_COVER_PATH) else None
+
+
 def load_cover_art(song_name):
     global current_cover_photo
     if not song_name:
         cover_label.config(image='', text="Pick a Song")
         return
-    base_name = os.path.splitext(song_name)[0]
-    cover_filename = base_name + ".png"
-    cover_path = os.path.join(COVER_FOLDER, cover_filename)
-    if not os.path.exists(cover_path):
-        cover_path = DEFAULT_COVER_PATH
 
-    try:
-        img = Image.open(cover_path).resize((200, 200), Image.LANCZOS)
-        current_cover_photo = ImageTk.PhotoImage(img)
-        cover_label.config(image=current_cover_photo, text="")
-        cover_label.image = current_cover_photo
-    except Exception as e:
-        print(f"Error loading cover art: {e}")
+    current_cover_photo = cover_cache.get(song_name)
+    if current_cover_photo is None:
         cover_label.config(image='', text="Pick a Song")
+        return
+    cover_label.config(image=current_cover_photo, text="")
+    cover_label.image = current_cover_photo
+
+
+def prefetch_covers(status):
+    # Have the covers of the songs Next and Prev lead to ready before either is
+    # pressed; the engine's queue knows them (shuffle, queued songs, history)
+    cover_cache.prefetch([songs[index] for index in (status["next"], status["previous"])
+                          if index is not None and index < len(songs)])
 
 
 def update_favorites_button():
@@ -72,134 +116,276 @@ def update_favorites_button():
         favorites_btn.config(image=heart_icon_photo)
 
 
+def update_queue_buttons(shuffle, repeat):
+    global shuffle_on, repeat_mode
+    shuffle_on, repeat_mode = shuffle, repeat
+    shuffle_btn.config(relief=tk.SUNKEN if shuffle else tk.RAISED)
+    repeat_btn.config(text={"off": "Repeat off", "all": "Repeat all", "one": "Repeat one"}[repeat])
+
+
 def update_play_pause_button():
     if is_playing:
         play_pause_btn.config(text="Pause")
     else:
         play_pause_btn.config(text="Play")
 
+def session_valid():
+    # Local HMAC check against the cached token, no database round-trip
+    if SESSION_TOKEN is None:
+        return True
+    if verify_token(SESSION_TOKEN) is None:
+        messagebox.showerror("Session expired", "Your Whispa session has expired. Please log in again.")
+        return False
+    return True
+
+
 #CONTROL FUNCTIONS
+# Playback runs in the engine process (engine.py). These send it commands and
+# show the state it reports back, so the music carries on when the window closes.
+def song_path(song_name):
+    return os.path.abspath(os.path.join(MUSIC_FOLDER, song_name))
+
+
+def send_command(command, *args):
+    try:
+        show_state(engine.call(command, *args))
+    except (EngineError, OSError) as e:
+        print(f"Playback engine error: {e}")
+
+
+def engine_event(event):
+    if event[0] == "pos":
+        _, index, position, length, state = event
+        show_state({"index": index, "position": position, "length": length, "state": state})
+
+
+def show_state(status):
+    # Catches the window up with the engine: another song, play/pause, position
+    global current_index, shown_index, is_playing, playback_state, last_position, last_position_time
+    playback_state = status["state"]
+    last_position, last_position_time = status["position"], time.monotonic()
+    if playback_state != "stopped" and status["index"] != shown_index and status["index"] < len(songs):
+        current_index = shown_index = status["index"]
+        show_current_song()
+        if "next" not in status:
+            # Moved on by itself: ask where Next and Prev lead now. Not from in
+            # here, which may be running inside another call's wait for its reply.
+            root.after_idle(send_command, "status")
+    if is_playing != (playback_state == "playing"):
+        is_playing = playback_state == "playing"
+        update_play_pause_button()
+    if is_playing:
+        ticker.start()
+    else:
+        ticker.stop()
+    if "shuffle" in status:  # command replies carry the queue modes and volume, position events don't
+        update_queue_buttons(status["shuffle"], status["repeat"])
+        if volume_scale.get() != round(status["volume"] * 100):
+            volume_scale.set(round(status["volume"] * 100))
+        prefetch_covers(status)
+    update_slider()
+
+
 def play_song():
-    global current_index, is_playing, song_length, current_offset
     if not songs:
         song_title_label.config(text="No songs found in music folder.")
         return
+    send_command("play", current_index)
 
-    current_song_name = songs[current_index]
-    full_path = os.path.join(MUSIC_FOLDER, current_song_name)
 
-    pygame.mixer.music.load(full_path)
-    pygame.mixer.music.play()
-    current_offset = 0
-    song_length = pygame.mixer.Sound(full_path).get_length()
+def show_current_song():
+    global song_length
+    current_song_name = songs[current_index]
+    # Duration from the library index (frame headers), not a full decode into a Sound
+    song_length = library.tracks[current_song_name].duration or mp3info.duration(song_path(current_song_name))
     slider.config(to=song_length)
-
-    song_title_label.config(text=current_song_name)
+    song_title_label.config(text=display_name(current_song_name))
+    playlist_view.select(current_song_name)
     load_cover_art(current_song_name)
-    is_playing = True
     favorites_btn.pack(side=tk.LEFT)  # Show favorites button only when a song plays
-    update_play_pause_button()
     update_favorites_button()
-    update_slider()
 
 
 def toggle_play_pause():
-    global is_playing
-    if pygame.mixer.music.get_busy():
-        pygame.mixer.music.pause()
-        is_playing = False
-    elif pygame.mixer.music.get_pos() > 0:
-        pygame.mixer.music.unpause()
-        is_playing = True
-    else:
+    if playback_state == "stopped":
         play_song()
-        is_playing = True
-    update_play_pause_button()
+    else:
+        send_command("toggle")
 
 
 def stop_song():
-    global is_playing
-    pygame.mixer.music.stop()
-    is_playing = False
-    update_play_pause_button()
-    slider.set(0)
+    send_command("stop")
 
 
 def next_song():
-    global current_index
-    stop_song()
-    current_index = (current_index + 1) % len(songs)
-    play_song()
+    send_command("next")
 
 
 def prev_song():
-    global current_index
-    stop_song()
-    current_index = (current_index - 1 + len(songs)) % len(songs)
-    play_song()
+    send_command("prev")
+
+
+def toggle_shuffle():
+    send_command("shuffle", not shuffle_on)
+
+
+def cycle_repeat():
+    send_command("repeat", {"all": "one", "one": "off", "off": "all"}[repeat_mode])
+
+
+def set_volume(value):
+    # Tracks are also evened out by their measured loudness, in the engine
+    send_command("volume", int(value) / 100)
+
+
+def show_queue_menu(event):
+    # Right-click a song: play it next, or add it to the end of the queue
+    song_name = playlist_view.key_at(event.y)
+    if song_name is None:
+        return
+    queue_menu.entryconfigure(0, command=lambda: send_command("play_next", song_positions[song_name]))
+    queue_menu.entryconfigure(1, command=lambda: send_command("append", song_positions[song_name]))
+    queue_menu.tk_popup(event.x_root, event.y_root)
 
 
 def toggle_favorite():
     global USER_FAVORITES
-    if not songs:
+    if not songs or not session_valid():
         return
     current_song_name = songs[current_index]
     if current_song_name in USER_FAVORITES:
-        USER_FAVORITES.remove(current_song_name)
+        USER_FAVORITES.discard(current_song_name)
         messagebox.showinfo("Favorites", f"Removed '{current_song_name}' from favorites.")
     else:
-        USER_FAVORITES.append(current_song_name)
+        USER_FAVORITES.add(current_song_name)
         messagebox.showinfo("Favorites", f"Added '{current_song_name}' to favorites.")
+    USER_FAVORITES.sync_in_background()
     update_favorites_button()
 
 
-def select_song(event):
+def select_song(song_name):
     global current_index
-    selected = playlist_box.curselection()
-    if selected:
-        stop_song()
-        current_index = selected[0]
-        play_song()
+    current_index = song_positions[song_name]
+    play_song()
+
+
+#PLAYLIST FUNCTIONS
+def search_entries():
+    entries = []
+    for name in songs:
+        track = library.tracks[name]
+        entries.append((name, (track.title, track.artist, track.album)))
+    return entries
+
+
+def filter_playlist():
+    playlist_view.set_items(search_index.search(search_var.get()))
+
+
+def refresh_library(event):
+    # Songs added, removed or renamed while the window was in the background.
+    # Costs one stat of the folder when nothing changed.
+    global songs, song_positions, current_index
+    if not library.needs_scan():
+        return
+    current_song_name = songs[current_index] if songs else None
+    library.scan()
+    songs = library.names()
+    song_positions = {name: i for i, name in enumerate(songs)}
+    current_index = song_positions.get(current_song_name, 0)
+    search_index.sync(search_entries())  # re-indexes only what changed
+    filter_playlist()
+    send_command("load", [song_path(s) for s in songs])  # the song playing carries on
 
 
 #SLIDER FUNCTIONS
 def slider_press(event):
-    global is_seeking, update_timer_id
+    global is_seeking
     is_seeking = True
-    if update_timer_id:
-        root.after_cancel(update_timer_id)
-        update_timer_id = None
 
 
 def slider_release(event):
-    global is_seeking, is_playing, current_offset
+    global is_seeking
+    is_seeking = False
     if not songs: return
     new_pos = slider.get()
-    current_song = os.path.join(MUSIC_FOLDER, songs[current_index])
-    try:
-        pygame.mixer.music.stop()
-        pygame.mixer.music.load(current_song)
-        pygame.mixer.music.play(start=new_pos)
-        current_offset = new_pos
-        is_playing = True
-        update_play_pause_button()
-        slider.set(new_pos)
-    except Exception as e:
-        print(f"Error seeking: {e}")
-    is_seeking = False
-    update_slider()
+    if playback_state == "stopped":
+        play_song()
+    send_command("seek", new_pos)
+
+
+def playback_position():
+    # Runs on from the last reported position; the engine reports again on any change
+    position = last_position
+    if is_playing:
+        position += time.monotonic() - last_position_time
+    return min(position, song_length)
 
 
 def update_slider():
-    global is_seeking, update_timer_id, current_offset
-    update_timer_id = root.after(100, update_slider)
-    if is_seeking: return
-    if pygame.mixer.music.get_busy() and song_length > 0:
-        current_time = pygame.mixer.music.get_pos() / 1000 + current_offset
-        if abs(slider.get() - current_time) > 0.1:
-            slider.set(current_time)
-        if is_playing and current_time >= song_length - 0.1:
-            next_song()
+    # Called by the ticker about once per pixel of progress, only while playing and visible
+    if not is_seeking:
+        slider.set(playback_position())
+
+
+def window_hidden(event):
+    if event.widget is root:  # <Unmap> also fires for every child widget
+        ticker.set_visible(False)
+
+
+def window_shown(event):
+    if event.widget is root:
+        ticker.set_visible(True)
+        update_slider()
+
+
+#ENGINE CONNECTION
+def attach_engine():
+    # Starts the engine if it isn't running; a song it's already playing carries on
+    global engine_fd
+    try:
+        engine.connect()
+        engine.call("load", [song_path(s) for s in songs])
+        show_state(engine.call("subscribe"))
+    except (EngineError, OSError) as e:
+        messagebox.showerror("Whispa", f"Could not start the playback engine: {e}")
+        return
+    if hasattr(root.tk, "createfilehandler"):
+        # Events are handled the moment they arrive, with no polling
+        engine_fd = engine.fileno()
+        root.tk.createfilehandler(engine_fd, tk.READABLE, lambda fd, mask: read_engine())
+    else:
+        root.after(ENGINE_POLL_MS, poll_engine)
+
+
+def read_engine():
+    try:
+        engine.poll()
+    except (EngineError, OSError) as e:
+        print(f"Playback engine error: {e}")
+        detach_engine()
+
+
+def poll_engine():
+    read_engine()
+    if engine.sock is not None:
+        root.after(ENGINE_POLL_MS, poll_engine)
+
+
+def detach_engine():
+    global engine_fd
+    if engine_fd is not None:
+        root.tk.deletefilehandler(engine_fd)
+        engine_fd = None
+    engine.close()
+
+
+def close_window():
+    # The music keeps playing; opening the player again picks it up
+    ticker.stop()
+    cover_cache.close()
+    detach_engine()
+    root.destroy()
 
 
 #MENU FUNCTIONS
@@ -220,16 +406,21 @@ def show_favorites():
 
 def logout():
     stop_song()
-    root.destroy()
+    close_window()
     login_path = os.path.join(BASE_DIR, "login.py")
     os.system(f'py "{login_path}"')
 
 
 #GUI
+if SESSION_TOKEN is not None and verify_token(SESSION_TOKEN) is None:
+    messagebox.showerror("Session expired", "Your Whispa session has expired. Please log in again.")
+    sys.exit(1)
+
 root = tk.Tk()
 root.title("Whispa")
 root.geometry("800x500")
 root.configure(bg="#C5B3F0")
+cover_cache = CoverCache(root, cover_source)
 
 # Load images
 try:
@@ -259,7 +450,7 @@ tk.Label(top_bar, image=logo_photo, bg="#B8A1F2").pack(side=tk.LEFT, padx=10)
 favorites_btn_top = tk.Button(top_bar, text="Favorites", command=show_favorites, bg="#B8A1F2", bd=0, fg="#111")
 favorites_btn_top.pack(side=tk.RIGHT, padx=10, pady=12)
 
-back_btn_top = tk.Button(top_bar, text="Back to Home", command=root.destroy, bg="#B8A1F2", bd=0, fg="#111")
+back_btn_top = tk.Button(top_bar, text="Back to Home", command=close_window, bg="#B8A1F2", bd=0, fg="#111")
 back_btn_top.pack(side=tk.RIGHT, padx=10, pady=12)
 
 # Main content
@@ -270,11 +461,20 @@ main_frame.pack(fill=tk.BOTH, expand=True)
 playlist_frame = tk.Frame(main_frame, bg="#C5B3F0", width=250)
 playlist_frame.pack(side=tk.LEFT, fill=tk.Y, padx=10, pady=10)
 tk.Label(playlist_frame, text="Playlist", font=("Arial", 14, "bold"), bg="#C5B3F0").pack(pady=5)
-playlist_box = tk.Listbox(playlist_frame)
-for s in songs:
-    playlist_box.insert(tk.END, s)
-playlist_box.pack(fill=tk.Y, expand=True)
-playlist_box.bind("<<ListboxSelect>>", select_song)
+# Search as you type over title, artist and album
+search_var = tk.StringVar()
+tk.Entry(playlist_frame, textvariable=search_var).pack(fill=tk.X, pady=(0,5))
+search_var.trace_add("write", lambda *args: filter_playlist())
+# Draws only the rows in view, however big the library
+playlist_view = SongList(playlist_frame, display_name, select_song, width=200)
+playlist_view.pack(fill=tk.Y, expand=True)
+queue_menu = tk.Menu(root, tearoff=0)
+queue_menu.add_command(label="Play next")
+queue_menu.add_command(label="Add to queue")
+playlist_view.canvas.bind("<Button-3>", show_queue_menu)
+search_index.sync(search_entries())
+playlist_view.set_items(songs)
+root.bind("<FocusIn>", refresh_library, add="+")
 
 # Player panel
 player_frame = tk.Frame(main_frame, bg="#D3C3F5")
@@ -311,7 +511,23 @@ tk.Button(controls_frame, text="Prev", width=8, command=prev_song).grid(row=0, c
 play_pause_btn = tk.Button(controls_frame, text="Play", width=8, command=toggle_play_pause)
 play_pause_btn.grid(row=0, column=1, padx=5)
 tk.Button(controls_frame, text="Next", width=8, command=next_song).grid(row=0, column=2, padx=5)
+shuffle_btn = tk.Button(controls_frame, text="Shuffle", width=8, command=toggle_shuffle)
+shuffle_btn.grid(row=1, column=0, padx=5, pady=(5,0))
+repeat_btn = tk.Button(controls_frame, text="Repeat all", width=10, command=cycle_repeat)
+repeat_btn.grid(row=1, column=2, padx=5, pady=(5,0))
+volume_scale = tk.Scale(controls_frame, from_=0, to=100, orient=tk.HORIZONTAL, showvalue=False, label="Volume",
+                        command=set_volume, bg="#D3C3F5", highlightthickness=0, length=120)
+volume_scale.set(100)
+volume_scale.grid(row=1, column=1, padx=5, pady=(5,0))
+
+# Slider updates, and the playback engine
+ticker = PlaybackTicker(root, lambda: song_length, slider.winfo_width, update_slider)
+root.bind("<Unmap>", window_hidden, add="+")
+root.bind("<Map>", window_shown, add="+")
+root.protocol("WM_DELETE_WINDOW", close_window)
+engine = EngineClient(on_event=engine_event)
+attach_engine()
 
 # Start GUI loop
-update_slider()
+USER_FAVORITES.sync_in_background()
 root.mainloop()
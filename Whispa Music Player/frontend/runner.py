@@ -0,0 +1,61 @@
+# frontend/runner.py
+# Runs slow work (decoding cover art, reading tags) off the Tk main thread.
+# Tk isn't thread-safe, so workers never touch widgets: results go into a
+# queue that the main thread drains from root.after. The player's own copy
+# of the login window's runner, so the frontend doesn't import from the
+# repository root.
+import queue
+import threading
+
+POLL_MS = 15
+
+
+class BackgroundRunner:
+    def __init__(self, root):
+        self.root = root
+        self.cancelled = False
+        self._results = queue.Queue()
+        self._running = 0
+        self._poll_id = None
+
+    @property
+    def busy(self):
+        return self._running > 0
+
+    def submit(self, work, on_done, on_error):
+        # work() runs on a worker thread; on_done(result) / on_error(exception) on the Tk thread
+        if self.cancelled:
+            return
+
+        def run():
+            try:
+                outcome = (True, work())
+            except Exception as e:
+                outcome = (False, e)
+            self._results.put((on_done, on_error, outcome))
+
+        self._running += 1
+        threading.Thread(target=run, name="ui-worker", daemon=True).start()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                on_done, on_error, (ok, value) = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._running -= 1
+            if not self.cancelled:
+                (on_done if ok else on_error)(value)
+        if self._running and not self.cancelled:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        # Window is closing: drop late results. Workers are daemon threads, so
+        # a decode still in progress doesn't keep the process alive.
+        self.cancelled = True
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
@@ -0,0 +1,181 @@
+# frontend/search.py
+# Search-as-you-type over the library. Two levels of postings:
+# - each distinct word of the titles, artists and albums -> the tracks it's in
+# - trigrams of those words, and their first one and two letters -> the words
+# A query word of three letters or more matches words that contain it ("ast"
+# finds "Beast"), a shorter one words that start with it. A track matches when
+# every query word does. A query word that matches nothing falls back to words
+# sharing most of its trigrams, so a typo still finds the song.
+# Trigrams are kept per word rather than per track, so indexing a track costs
+# a few set inserts; sync() only touches the tracks that changed.
+#
+# Tracks are numbered so that number order is display order, with room left
+# between neighbours for tracks added later: sorting results is a plain
+# sort of ints, with no lookups.
+import re
+import unicodedata
+from collections import Counter
+
+FUZZY_MIN_SHARE = 0.5  # share of a query word's trigrams a near miss must have
+# Room between neighbouring tracks for ones added later. Odd: an int hashes
+# to itself, and labels that all end in the same bits would collide in every set.
+LABEL_SPACING = (1 << 20) + 1
+
+_WORD = re.compile(r"\w+")
+_EMPTY = frozenset()
+
+
+def normalize(text):
+    # Case and accents don't matter: "beyonce" finds "Beyoncé"
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def word_trigrams(word):
+    # Padded, so the start and end of a word count too: "beuty" shares
+    # " be", "uty" and "ty " with "beauty"
+    return trigrams(f" {word} ")
+
+
+def word_terms(word):
+    # Trigrams are three characters, prefixes one or two: they never collide
+    return word_trigrams(word) | {word[:1], word[:2]}
+
+
+class SearchIndex:
+    def __init__(self):
+        self._labels = {}  # key -> label
+        self._keys = {}    # label -> key
+        self._fields = {}  # label -> the fields it was indexed from
+        self._words = {}   # label -> its distinct normalized words
+        self._tracks = {}  # word -> set of labels
+        self._terms = {}   # trigram, or the first one or two letters of a word -> set of words
+        self._order = []   # keys in display order
+
+    def __len__(self):
+        return len(self._labels)
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def sync(self, entries):
+        # entries: (key, (title, artist, album)) in display order. Returns how
+        # many tracks were (re)indexed; an unchanged one costs a tuple comparison.
+        entries = list(entries)
+        wanted = dict(entries)
+        changed = 0
+        for key in [key for key in self._labels if key not in wanted]:
+            self._remove(key)
+            changed += 1
+        for key, fields in entries:
+            label = self._labels.get(key)
+            if label is not None and self._fields[label] != fields:
+                self._remove(key)
+                self._add(key, fields, label)  # retagged: same place in the list
+                changed += 1
+        self._order = [key for key, _ in entries]
+        placed = self._place(self._order)
+        if placed is None:
+            # Reordered, or no room left between two tracks: number everything afresh
+            self.__init__()
+            self._order = [key for key, _ in entries]
+            placed = self._place(self._order)
+            changed = 0
+        for key, label in placed.items():
+            self._add(key, wanted[key], label)
+            changed += 1
+        return changed
+
+    def _place(self, keys):
+        # Labels for the keys not indexed yet, between those of their indexed
+        # neighbours; None if the indexed ones are out of order or a gap is full
+        placed, run, low = {}, [], 0
+        for key in keys + [None]:
+            label = self._labels.get(key) if key is not None else None
+            if key is not None and label is None:
+                run.append(key)
+                continue
+            high = label if label is not None else low + LABEL_SPACING * (len(run) + 1)
+            if high - low <= len(run):
+                return None
+            for i, new_key in enumerate(run, 1):
+                placed[new_key] = low + (high - low) * i // (len(run) + 1)
+            run, low = [], high
+        return placed
+
+    def _add(self, key, fields, label):
+        words = set(_WORD.findall(normalize(" ".join(fields))))
+        self._labels[key] = label
+        self._keys[label] = key
+        self._fields[label] = fields
+        self._words[label] = words
+        for word in words:
+            tracks = self._tracks.get(word)
+            if tracks is None:
+                tracks = self._tracks[word] = set()
+                for term in word_terms(word):
+                    self._terms.setdefault(term, set()).add(word)
+            tracks.add(label)
+
+    def _remove(self, key):
+        label = self._labels.pop(key)
+        for word in self._words.pop(label):
+            tracks = self._tracks[word]
+            tracks.discard(label)
+            if tracks:
+                continue
+            del self._tracks[word]  # last track with this word
+            for term in word_terms(word):
+                words = self._terms[term]
+                words.discard(word)
+                if not words:
+                    del self._terms[term]
+        del self._keys[label], self._fields[label]
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def _matching_words(self, word):
+        if len(word) < 3:
+            return self._terms.get(word, _EMPTY)
+        terms = sorted((self._terms.get(trigram, _EMPTY) for trigram in trigrams(word)), key=len)
+        # Every trigram present doesn't mean they're in a row: check the survivors
+        return {candidate for candidate in terms[0].intersection(*terms[1:]) if word in candidate}
+
+    def _near_words(self, word):
+        # Words close to `word` -> the share of its trigrams they have
+        wanted = word_trigrams(word)
+        counts = Counter()
+        for trigram in wanted:
+            counts.update(self._terms.get(trigram, ()))
+        return {near: count / len(wanted) for near, count in counts.items()
+                if count >= FUZZY_MIN_SHARE * len(wanted)}
+
+    def search(self, query):
+        # Keys of the matching tracks, in display order; with near misses, closest first
+        words = _WORD.findall(normalize(query))
+        if not words:
+            return list(self._order)
+        matches, near = None, []
+        for word in sorted(set(words), key=len, reverse=True):  # longest words narrow it down fastest
+            found = [self._tracks[match] for match in self._matching_words(word)]
+            if found:
+                labels = set().union(*found)
+            else:
+                shares = {}
+                for match, share in sorted(self._near_words(word).items(), key=lambda item: item[1]):
+                    shares.update(dict.fromkeys(self._tracks[match], share))  # the closest word wins
+                near.append(shares)
+                labels = shares.keys()
+            matches = set(labels) if matches is None else matches.intersection(labels)
+            if not matches:
+                return []
+        labels = sorted(matches)
+        if near:
+            labels.sort(key=lambda label: -sum(shares[label] for shares in near))  # stable: ties keep display order
+        keys = self._keys
+        return [keys[label] for label in labels]
@@ -0,0 +1,133 @@
+# frontend/songlist.py
+# A song list for libraries of any size. A Listbox holds one item per song,
+# created up front; this Canvas only draws the rows in view, reusing the same
+# few canvas items as it scrolls, and asks for a row's text when it's drawn.
+import tkinter as tk
+from tkinter import ttk
+
+ROW_HEIGHT = 20
+WHEEL_ROWS = 3  # rows per mouse wheel notch
+
+
+class SongList(tk.Frame):
+    def __init__(self, parent, label, on_select, row_height=ROW_HEIGHT, bg="white", fg="black",
+                 select_bg="#9B78F0", select_fg="white", **canvas_options):
+        # label(key) -> text of a row; on_select(key) when a row is clicked or Enter is pressed
+        super().__init__(parent, bg=bg)
+        self.label = label
+        self.on_select = on_select
+        self.row_height = row_height
+        self.colors = {False: (bg, fg), True: (select_bg, select_fg)}
+        self.items = []
+        self.row_of = {}      # key -> its row in items
+        self.selected = None  # key of the highlighted row
+        self.top = 0          # pixels scrolled
+        self._rows = []       # (background rectangle, text) canvas items, reused while scrolling
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, takefocus=True, **canvas_options)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Button-1>", self._click)
+        self.canvas.bind("<MouseWheel>", self._wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_by(-WHEEL_ROWS * self.row_height))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_by(WHEEL_ROWS * self.row_height))
+        self.canvas.bind("<Up>", lambda event: self._step(-1))
+        self.canvas.bind("<Down>", lambda event: self._step(1))
+        self.canvas.bind("<Prior>", lambda event: self.scroll_by(-self._view_height()))
+        self.canvas.bind("<Next>", lambda event: self.scroll_by(self._view_height()))
+        self.canvas.bind("<Return>", lambda event: self.selected is not None and self.on_select(self.selected))
+
+    def set_items(self, items):
+        # items: keys in display order, e.g. search results
+        self.items = items
+        self.row_of = {key: row for row, key in enumerate(items)}
+        self.top = 0
+        if self.selected in self.row_of:
+            self.see(self.row_of[self.selected])
+        self.redraw()
+
+    def select(self, key):
+        self.selected = key
+        if key in self.row_of:
+            self.see(self.row_of[key])
+        self.redraw()
+
+    def see(self, index):
+        # Scrolls just enough for row `index` to be in view
+        y = index * self.row_height
+        if y < self.top:
+            self.top = y
+        elif y + self.row_height > self.top + self._view_height():
+            self.top = y + self.row_height - self._view_height()
+        self.scroll_by(0)
+
+    def scroll_by(self, pixels):
+        total = len(self.items) * self.row_height
+        self.top = max(0, min(self.top + pixels, total - self._view_height()))
+        self.redraw()
+
+    def key_at(self, y):
+        # Key of the row at canvas height y, or None below the last row
+        index = (self.top + y) // self.row_height
+        return self.items[index] if index < len(self.items) else None
+
+    def redraw(self):
+        height, width = self._view_height(), self.canvas.winfo_width()
+        first = self.top // self.row_height
+        visible = height // self.row_height + 2
+        while len(self._rows) < visible:
+            self._rows.append((self.canvas.create_rectangle(0, 0, 0, 0, width=0, state=tk.HIDDEN),
+                               self.canvas.create_text(0, 0, anchor=tk.W, state=tk.HIDDEN)))
+        for offset, (background, text) in enumerate(self._rows):
+            index = first + offset
+            if offset >= visible or index >= len(self.items):
+                self.canvas.itemconfigure(background, state=tk.HIDDEN)
+                self.canvas.itemconfigure(text, state=tk.HIDDEN)
+                continue
+            key = self.items[index]
+            y = index * self.row_height - self.top
+            fill, text_fill = self.colors[key == self.selected]
+            self.canvas.coords(background, 0, y, width, y + self.row_height)
+            self.canvas.itemconfigure(background, fill=fill, state=tk.NORMAL)
+            self.canvas.coords(text, 4, y + self.row_height / 2)
+            self.canvas.itemconfigure(text, text=self.label(key), fill=text_fill, state=tk.NORMAL)
+        total = len(self.items) * self.row_height
+        if total > height:
+            self.scrollbar.set(self.top / total, (self.top + height) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _view_height(self):
+        return max(self.row_height, self.canvas.winfo_height())
+
+    def _scrollbar(self, action, amount, unit=None):
+        total = len(self.items) * self.row_height
+        if action == "moveto":
+            self.scroll_by(int(float(amount) * total) - self.top)
+        elif unit == "pages":
+            self.scroll_by(int(amount) * self._view_height())
+        else:
+            self.scroll_by(int(amount) * self.row_height)
+
+    def _wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small steps
+        self.scroll_by((-WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS) * self.row_height)
+
+    def _click(self, event):
+        self.canvas.focus_set()
+        key = self.key_at(event.y)
+        if key is not None:
+            self.selected = key
+            self.redraw()
+            self.on_select(key)
+
+    def _step(self, rows):
+        # Arrow keys move the highlight; Enter plays it
+        if not self.items:
+            return
+        index = self.row_of[self.selected] + rows if self.selected in self.row_of else 0
+        index = max(0, min(index, len(self.items) - 1))
+        self.selected = self.items[index]
+        self.see(index)
@@ -0,0 +1,162 @@
+# frontend/tags.py
+# ID3 tag reading (v1, v2.2, v2.3, v2.4). Only the tag at the start (or the
+# last 128 bytes) of the file is read; frames we don't need are skipped with
+# a seek, so a large embedded picture costs nothing.
+import io
+
+TEXT_FRAMES = {
+    # v2.3/v2.4 id, v2.2 id -> field
+    "TIT2": "title", "TT2": "title",
+    "TPE1": "artist", "TP1": "artist",
+    "TALB": "album", "TAL": "album",
+    "TLEN": "length", "TLE": "length",
+}
+
+PICTURE_FRAMES = ("APIC", "PIC")
+FRONT_COVER = 3  # APIC picture type
+
+_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+# -----------------------------
+# ID3v2
+# -----------------------------
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _remove_unsync(data):
+    return data.replace(b"\xff\x00", b"\xff")
+
+def iter_id3v2_frames(f, wanted):
+    # Yields (frame id, frame body) for the frames in `wanted` and seeks past
+    # the rest. Leaves the file wherever the last frame ended.
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3" or header[3] not in (2, 3, 4):
+        return
+    major, flags = header[3], header[5]
+    end = 10 + _syncsafe(header[6:10])
+
+    if flags & 0x80 and major < 4:
+        # Tag-wide unsynchronisation (v2.2/v2.3): frame sizes refer to the
+        # decoded bytes, so decode the whole tag and walk it in memory
+        f = io.BytesIO(b"\0" * 10 + _remove_unsync(f.read(end - 10)))
+        end = len(f.getvalue())
+    pos = 10
+    if flags & 0x40 and major >= 3:
+        f.seek(pos)
+        size = f.read(4)
+        if len(size) < 4:
+            return
+        # v2.3 counts the bytes after the size field, v2.4 the whole extended header
+        pos += _syncsafe(size) if major == 4 else 4 + int.from_bytes(size, "big")
+
+    id_len, header_len = (3, 6) if major == 2 else (4, 10)
+    while pos + header_len <= end:
+        f.seek(pos)
+        frame_header = f.read(header_len)
+        frame_id = frame_header[:id_len]
+        if len(frame_header) < header_len or not frame_id.isalnum():
+            return  # padding or garbage: no more frames
+        if major == 2:
+            size = int.from_bytes(frame_header[3:6], "big")
+        elif major == 4 and not any(b & 0x80 for b in frame_header[4:8]):
+            size = _syncsafe(frame_header[4:8])
+        else:
+            size = int.from_bytes(frame_header[4:8], "big")  # v2.3, or a v2.4 writer that got it wrong
+        pos += header_len
+        frame_id = frame_id.decode("latin-1")
+        if frame_id in wanted and pos + size <= end:
+            body = f.read(size)
+            if major == 4 and frame_header[9] & 0x02:
+                body = _remove_unsync(body)
+            if major == 4 and frame_header[9] & 0x01:
+                body = body[4:]  # data length indicator
+            if not (major >= 3 and frame_header[9] & 0x0C):  # compressed/encrypted frames are skipped
+                yield frame_id, body
+        pos += size
+
+def decode_text(body):
+    # A text frame: encoding byte, then one or more NUL-separated values; keeps the first
+    if not body:
+        return ""
+    encoding = _ENCODINGS.get(body[0], "latin-1")
+    text = body[1:].decode(encoding, errors="replace")
+    return text.split("\0", 1)[0].strip()
+
+def _skip_terminated(body, pos, encoding):
+    # Position just past a NUL-terminated string in the frame's text encoding
+    if encoding in (1, 2):
+        while pos + 1 < len(body):
+            if body[pos] == 0 and body[pos + 1] == 0:
+                return pos + 2
+            pos += 2
+        return len(body)
+    end = body.find(b"\0", pos)
+    return len(body) if end == -1 else end + 1
+
+def decode_picture(frame_id, body):
+    # APIC (v2.3/v2.4) or PIC (v2.2) frame -> (picture type, image bytes)
+    if len(body) < 5:
+        return None
+    encoding = body[0]
+    if frame_id == "PIC":
+        picture_type, pos = body[4], 5  # 3-letter image format instead of a MIME type
+    else:
+        pos = _skip_terminated(body, 1, 0)  # MIME type is always latin-1
+        if pos >= len(body):
+            return None
+        picture_type, pos = body[pos], pos + 1
+    data = body[_skip_terminated(body, pos, encoding):]
+    return (picture_type, data) if data else None
+
+# -----------------------------
+# ID3v1
+# -----------------------------
+def read_id3v1(f):
+    f.seek(0, io.SEEK_END)
+    if f.tell() < 128:
+        return {}
+    f.seek(-128, io.SEEK_END)
+    tag = f.read(128)
+    if tag[:3] != b"TAG":
+        return {}
+    fields = {}
+    for field, start in (("title", 3), ("artist", 33), ("album", 63)):
+        value = tag[start:start + 30].split(b"\0", 1)[0].decode("latin-1").strip()
+        if value:
+            fields[field] = value
+    return fields
+
+# -----------------------------
+# Public API
+# -----------------------------
+def read_tags(path):
+    # {"title", "artist", "album", "length"} as far as the file has them;
+    # length is TLEN in seconds. ID3v2 values win over ID3v1.
+    with open(path, "rb") as f:
+        fields = read_id3v1(f)
+        for frame_id, body in iter_id3v2_frames(f, TEXT_FRAMES):
+            value = decode_text(body)
+            if value:
+                fields[TEXT_FRAMES[frame_id]] = value
+    if "length" in fields:
+        try:
+            fields["length"] = int(fields["length"]) / 1000
+        except ValueError:
+            del fields["length"]
+    return fields
+
+def read_picture(path):
+    # Bytes of the embedded front cover (or the first picture if none is
+    # marked as front cover), or None. Reads only the tag, never the audio.
+    found = None
+    with open(path, "rb") as f:
+        for frame_id, body in iter_id3v2_frames(f, PICTURE_FRAMES):
+            picture = decode_picture(frame_id, body)
+            if picture is None:
+                continue
+            if picture[0] == FRONT_COVER:
+                return picture[1]
+            if found is None:
+                found = picture[1]
+    return found
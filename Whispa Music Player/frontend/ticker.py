@@ -0,0 +1,56 @@
+# frontend/ticker.py
+# Schedules slider redraws on the Tk loop only when there is something to
+# show: about once per pixel of progress while the window is visible, and
+# not at all while paused or minimized. Track changes and the end of a song
+# are pushed by the playback engine, so nothing here polls for them.
+
+MIN_INTERVAL_MS = 50    # a short song in a wide window doesn't need more than 20 redraws/s
+MAX_INTERVAL_MS = 1000  # the time readout, if any, still moves every second
+
+
+class PlaybackTicker:
+    def __init__(self, root, length, pixels, on_tick):
+        # length(): seconds in the current track; pixels(): width of the
+        # slider. on_tick() redraws the slider.
+        self.root = root
+        self.length = length
+        self.pixels = pixels
+        self.on_tick = on_tick
+        self.playing = False
+        self.visible = True
+        self._after_id = None
+
+    def start(self):
+        self.playing = True
+        self._schedule()
+
+    def stop(self):
+        self.playing = False
+        self._cancel()
+
+    def set_visible(self, visible):
+        self.visible = visible
+        self._schedule()
+
+    def interval_ms(self):
+        # Time for the slider to advance one pixel
+        length = self.length()
+        if length <= 0:
+            return MAX_INTERVAL_MS
+        ms = length * 1000 / max(1, self.pixels())
+        return int(min(MAX_INTERVAL_MS, max(MIN_INTERVAL_MS, ms)))
+
+    def _schedule(self):
+        self._cancel()
+        if self.playing and self.visible:
+            self._after_id = self.root.after(self.interval_ms(), self._tick)
+
+    def _cancel(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        self._after_id = None
+        self.on_tick()
+        self._schedule()
@@ -0,0 +1,7 @@
+# backend/__init__.py
+import os
+import sys
+
+# Backend modules import each other as top-level modules (app.py runs as a
+# script from this folder), so keep them importable as the backend package too.
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
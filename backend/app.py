@@ -1,9 +1,51 @@
-from flask import Flask, request, jsonify
+import os
+import time
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from models import create_user, authenticate
+import backup
+import catalog
+from audit import audit_log
+import media
+import metrics
+import sync
+from ratelimit import allow_login
+from models import create_user, authenticate_user, check_availability
+from sessions import issue_token, revoke_token, verify_token
 
 app = Flask(__name__)
 CORS(app)
+# Let a fronting web server (nginx/Apache) send media files itself
+app.config["USE_X_SENDFILE"] = os.environ.get("WHISPA_X_SENDFILE") == "1"
+
+# -----------------------------
+# Background jobs
+# -----------------------------
+@app.before_request
+def start_background_jobs():
+    # Started by the process that serves requests, under any WSGI server, and
+    # never by the debug reloader's watcher process; a no-op after the first call
+    backup.start_scheduler()  # every WHISPA_BACKUP_INTERVAL hours, off by default
+
+# -----------------------------
+# Metrics (set WHISPA_METRICS=0 to disable)
+# -----------------------------
+if metrics.METRICS_ENABLED:
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        start = g.get("request_start")
+        if start is not None:
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route)
+        metrics.HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+        return response
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.render_all(), mimetype="text/plain; version=0.0.4")
 
 # -----------------------------
 # Signup Route
@@ -25,21 +67,114 @@ def signup():
     success, message = create_user(username, email, password)
     return jsonify({"success": success, "message": message})
 
+# -----------------------------
+# Availability Route (validate the signup form as the user types)
+# -----------------------------
+@app.get("/availability")
+def availability():
+    username = request.args.get("username", "").strip()
+    email = request.args.get("email", "").strip()
+
+    if not username and not email:
+        return jsonify({"success": False, "message": "Username or email is required."}), 400
+
+    return jsonify({"success": True, **check_availability(username, email)})
+
 # -----------------------------
 # Login Route
 # -----------------------------
 @app.post("/login")
 def login():
     data = request.get_json()
+    if not isinstance(data, dict):
+        data = {}
 
     username = data.get("username")
     password = data.get("password")
 
-    if not username or not password:
+    if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
         return jsonify({"success": False, "message": "Username and password are required."}), 400
 
-    success, message = authenticate(username, password)
-    return jsonify({"success": success, "message": message})
+    # Floods are turned away before they cost a lookup and a hash
+    address = request.remote_addr or "unknown"
+    if not allow_login(username, address):
+        audit_log.record(username, address, False, "Rate limited.")
+        return jsonify({"success": False, "message": "Too many login attempts. Try again later."}), 429
+
+    # "username" may also hold the account's email address
+    login_name = username
+    success, message, username = authenticate_user(login_name, password)
+    audit_log.record(login_name, address, success, message)
+    if not success:
+        return jsonify({"success": success, "message": message})
+    return jsonify({"success": success, "message": message, "username": username,
+                    "token": issue_token(username)})
+
+# -----------------------------
+# Logout Route
+# -----------------------------
+@app.post("/logout")
+def logout():
+    data = request.get_json()
+    if not isinstance(data, dict):
+        data = {}
+
+    token = data.get("token")
+    if not token or not revoke_token(token):
+        return jsonify({"success": False, "message": "A valid session token is required."}), 400
+
+    return jsonify({"success": True, "message": "Logged out."})
+
+# -----------------------------
+# Catalog Routes (?limit=&cursor=, ETag / If-None-Match, gzip)
+# -----------------------------
+@app.get("/catalog/movies")
+def movie_catalog():
+    return catalog.page_response("movies", request)
+
+@app.get("/library/tracks")
+def track_library():
+    return catalog.page_response("tracks", request)
+
+# -----------------------------
+# Media Routes (HTTP Range streaming)
+# -----------------------------
+@app.get("/media/music/<path:filename>")
+def stream_music(filename):
+    return media.media_response("music", filename)
+
+@app.get("/media/trailers/<path:filename>")
+def stream_trailer(filename):
+    return media.media_response("trailers", filename)
+
+# -----------------------------
+# Sync Route (favorites / My List deltas)
+# -----------------------------
+@app.post("/sync/<collection>")
+def sync_route(collection):
+    if collection not in sync.COLLECTIONS:
+        return jsonify({"success": False, "message": "Unknown collection."}), 404
+
+    auth = request.headers.get("Authorization", "")
+    username = verify_token(auth[len("Bearer "):] if auth.startswith("Bearer ") else None)
+    if username is None:
+        return jsonify({"success": False, "message": "A valid session token is required."}), 401
+
+    data = request.get_json() or {}
+    try:
+        since = int(data.get("since", 0))
+    except (TypeError, ValueError):
+        since = -1
+    changes = data.get("changes", [])
+    if since < 0 or not isinstance(changes, list) or len(changes) > sync.MAX_CHANGES_PER_SYNC or \
+            not all(sync.valid_change(change) for change in changes):
+        return jsonify({"success": False, "message": "Invalid sync request."}), 400
+
+    try:
+        version, remote_changes = sync.sync_collection(username, collection, since, changes)
+    except LookupError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    return jsonify({"success": True, "version": version, "changes": remote_changes})
 
 # -----------------------------
 # Run the server
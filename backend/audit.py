@@ -0,0 +1,85 @@
+# backend/audit.py
+# Write-behind audit log of login attempts. Request threads only append to
+# a bounded in-memory buffer; a background thread inserts it in batches.
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+from database import get_connection
+
+AUDIT_MAX_PENDING = int(os.environ.get("WHISPA_AUDIT_MAX_PENDING", "50000"))  # oldest dropped beyond this
+AUDIT_BATCH_SIZE = 1000
+AUDIT_FLUSH_INTERVAL = 0.5  # seconds
+
+INSERT_LOGIN_ATTEMPT = ("INSERT INTO login_attempts (attempted_at, login, address, success, reason) "
+                        "VALUES (?, ?, ?, ?, ?)")
+
+AUDIT_DROPPED = metrics.Counter("whispa_audit_dropped_total", "Audit records dropped because the buffer was full.")
+AUDIT_WRITTEN = metrics.Counter("whispa_audit_written_total", "Audit records written to the database.")
+AUDIT_WRITE_FAILURES = metrics.Counter("whispa_audit_write_failures_total",
+                                       "Audit batches that failed to write and were put back.")
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLog:
+    def __init__(self, max_pending=AUDIT_MAX_PENDING, batch_size=AUDIT_BATCH_SIZE,
+                 flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque(maxlen=max_pending)
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def record(self, login, address, success, reason):
+        if len(self._pending) == self._pending.maxlen:
+            AUDIT_DROPPED.inc()  # the append below pushes out the oldest record
+        self._pending.append((time.time(), login, address, 1 if success else 0, reason))
+        if self._thread is None:
+            self._start()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        # Writes everything buffered so far; used by the writer thread and on shutdown
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popleft())
+            try:
+                conn = get_connection()
+                with conn:
+                    conn.executemany(INSERT_LOGIN_ATTEMPT, batch)
+            except Exception:
+                # Back in front, in order, for the next flush; past the bound the newest go
+                overflow = len(self._pending) + len(batch) - self._pending.maxlen
+                if overflow > 0:
+                    AUDIT_DROPPED.inc(amount=overflow)
+                self._pending.extendleft(reversed(batch))
+                AUDIT_WRITE_FAILURES.inc()
+                raise
+            AUDIT_WRITTEN.inc(amount=len(batch))
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit log write failed; retrying in %.1fs", self.flush_interval)
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.flush)
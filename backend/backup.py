@@ -0,0 +1,121 @@
+# backend/backup.py
+# Online backup of users.db with SQLite's backup API, copied a few pages at
+# a time with a pause between steps so logins keep their latency.
+#
+#   python backend/backup.py backup [destination]
+#   python backend/backup.py restore <backup file>
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from database import DB_PATH
+
+BACKUP_DIR = os.environ.get("WHISPA_BACKUP_DIR", os.path.join(os.path.dirname(DB_PATH), "backups"))
+BACKUP_PAGES_PER_STEP = int(os.environ.get("WHISPA_BACKUP_PAGES", "64"))
+BACKUP_STEP_SLEEP = float(os.environ.get("WHISPA_BACKUP_SLEEP", "0.005"))  # seconds between steps
+BACKUP_INTERVAL = float(os.environ.get("WHISPA_BACKUP_INTERVAL", "0"))     # hours, 0 = no schedule
+BACKUP_KEEP = int(os.environ.get("WHISPA_BACKUP_KEEP", "7"))
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Backup / restore
+# -----------------------------
+def backup(destination=None, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    if destination is None:
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        destination = os.path.join(BACKUP_DIR, time.strftime("users-%Y%m%d-%H%M%S.db"))
+    partial = destination + ".partial"
+
+    source = sqlite3.connect(DB_PATH, isolation_level=None)
+    target = sqlite3.connect(partial)
+    try:
+        # Pin one WAL snapshot for the whole copy. Without it, every commit from
+        # another connection restarts the backup, which may then never finish.
+        # WAL readers don't block writers, so signups and logins carry on.
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+        source.backup(target, pages=pages, progress=lambda status, remaining, total: time.sleep(sleep))
+        source.execute("COMMIT")
+    finally:
+        target.close()
+        source.close()
+    os.replace(partial, destination)  # only complete backups get the final name
+    return destination
+
+def restore(backup_path):
+    # Copies a backup over the live database in one step; writers wait on the
+    # lock meanwhile (busy_timeout), readers see the restored data afterwards.
+    source = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
+    target = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def prune(keep=BACKUP_KEEP):
+    if not os.path.isdir(BACKUP_DIR):
+        return
+    backups = sorted(name for name in os.listdir(BACKUP_DIR) if name.startswith("users-") and name.endswith(".db"))
+    for name in backups[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(BACKUP_DIR, name))
+
+# -----------------------------
+# Scheduled backups
+# -----------------------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler(interval_hours=BACKUP_INTERVAL):
+    # Starts the schedule once per process; later calls return the running thread
+    global _scheduler
+    if _scheduler is not None or interval_hours <= 0:
+        return _scheduler
+
+    def run():
+        while True:
+            time.sleep(interval_hours * 3600)
+            try:
+                backup()
+                prune()
+            except Exception:
+                logger.exception("Scheduled backup failed")
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = threading.Thread(target=run, name="backup-scheduler", daemon=True)
+            _scheduler.start()
+    return _scheduler
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up or restore the Whispa users database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backup_cmd = sub.add_parser("backup", help="online backup, safe while the app runs")
+    backup_cmd.add_argument("destination", nargs="?")
+    backup_cmd.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="pages copied per step")
+    backup_cmd.add_argument("--sleep", type=float, default=BACKUP_STEP_SLEEP, help="seconds between steps")
+    restore_cmd = sub.add_parser("restore", help="replace the database with a backup")
+    restore_cmd.add_argument("backup_file")
+    args = parser.parse_args(argv)
+
+    if args.command == "backup":
+        path = backup(args.destination, args.pages, args.sleep)
+        if args.destination is None:
+            prune()
+        print(f"Backed up {DB_PATH} to {path}")
+    else:
+        restore(args.backup_file)
+        print(f"Restored {DB_PATH} from {args.backup_file}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
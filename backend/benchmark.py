@@ -0,0 +1,569 @@
+# backend/benchmark.py
+# Load tests and micro-benchmarks for the auth backend.
+# Run from the Whispa folder, e.g.:  python backend/benchmark.py logins --clients 8
+# Every run uses a throwaway database, never backend/users.db
+# (except `load --url`, which drives an already running server).
+# --scheme picks the password hasher (as WHISPA_HASH_SCHEME would), e.g.
+#   python backend/benchmark.py logins --scheme scrypt
+# `logins` and `signups` default to sha256 so the KDF doesn't hide the rest;
+# `kdf` times only the settings of the given scheme.
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BENCH_PASSWORD = "bench-password"
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def use_temp_database():
+    # Must run before database/models/app are imported: DB_PATH is read at import time
+    tmpdir = tempfile.mkdtemp(prefix="whispa-bench-")
+    os.environ["WHISPA_DB"] = os.path.join(tmpdir, "bench.db")
+    return os.environ["WHISPA_DB"]
+
+
+def seed_users(count):
+    import database
+    for i in range(count):
+        database.create_user(f"user{i}", f"user{i}@example.com", BENCH_PASSWORD)
+
+
+def disable_login_limits():
+    # Benchmarks replaying many logins from one address would otherwise hit the limiter
+    import ratelimit
+    for limiter in (ratelimit.login_user_limiter, ratelimit.login_address_limiter):
+        limiter.rate = limiter.burst = float("inf")
+
+
+def run_concurrent(worker, clients, total):
+    # Splits `total` calls of worker(client_id, i) across `clients` threads,
+    # returns (elapsed seconds, list of per-call latencies)
+    latencies = [[] for _ in range(clients)]
+    barrier = threading.Barrier(clients + 1)
+
+    def run(client_id):
+        calls = range(client_id, total, clients)
+        barrier.wait()
+        for i in calls:
+            start = time.perf_counter()
+            worker(client_id, i)
+            latencies[client_id].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, [lat for per_client in latencies for lat in per_client]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    return (f"p50 {percentile(latencies, 50) * 1000:8.2f} ms  p95 {percentile(latencies, 95) * 1000:8.2f} ms"
+            f"  p99 {percentile(latencies, 99) * 1000:8.2f} ms")
+
+
+def _connect_per_call():
+    # The pre-pool behaviour: a fresh connection (file open, schema read) per query
+    import database
+    return sqlite3.connect(database.DB_PATH)
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def bench_logins(args):
+    # The cheap hasher unless WHISPA_HASH_SCHEME says otherwise: with scrypt the
+    # KDF is most of a login and hides what connection handling costs
+    os.environ.setdefault("WHISPA_HASH_SCHEME", "sha256")
+    use_temp_database()
+    seed_users(args.users)
+
+    import models
+    import passwords
+    from app import app
+    disable_login_limits()
+
+    pooled_get_connection = models.get_connection
+    clients = [app.test_client() for _ in range(args.clients)]
+
+    def login(client_id, i):
+        username = f"user{i % args.users}"
+        resp = clients[client_id].post("/login", json={"username": username, "password": BENCH_PASSWORD})
+        assert resp.get_json()["success"], resp.get_json()
+
+    print(f"logins: {args.requests} requests, {args.clients} concurrent clients, {args.users} users, "
+          f"{passwords.HASH_SCHEME} hashes")
+    for label, get_connection in (("connect per call", _connect_per_call), ("pooled WAL", pooled_get_connection)):
+        models.get_connection = get_connection
+        elapsed, _ = run_concurrent(login, args.clients, args.requests)
+        print(f"  {label:<18} {args.requests / elapsed:10.1f} logins/s")
+    models.get_connection = pooled_get_connection
+
+
+def bench_signups(args):
+    # sha256 unless WHISPA_HASH_SCHEME says otherwise, as for logins: scrypt
+    # would leave every run at the KDF's pace, batched or not
+    os.environ.setdefault("WHISPA_HASH_SCHEME", "sha256")
+    use_temp_database()
+
+    import models
+    import passwords
+    from app import app
+
+    group_writer = models.signup_writer
+    print(f"signups: {args.requests} requests per run, {passwords.HASH_SCHEME} hashes")
+    for clients in (1, 8, 64):
+        test_clients = [app.test_client() for _ in range(clients)]
+        for label, writer in (("commit per signup", models.SignupWriter(max_batch=1)),
+                              ("group commit", group_writer)):
+            models.signup_writer = writer
+            run_id = f"{clients}{label[0]}"
+
+            def signup(client_id, i):
+                username = f"signup{run_id}_{i}"
+                resp = test_clients[client_id].post("/signup", json={
+                    "username": username, "email": f"{username}@example.com", "password": BENCH_PASSWORD})
+                assert resp.get_json()["success"], resp.get_json()
+
+            elapsed, _ = run_concurrent(signup, clients, args.requests)
+            print(f"  {clients:>3} clients  {label:<18} {args.requests / elapsed:10.1f} signups/s")
+    models.signup_writer = group_writer
+
+    # Every signup must still be in the availability filters, whatever rebuilds ran meanwhile,
+    # including one made the way login.py makes them (not through models), and the database
+    # must refuse an email differing only in case (past the filter check)
+    import database
+    database.create_user("signup_outside", "signup_outside@example.com", BENCH_PASSWORD)
+    rows = models.get_connection().execute(database.SELECT_IDENTITIES_AFTER, (0,)).fetchall()
+    lost = sum(1 for _, username, email in rows
+               if not (models.username_taken(username) and models.email_taken(email)))
+    success, _ = models.signup_writer.submit("signup_case", rows[0][2].upper(), "x", "x")
+    print(f"  availability: {lost} of {len(rows)} signups missing, case-variant email "
+          f"{'accepted' if success else 'refused'}")
+    if lost or success:
+        sys.exit(1)
+
+
+def _http_poster(base_url):
+    def post(path, payload):
+        req = urllib.request.Request(base_url + path, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return json.loads(e.read() or b"{}")
+    return post
+
+
+def _test_client_poster(app):
+    local = threading.local()
+
+    def post(path, payload):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        return client.post(path, json=payload).get_json()
+    return post
+
+
+def bench_load(args):
+    # Signs up a population of users, then logs them in, through one of:
+    #   --url URL   an already running server
+    #   --serve     the app on a local port (real HTTP, threaded dev server)
+    #   default     the Flask test client (no sockets)
+    server = None
+    if args.url:
+        post = _http_poster(args.url.rstrip("/"))
+        transport = args.url
+    else:
+        use_temp_database()
+        from app import app
+        disable_login_limits()
+        if args.serve:
+            from werkzeug.serving import make_server
+            server = make_server("127.0.0.1", args.port, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            transport = f"http://127.0.0.1:{server.server_port}"
+            post = _http_poster(transport)
+        else:
+            post = _test_client_poster(app)
+            transport = "Flask test client"
+
+    prefix = f"load{int(time.time())}_"
+    failures = {"signup": 0, "login": 0}
+    failures_lock = threading.Lock()
+
+    def failed(route):
+        with failures_lock:
+            failures[route] += 1
+
+    def signup(client_id, i):
+        username = f"{prefix}{i}"
+        result = post("/signup", {"username": username, "email": f"{username}@example.com",
+                                  "password": BENCH_PASSWORD})
+        if not result.get("success"):
+            failed("signup")
+
+    def login(client_id, i):
+        result = post("/login", {"username": f"{prefix}{i % args.users}", "password": BENCH_PASSWORD})
+        if not result.get("success"):
+            failed("login")
+
+    print(f"load: {transport}, {args.clients} concurrent clients, {args.users} users, {args.requests} logins")
+    try:
+        for route, worker, total in (("/signup", signup, args.users), ("/login", login, args.requests)):
+            elapsed, latencies = run_concurrent(worker, args.clients, total)
+            print(f"  {route:<8} {total / elapsed:9.1f} req/s  {latency_summary(latencies)}"
+                  f"  failed {failures[route.strip('/')]}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+def _calibrate(fn, min_round_time):
+    # Doubles the iterations per round until one round takes min_round_time
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start >= min_round_time or iterations >= 1 << 20:
+            return iterations
+        iterations *= 2
+
+
+def bench_micro(args):
+    use_temp_database()
+    seed_users(args.users)
+
+    import database
+    import models
+
+    counter = itertools.count()
+    cases = {
+        "get_user_by_username": lambda: database.get_user_by_username(f"user{next(counter) % args.users}"),
+        "create_user": lambda: models.create_user(f"micro{next(counter)}", f"micro{next(counter)}@example.com",
+                                                  BENCH_PASSWORD),
+        "authenticate": lambda: models.authenticate(f"user{next(counter) % args.users}", BENCH_PASSWORD),
+    }
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"micro: {args.rounds} rounds per case (times per call)")
+    print(f"  {'name':<22} {'min':>10} {'max':>10} {'mean':>10} {'stddev':>10} {'median':>10} {'ops/s':>10}")
+    for name, fn in cases.items():
+        iterations = _calibrate(fn, args.min_round_time)
+        per_call = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            per_call.append((time.perf_counter() - start) / iterations)
+        median = statistics.median(per_call)
+        results[name] = median
+        line = (f"  {name:<22} {min(per_call) * 1e6:8.1f}us {max(per_call) * 1e6:8.1f}us"
+                f" {statistics.mean(per_call) * 1e6:8.1f}us {statistics.pstdev(per_call) * 1e6:8.1f}us"
+                f" {median * 1e6:8.1f}us {1 / median:10.1f}")
+        if name in baseline:
+            line += f"  ({(median / baseline[name] - 1) * 100:+.1f}% vs baseline)"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def bench_schema(args):
+    # Checks both login lookups are index-backed, then times them on a large table
+    use_temp_database()
+    import database
+
+    conn = database.get_connection()
+    print(f"schema: {args.population} users, {args.requests} lookups per index")
+    for label, sql in (("username", database.SELECT_LOGIN_BY_USERNAME), ("email", database.SELECT_LOGIN_BY_EMAIL)):
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, ("x",)))
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, f"{label} lookup scans: {plan}"
+        print(f"  {label:<9} plan: {plan}")
+
+    start = time.perf_counter()
+    batch = 50000
+    with conn:
+        for first in range(0, args.population, batch):
+            conn.executemany(database.INSERT_USER, (
+                (f"user{i}", f"User{i}@Example.com", "x", "x")
+                for i in range(first, min(first + batch, args.population))))
+    print(f"  inserted {args.population} users in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    database.create_tables()
+    print(f"  startup schema check {(time.perf_counter() - start) * 1e6:.1f} us")
+
+    for label, sql, make_key in (
+            ("username", database.SELECT_LOGIN_BY_USERNAME, lambda i: f"user{i}"),
+            ("email", database.SELECT_LOGIN_BY_EMAIL, lambda i: f"user{i}@example.com")):
+        keys = [make_key((i * 7919) % args.population) for i in range(args.requests)]
+        start = time.perf_counter()
+        for key in keys:
+            assert conn.execute(sql, (key,)).fetchone() is not None
+        per_lookup = (time.perf_counter() - start) / len(keys)
+        print(f"  {label:<9} lookup {per_lookup * 1e6:8.1f} us over {args.population} users")
+
+
+def bench_media(args):
+    # Concurrent clients fetch random byte ranges (like seeking players) and
+    # whole files from the app served on a local port
+    use_temp_database()
+    from werkzeug.serving import make_server
+    import catalog
+    from app import app
+
+    files = sorted(name for name in os.listdir(catalog.MUSIC_FOLDER) if name.endswith(".mp3"))
+    sizes = {name: os.path.getsize(os.path.join(catalog.MUSIC_FOLDER, name)) for name in files}
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/media/music/"
+    transferred = [0] * args.clients
+
+    def fetch(client_id, i, ranged):
+        name = files[i % len(files)]
+        req = urllib.request.Request(base + urllib.request.quote(name))
+        if ranged:
+            start = random.randrange(0, max(1, sizes[name] - args.chunk))
+            req.add_header("Range", f"bytes={start}-{start + args.chunk - 1}")
+        with urllib.request.urlopen(req) as resp:
+            assert resp.status == (206 if ranged else 200), resp.status
+            assert resp.headers["Accept-Ranges"] == "bytes"
+            transferred[client_id] += len(resp.read())
+
+    print(f"media: {len(files)} files, {args.clients} concurrent clients")
+    try:
+        for label, ranged, total in (("range requests", True, args.requests), ("whole files", False, len(files) * 4)):
+            transferred[:] = [0] * args.clients
+            elapsed, latencies = run_concurrent(lambda c, i: fetch(c, i, ranged), args.clients, total)
+            print(f"  {label:<15} {total / elapsed:8.1f} req/s {sum(transferred) / elapsed / 2 ** 20:8.1f} MiB/s"
+                  f"  {latency_summary(latencies)}")
+    finally:
+        server.shutdown()
+
+
+def bench_flood(args):
+    # Many clients hammer one account with bad passwords from one address
+    use_temp_database()
+    seed_users(1)
+
+    import ratelimit
+    from app import app
+
+    clients = [app.test_client() for _ in range(args.clients)]
+    statuses = [[] for _ in range(args.clients)]
+
+    def bad_login(client_id, i):
+        resp = clients[client_id].post("/login", json={"username": "user0", "password": "wrong"})
+        statuses[client_id].append(resp.status_code)
+
+    print(f"flood: {args.requests} bad-password logins, {args.clients} concurrent clients")
+    limiters = (ratelimit.login_user_limiter, ratelimit.login_address_limiter)
+    limits = [(limiter.rate, limiter.burst) for limiter in limiters]
+    for label, enabled in (("no limiter", False), ("token buckets", True)):
+        for limiter, (rate, burst) in zip(limiters, limits):
+            limiter.rate, limiter.burst = (rate, burst) if enabled else (float("inf"), float("inf"))
+            limiter._buckets.clear()
+        for per_client in statuses:
+            per_client.clear()
+        elapsed, latencies = run_concurrent(bad_login, args.clients, args.requests)
+        rejected = sum(status == 429 for per_client in statuses for status in per_client)
+        print(f"  {label:<14} {args.requests / elapsed:9.1f} req/s  {latency_summary(latencies)}"
+              f"  rejected {rejected / args.requests:6.1%}")
+
+
+def bench_backup(args):
+    # /login latency with no backup running, during a one-shot backup and
+    # during the stepped (throttled) online backup
+    use_temp_database()
+    seed_users(args.users)
+
+    import backup
+    import database
+    from app import app
+    disable_login_limits()
+
+    # Pad the database with audit rows so a backup takes a while
+    conn = database.get_connection()
+    with conn:
+        conn.executemany("INSERT INTO login_attempts (attempted_at, login, address, success, reason) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         ((time.time(), f"user{i}", "127.0.0.1", 1, "ok") for i in range(args.population)))
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # into the main file, so its size is the database's
+    size = os.path.getsize(database.DB_PATH)
+    clients = [app.test_client() for _ in range(args.clients)]
+    backup_dir = tempfile.mkdtemp(prefix="whispa-bench-backups-")
+
+    def login(client_id, i):
+        resp = clients[client_id].post("/login", json={"username": f"user{i % args.users}",
+                                                       "password": BENCH_PASSWORD})
+        assert resp.get_json()["success"], resp.get_json()
+
+    print(f"backup: {args.requests} logins, {args.clients} concurrent clients, "
+          f"{size / 2 ** 20:.1f} MiB database")
+    for label, options in (("no backup", None),
+                           ("one-step backup", {"pages": -1, "sleep": 0}),
+                           ("stepped backup", {})):
+        worker = None
+        took = []
+        if options is not None:
+            def run_backup(options=options):
+                start = time.perf_counter()
+                backup.backup(os.path.join(backup_dir, f"{len(os.listdir(backup_dir))}.db"), **options)
+                took.append(time.perf_counter() - start)
+            worker = threading.Thread(target=run_backup)
+            worker.start()
+        elapsed, latencies = run_concurrent(login, args.clients, args.requests)
+        if worker is not None:
+            worker.join()
+        note = f"  backup took {took[0]:.2f}s" if took else ""
+        print(f"  {label:<16} {args.requests / elapsed:8.1f} logins/s  {latency_summary(latencies)}{note}")
+
+
+def bench_tkloop(args):
+    # How long the Tk event loop stalls while logins are checked inline (the
+    # old do_login) versus on a worker thread (login.py). Needs a display.
+    use_temp_database()
+    seed_users(1)
+
+    import tkinter as tk
+    import database
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from background import BackgroundRunner, StallMonitor
+
+    def check_login():
+        user = database.get_user_by_login("user0")
+        assert database.verify_password(BENCH_PASSWORD, user[3], user[4])
+
+    root = tk.Tk()
+    root.withdraw()
+    print(f"tkloop: {args.samples} logins, event loop ticking every 5 ms")
+    for label, on_worker in (("main thread", False), ("worker thread", True)):
+        runner = BackgroundRunner(root)
+        monitor = StallMonitor(root)
+        remaining = [args.samples]
+        errors = []
+
+        def next_login(_=None):
+            if remaining[0] == 0:
+                root.quit()
+                return
+            remaining[0] -= 1
+            if on_worker:
+                runner.submit(check_login, next_login, lambda e: (errors.append(e), root.quit()))
+            else:
+                check_login()
+                root.after(0, next_login)
+
+        start = time.perf_counter()
+        monitor.start()
+        root.after(0, next_login)
+        root.mainloop()
+        delays = monitor.stop()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise errors[0]
+        print(f"  {label:<14} max stall {max(delays) * 1000:8.2f} ms  {latency_summary(delays)}"
+              f"  {args.samples / elapsed:7.1f} logins/s")
+    root.destroy()
+
+
+KDF_SETTINGS = (
+    ("sha256", {}),
+    ("pbkdf2_sha256", {"i": 100000}),
+    ("pbkdf2_sha256", {"i": 300000}),
+    ("pbkdf2_sha256", {"i": 600000}),
+    ("scrypt", {"n": 2 ** 12, "r": 8, "p": 1}),
+    ("scrypt", {"n": 2 ** 14, "r": 8, "p": 1}),
+    ("scrypt", {"n": 2 ** 15, "r": 8, "p": 1}),
+)
+
+
+def bench_kdf(args):
+    import passwords
+
+    print(f"kdf: {args.samples} hashes per setting, {args.clients} concurrent clients, "
+          f"{passwords.HASH_WORKERS} hash workers")
+    for scheme, params in KDF_SETTINGS:
+        if args.scheme and scheme != args.scheme:
+            continue
+
+        def hash_once(client_id, i):
+            passwords.hash_password(BENCH_PASSWORD, scheme, params)
+
+        elapsed, latencies = run_concurrent(hash_once, args.clients, args.samples)
+        label = passwords.encode_hash(scheme, params, "").rstrip("$") or "sha256 (legacy)"
+        print(f"  {label:<26} {latency_summary(latencies)}  {args.samples / elapsed:9.1f} hashes/s")
+
+
+BENCHMARKS = {
+    "logins": bench_logins,
+    "signups": bench_signups,
+    "kdf": bench_kdf,
+    "flood": bench_flood,
+    "backup": bench_backup,
+    "tkloop": bench_tkloop,
+    "load": bench_load,
+    "media": bench_media,
+    "schema": bench_schema,
+    "micro": bench_micro,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Whispa backend benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="total requests per run")
+    parser.add_argument("--users", type=int, default=100, help="users seeded before the run")
+    parser.add_argument("--samples", type=int, default=40, help="hashes per cost setting (kdf), logins (tkloop)")
+    parser.add_argument("--population", type=int, default=1000000, help="users in the table (schema), audit rows (backup)")
+    parser.add_argument("--url", help="drive an already running server instead (load)")
+    parser.add_argument("--serve", action="store_true", help="serve the app on a local port (load)")
+    parser.add_argument("--port", type=int, default=0, help="port for --serve, 0 picks a free one (load)")
+    parser.add_argument("--chunk", type=int, default=256 * 1024, help="bytes per range request (media)")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per case (micro)")
+    parser.add_argument("--min-round-time", type=float, default=0.05, help="seconds per round (micro)")
+    parser.add_argument("--save", help="write median times per case to this JSON file (micro)")
+    parser.add_argument("--compare", help="report change against a file written by --save (micro)")
+    parser.add_argument("--scheme", choices=sorted({scheme for scheme, _ in KDF_SETTINGS}),
+                        help="password hasher for new hashes, instead of WHISPA_HASH_SCHEME "
+                             "(kdf: time only this scheme's settings)")
+    args = parser.parse_args(argv)
+    if args.scheme:
+        os.environ["WHISPA_HASH_SCHEME"] = args.scheme  # read when passwords is first imported
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# backend/catalog.py
+# Movie catalog and music library as paginated JSON resources. Pages carry a
+# strong ETag, so clients revalidate with If-None-Match and get a 304 back.
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+from flask import Response
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOVIES_PATH = os.path.join(ROOT_DIR, "Whispa Movie Player", "movies.json")
+MUSIC_FOLDER = os.path.join(ROOT_DIR, "Whispa Music Player", "music")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+GZIP_MIN_BYTES = 1024   # smaller bodies aren't worth compressing
+PAGE_CACHE_SIZE = 256   # encoded pages kept ready to send
+
+_lock = threading.Lock()
+_sources = {}              # resource -> (version, items, keys)
+_page_cache = OrderedDict()  # (resource, version, cursor, limit) -> (body, gzipped body, etag)
+
+# -----------------------------
+# Resources
+# -----------------------------
+def _movies_version():
+    return os.stat(MOVIES_PATH).st_mtime_ns
+
+def _load_movies():
+    with open(MOVIES_PATH, encoding="utf-8") as f:
+        return sorted(json.load(f), key=lambda movie: movie["id"])
+
+def _tracks_version():
+    # A folder's mtime changes whenever a file is added, removed or renamed
+    return os.stat(MUSIC_FOLDER).st_mtime_ns
+
+def _load_tracks():
+    tracks = []
+    for entry in os.scandir(MUSIC_FOLDER):
+        if entry.is_file() and entry.name.endswith(".mp3"):
+            tracks.append({
+                "id": entry.name,
+                "title": os.path.splitext(entry.name)[0],
+                "file": entry.name,
+                "size": entry.stat().st_size,
+            })
+    return sorted(tracks, key=lambda track: track["id"])
+
+RESOURCES = {
+    "movies": (_movies_version, _load_movies),
+    "tracks": (_tracks_version, _load_tracks),
+}
+
+def _source(resource):
+    # Items sorted by id, reloaded only when the underlying file/folder changes
+    version_of, load = RESOURCES[resource]
+    version = version_of()
+    with _lock:
+        cached = _sources.get(resource)
+    if cached is not None and cached[0] == version:
+        return cached
+    items = load()
+    cached = (version, items, [item["id"] for item in items])
+    with _lock:
+        _sources[resource] = cached
+    return cached
+
+# -----------------------------
+# Pagination
+# -----------------------------
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).rstrip(b"=").decode()
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor.") from None
+
+def _page(items, keys, cursor, limit):
+    start = 0
+    if cursor:
+        start = bisect_right(keys, decode_cursor(cursor))  # first item after the cursor's key
+    page = items[start:start + limit]
+    more = start + limit < len(items)
+    payload = {
+        "items": page,
+        "next_cursor": encode_cursor(page[-1]["id"]) if more and page else None,
+        "total": len(items),
+    }
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+    return body, gzipped, etag
+
+# -----------------------------
+# HTTP
+# -----------------------------
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return f'"{etag}"' in [tag.strip() for tag in if_none_match.split(",")]
+
+def _accepts_gzip(accept_encoding):
+    # "gzip;q=0" refuses gzip, and so does "*;q=0" unless gzip is listed itself
+    weights = {}
+    for entry in accept_encoding.split(","):
+        coding, *params = entry.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    return weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0))) > 0
+
+def page_response(resource, request):
+    try:
+        limit = min(MAX_PAGE_SIZE, max(1, int(request.args.get("limit", DEFAULT_PAGE_SIZE))))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    cursor = request.args.get("cursor") or None
+
+    version, items, keys = _source(resource)
+    key = (resource, version, cursor, limit)
+    with _lock:
+        cached = _page_cache.get(key)
+        if cached is not None:
+            _page_cache.move_to_end(key)
+    if cached is None:
+        try:
+            cached = _page(items, keys, cursor, limit)
+        except (ValueError, TypeError):
+            return Response(json.dumps({"success": False, "message": "Invalid cursor."}), status=400,
+                            mimetype="application/json")
+        with _lock:
+            _page_cache[key] = cached
+            if len(_page_cache) > PAGE_CACHE_SIZE:
+                _page_cache.popitem(last=False)
+    body, gzipped, etag = cached
+
+    # Each encoding is its own representation, so it gets its own strong ETag
+    use_gzip = gzipped is not None and _accepts_gzip(request.headers.get("Accept-Encoding", ""))
+    if use_gzip:
+        etag += "-gz"
+    headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(gzipped, mimetype="application/json", headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
@@ -0,0 +1,88 @@
+# backend/catalog_client.py
+# Client side of the paginated catalog resources (/catalog/movies,
+# /library/tracks). Each page is kept on disk with its ETag, so refreshing
+# is one conditional GET per page, answered with a 304 while nothing
+# changed, and the last copy fetched is still there when the backend isn't.
+import gzip
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+
+API_URL = os.environ.get("WHISPA_API", "http://127.0.0.1:5000")
+STATE_DIR = os.environ.get("WHISPA_STATE_DIR", os.path.join(os.path.expanduser("~"), ".whispa"))
+CATALOG_TIMEOUT = 2  # seconds; windows wait on this while they open
+PAGE_SIZE = 200      # the server's largest page (catalog.MAX_PAGE_SIZE)
+
+
+def fetch_items(path, name):
+    # Every item of the resource at `path`, in the server's order. Offline,
+    # the copy saved under `name` last time; None if there is none.
+    cache_path = os.path.join(STATE_DIR, f"catalog-{name}.json")
+    cached = _load(cache_path)
+    pages = {}  # cursor ("" for the first page) -> {"etag": ..., "page": ...}
+    cursor = ""
+    try:
+        while cursor is not None and cursor not in pages:
+            pages[cursor] = _fetch_page(path, cursor, cached.get(cursor))
+            cursor = pages[cursor]["page"]["next_cursor"] or None
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError):
+        return _items(cached)
+    if pages != cached:
+        _save(cache_path, pages)
+    return _items(pages)
+
+
+def _fetch_page(path, cursor, cached):
+    query = {"limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})}
+    headers = {"Accept-Encoding": "gzip"}
+    if cached is not None:
+        headers["If-None-Match"] = cached["etag"]
+    req = urllib.request.Request(f"{API_URL}{path}?{urllib.parse.urlencode(query)}", headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=CATALOG_TIMEOUT) as resp:
+            body = resp.read()
+            if resp.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return {"etag": resp.headers["ETag"], "page": json.loads(body)}
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and cached is not None:
+            return cached  # unchanged since we saved it
+        raise
+
+
+def _items(pages):
+    # Follows the cursors from the first page; None unless all pages are there
+    items, cursor, seen = [], "", set()
+    try:
+        while cursor is not None:
+            if cursor not in pages or cursor in seen:
+                return None
+            seen.add(cursor)
+            page = pages[cursor]["page"]
+            items += page["items"]
+            cursor = page["next_cursor"] or None
+    except (KeyError, TypeError):
+        return None  # a cache file from another version
+    return items
+
+
+def _load(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            pages = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return pages if isinstance(pages, dict) else {}
+
+
+def _save(path, pages):
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # only a cache: the next start fetches it again
@@ -1,34 +1,162 @@
 # backend/database.py
 import sqlite3
-import hashlib
 import os
+import queue
+import threading
+import weakref
+import metrics
+from migrations import migrate
+from passwords import hash_password, verify_password, needs_rehash
 
-DB_PATH = "backend/users.db"  # Adjust path to be relative to Whispa folder
+DB_PATH = os.environ.get("WHISPA_DB", "backend/users.db")  # Adjust path to be relative to Whispa folder
+
+# Per-connection tuning, applied once when a thread opens its connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # readers never block the writer
+    "PRAGMA synchronous=NORMAL",    # fsync on checkpoint, not on every commit (safe with WAL)
+    "PRAGMA cache_size=-8000",      # ~8 MB page cache per connection
+    "PRAGMA mmap_size=67108864",    # 64 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Prepared statement cache size per connection (sqlite3 reuses statements by SQL text)
+STATEMENT_CACHE_SIZE = 128
+
+# Shared SQL text, so every caller hits the same cached prepared statement
+SELECT_USER_BY_USERNAME = "SELECT * FROM users WHERE username=?"
+SELECT_USER_BY_EMAIL = "SELECT * FROM users WHERE email = ? COLLATE NOCASE"
+SELECT_LOGIN_BY_USERNAME = "SELECT username, password_hash, salt FROM users WHERE username = ?"
+SELECT_LOGIN_BY_EMAIL = "SELECT username, password_hash, salt FROM users WHERE email = ? COLLATE NOCASE"
+INSERT_USER = "INSERT INTO users (username, email, password_hash, salt) VALUES (?, ?, ?, ?)"
+SELECT_USERNAME_EXISTS = "SELECT 1 FROM users WHERE username = ?"
+SELECT_EMAIL_EXISTS = "SELECT 1 FROM users WHERE email = ? COLLATE NOCASE"
+SELECT_IDENTITIES_AFTER = "SELECT id, username, email FROM users WHERE id > ? ORDER BY id"
+UPDATE_PASSWORD_HASH = "UPDATE users SET password_hash = ?, salt = ? WHERE username = ? AND password_hash = ?"
+
+# Metric labels for the shared statements; anything else is reported as "other"
+QUERY_NAMES = {
+    SELECT_USER_BY_USERNAME: "select_user_by_username",
+    SELECT_USER_BY_EMAIL: "select_user_by_email",
+    SELECT_LOGIN_BY_USERNAME: "select_login_by_username",
+    SELECT_LOGIN_BY_EMAIL: "select_login_by_email",
+    INSERT_USER: "insert_user",
+    SELECT_USERNAME_EXISTS: "select_username_exists",
+    SELECT_EMAIL_EXISTS: "select_email_exists",
+    SELECT_IDENTITIES_AFTER: "select_identities_after",
+    UPDATE_PASSWORD_HASH: "update_password_hash",
+}
+
+# NOCASE folds ASCII letters only; code comparing emails outside SQL folds the same way
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def fold_email(email):
+    return email.translate(_NOCASE)
 
 # -----------------------------
 # Connection
 # -----------------------------
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+POOL_SIZE = 16  # idle connections kept open for reuse
+
+_local = threading.local()
+_idle = queue.LifoQueue(maxsize=POOL_SIZE)
+_open_lock = threading.Lock()
+_open = set()  # every live connection, so close_all_connections() can reach them
+
+
+class _TimedConnection(sqlite3.Connection):
+    # Reports per-statement latency to metrics; only used while metrics are enabled
+    def execute(self, sql, parameters=()):
+        with metrics.Timer(metrics.DB_QUERY_LATENCY, QUERY_NAMES.get(sql, "other")):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        with metrics.Timer(metrics.DB_QUERY_LATENCY, QUERY_NAMES.get(sql, "other")):
+            return super().executemany(sql, parameters)
+
+
+class _Lease:
+    # Held in thread-local storage; when the thread exits the lease is
+    # collected and its connection goes back to the idle pool.
+    def __init__(self, conn):
+        self.conn = conn
+        weakref.finalize(self, _release, conn)
+
+
+def _open_connection():
+    factory = _TimedConnection if metrics.METRICS_ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False,
+                           factory=factory)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with _open_lock:
+        _open.add(conn)
+    metrics.DB_CONNECTIONS_OPENED.inc()
     return conn
 
+
+def _close(conn):
+    with _open_lock:
+        _open.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def _release(conn):
+    with _open_lock:
+        if conn not in _open:
+            return  # already closed by close_all_connections()
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _idle.put_nowait(conn)
+    except (queue.Full, sqlite3.Error):
+        _close(conn)
+
+
+def get_connection():
+    # One connection per thread, borrowed from the pool; callers must not close it
+    lease = getattr(_local, "lease", None)
+    if lease is None:
+        try:
+            conn = _idle.get_nowait()
+        except queue.Empty:
+            conn = _open_connection()
+        lease = _Lease(conn)
+        _local.lease = lease
+    return lease.conn
+
+
+def release_connection():
+    # Hand this thread's connection back early (e.g. a long-lived worker going idle)
+    _local.lease = None
+
+
+metrics.Gauge("whispa_db_connections_open", "SQLite connections currently open.", lambda: len(_open))
+metrics.Gauge("whispa_db_connections_idle", "Open SQLite connections waiting in the pool.", _idle.qsize)
+
+
+def close_all_connections():
+    _local.lease = None
+    with _open_lock:
+        conns = list(_open)
+    for conn in conns:
+        _close(conn)
+    while True:
+        try:
+            _idle.get_nowait()
+        except queue.Empty:
+            break
+
 # -----------------------------
 # Table setup
 # -----------------------------
 def create_tables():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL, 
-            password_hash TEXT NOT NULL,
-            salt TEXT NOT NULL
-        );
-    """)
-    conn.commit()
-    conn.close()
+    # Applies pending migrations; a current database costs one PRAGMA read
+    migrate(get_connection())
 
 create_tables()
 
@@ -37,21 +165,28 @@ create_tables()
 # -----------------------------
 def get_user_by_username(username):
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username=?", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    return conn.execute(SELECT_USER_BY_USERNAME, (username,)).fetchone()
+
+def get_user_by_login(login):
+    # Accepts a username or an email address; both lookups are index-backed
+    user = get_user_by_username(login)
+    if user is None and "@" in login:
+        user = get_connection().execute(SELECT_USER_BY_EMAIL, (login,)).fetchone()
     return user
 
 def create_user(username, email, password):
-    salt = os.urandom(16).hex()
-    pw_hash = hashlib.sha256((password + salt).encode()).hexdigest()
+    pw_hash, salt = hash_password(password)
+    conn = get_connection()
+    with conn:
+        conn.execute(INSERT_USER, (username, email, pw_hash, salt))
+
+def rehash_password_if_needed(username, password, stored_hash):
+    # Call after a successful verify: moves legacy or outdated hashes to the
+    # current scheme. The WHERE on the old hash skips rows changed meanwhile.
+    if not needs_rehash(stored_hash):
+        return False
+    pw_hash, salt = hash_password(password)
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO users (username, email, password_hash, salt) VALUES (?, ?, ?, ?)",
-                   (username, email, pw_hash, salt))
-    conn.commit()
-    conn.close()
-
-def verify_password(password, pw_hash, salt):
-    return hashlib.sha256((password + salt).encode()).hexdigest() == pw_hash
+    with conn:
+        cursor = conn.execute(UPDATE_PASSWORD_HASH, (pw_hash, salt, username, stored_hash))
+    return cursor.rowcount == 1
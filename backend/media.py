@@ -0,0 +1,31 @@
+# backend/media.py
+# Streams music and trailers with HTTP Range support, so players can seek
+# and many seats can share one box.
+import os
+
+from flask import abort, send_from_directory
+
+from catalog import MUSIC_FOLDER, ROOT_DIR
+
+TRAILER_FOLDER = os.path.join(ROOT_DIR, "Whispa Movie Player", "assets", "trailers")
+
+MEDIA_CACHE_SECONDS = 3600
+
+# kind -> (folder, allowed extensions, mimetype)
+MEDIA = {
+    "music": (MUSIC_FOLDER, (".mp3",), "audio/mpeg"),
+    "trailers": (TRAILER_FOLDER, (".mp4",), "video/mp4"),
+}
+
+
+def media_response(kind, filename):
+    folder, extensions, mimetype = MEDIA[kind]
+    if not filename.lower().endswith(extensions):
+        abort(404)
+    # send_from_directory rejects paths escaping the folder. conditional=True
+    # answers Range/If-Range with 206 + Content-Range and advertises
+    # Accept-Ranges. The file object goes to the server's wsgi.file_wrapper
+    # (sendfile on servers that support it) or, with USE_X_SENDFILE, to the
+    # fronting web server.
+    return send_from_directory(folder, filename, mimetype=mimetype, conditional=True, etag=True,
+                               max_age=MEDIA_CACHE_SECONDS)
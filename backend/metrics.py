@@ -0,0 +1,206 @@
+# backend/metrics.py
+# Prometheus-style instrumentation. Every thread writes to its own shard
+# (no locks on the hot path); a scrape sums the shards. Shards of finished
+# threads are folded into a retired total so per-request threads don't pile up.
+import bisect
+import os
+import threading
+import time
+import weakref
+
+METRICS_ENABLED = os.environ.get("WHISPA_METRICS", "1") != "0"
+
+# Latency buckets in seconds, from sub-millisecond queries to slow hashes
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PROCESS_START_TIME = time.time()
+
+_registry = []
+
+# -----------------------------
+# Per-thread storage
+# -----------------------------
+class _ShardOwner:
+    # Lives in the owning thread's local storage; collected when the thread exits
+    def __init__(self, metric, shard):
+        weakref.finalize(self, metric._retire, shard)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = {}  # id(shard) -> shard; ids, since equal dicts are not the same shard
+        self._retired = {}
+        _registry.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            self._local.owner = _ShardOwner(self, shard)
+            with self._lock:
+                self._shards[id(shard)] = shard
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._shards.pop(id(shard), None)
+            self._merge(self._retired, shard)
+
+    def _snapshot(self):
+        with self._lock:
+            total = {}
+            self._merge(total, self._retired)
+            for shard in self._shards.values():
+                self._merge(total, dict(shard))  # dict() copies atomically under the GIL
+        return total
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        if METRICS_ENABLED:
+            shard = self._shard()
+            shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, total, shard):
+        for labels, value in shard.items():
+            total[labels] = total.get(labels, 0) + value
+
+    def render(self):
+        for labels, value in sorted(self._snapshot().items()):
+            yield f"{self.name}{self._labels(labels)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if METRICS_ENABLED:
+            shard = self._shard()
+            row = shard.get(labels)
+            if row is None:
+                # one slot per bucket, +Inf, then the running sum
+                row = shard[labels] = [0] * (len(self.buckets) + 2)
+            row[bisect.bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+
+    def _merge(self, total, shard):
+        for labels, row in shard.items():
+            row = list(row)
+            current = total.get(labels)
+            total[labels] = row if current is None else [a + b for a, b in zip(current, row)]
+
+    def render(self):
+        for labels, row in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{self._labels(labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{self._labels(labels)} {_number(row[-1])}"
+            yield f"{self.name}_count{self._labels(labels)} {cumulative}"
+
+
+class Gauge:
+    # Read from a callback at scrape time; nothing to update on the hot path
+    def __init__(self, name, help_text, read, kind="gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.kind = kind
+        _registry.append(self)
+
+    def render(self):
+        value = self.read()
+        if value is not None:
+            yield f"{self.name} {_number(value)}"
+
+
+class Timer:
+    # with Timer(histogram, "label"): ... observes the elapsed seconds
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, *labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_all():
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# -----------------------------
+# Process stats
+# -----------------------------
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+def _resident_memory():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+Gauge("process_cpu_seconds_total", "User and system CPU time in seconds.", _cpu_seconds, kind="counter")
+Gauge("process_resident_memory_bytes", "Resident memory size in bytes.", _resident_memory)
+Gauge("process_open_fds", "Number of open file descriptors.", _open_fds)
+Gauge("process_start_time_seconds", "Start time of the process since the epoch in seconds.",
+      lambda: PROCESS_START_TIME)
+Gauge("process_threads", "Number of Python threads.", threading.active_count)
+
+# -----------------------------
+# Application metrics
+# -----------------------------
+HTTP_REQUESTS = Counter("whispa_http_requests_total", "HTTP requests handled.", ("route", "method", "status"))
+HTTP_LATENCY = Histogram("whispa_http_request_duration_seconds", "HTTP request latency.", ("route",))
+DB_QUERY_LATENCY = Histogram("whispa_db_query_duration_seconds", "SQLite statement latency.", ("query",))
+DB_CONNECTIONS_OPENED = Counter("whispa_db_connections_opened_total", "SQLite connections opened.")
+HASH_LATENCY = Histogram("whispa_password_hash_duration_seconds", "Password hash latency.",
+                         ("scheme", "operation"))
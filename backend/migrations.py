@@ -0,0 +1,109 @@
+# backend/migrations.py
+# Versioned schema changes. The applied version lives in PRAGMA user_version,
+# so startup on a current database is a single pragma read, no DDL.
+# A step is an SQL statement, or a function of the connection for checks SQL
+# can't express.
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+def _require_unique_emails(conn):
+    # Rows whose emails differ only in case can't take the UNIQUE index. Which
+    # account keeps the address is for an admin to decide, not a migration.
+    clashes = conn.execute(
+        "SELECT group_concat(username || ' <' || email || '>', ', ') FROM users "
+        "GROUP BY email COLLATE NOCASE HAVING count(*) > 1").fetchall()
+    if clashes:
+        shown = "; ".join(row[0] for row in clashes[:10])
+        more = f" and {len(clashes) - 10} more" if len(clashes) > 10 else ""
+        raise MigrationError(f"{len(clashes)} email addresses are used by several accounts, differing only in "
+                             f"case: {shown}{more}. Change or remove all but one of each, then start again.")
+
+
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            salt TEXT NOT NULL
+        )
+        """,
+    ]),
+    (2, [
+        # Serves case-insensitive email lookups (login by email, availability)
+        "CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE)",
+    ]),
+    (3, [
+        # Per-user synced collections (music favorites, movie My List).
+        # Deletes stay as tombstones so clients can sync them as changes.
+        """
+        CREATE TABLE IF NOT EXISTS collection_items (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            collection TEXT NOT NULL,
+            item TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, collection, item)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_collection_items_version ON collection_items (user_id, collection, version)",
+        """
+        CREATE TABLE IF NOT EXISTS collection_versions (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            collection TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id, collection)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (4, [
+        # Append-only record of login attempts, written in batches by audit.py
+        """
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            id INTEGER PRIMARY KEY,
+            attempted_at REAL NOT NULL,
+            login TEXT NOT NULL,
+            address TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            reason TEXT NOT NULL
+        )
+        """,
+    ]),
+    (5, [
+        # Emails are unique the way they are looked up, case-insensitively:
+        # the NOCASE index becomes the UNIQUE constraint
+        _require_unique_emails,
+        "DROP INDEX IF EXISTS idx_users_email_nocase",
+        "CREATE UNIQUE INDEX idx_users_email_nocase ON users (email COLLATE NOCASE)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Re-read under the write lock: another process may have migrated first
+        current = schema_version(conn)
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+    return SCHEMA_VERSION
@@ -1,71 +1,254 @@
 # models.py
-import hashlib
+import logging
 import os
-from database import get_connection
+import queue
+import sqlite3
+import threading
+import time
+from bloom import BloomFilter
+from database import (get_connection, fold_email, rehash_password_if_needed, INSERT_USER,
+                      SELECT_LOGIN_BY_USERNAME, SELECT_LOGIN_BY_EMAIL, SELECT_USERNAME_EXISTS,
+                      SELECT_EMAIL_EXISTS, SELECT_IDENTITIES_AFTER)
+from passwords import hash_password, verify_password
+
+logger = logging.getLogger(__name__)
+
+# Group commit for signups: concurrent inserts share one transaction
+SIGNUP_MAX_BATCH = int(os.environ.get("WHISPA_SIGNUP_MAX_BATCH", "64"))
+SIGNUP_MAX_LATENCY = float(os.environ.get("WHISPA_SIGNUP_MAX_LATENCY", "0"))  # seconds
+
+# Bloom filters start with room for this many users (or twice the current count)
+AVAILABILITY_MIN_CAPACITY = 10000
+AVAILABILITY_ERROR_RATE = 0.01
+
+# -----------------------------
+# Availability (Bloom filter, then indexed lookup)
+# -----------------------------
+_filters_lock = threading.Lock()
+_username_filter = None
+_email_filter = None
+_rebuild_log = None  # while a rebuild reads the table: identities added meanwhile, to replay
+_filters_last_id = 0  # highest users.id the filters hold
+
+
+def rebuild_availability_filters():
+    global _username_filter, _email_filter, _rebuild_log, _filters_last_id
+    with _filters_lock:
+        if _rebuild_log is not None:
+            return  # another thread is already rebuilding
+        _rebuild_log = []
+    try:
+        rows = get_connection().execute(SELECT_IDENTITIES_AFTER, (0,)).fetchall()
+        capacity = max(AVAILABILITY_MIN_CAPACITY, 2 * len(rows))
+        usernames = BloomFilter(capacity, AVAILABILITY_ERROR_RATE)
+        emails = BloomFilter(capacity, AVAILABILITY_ERROR_RATE)
+        for _, username, email in rows:
+            usernames.add(username)
+            emails.add(fold_email(email))  # emails compare case-insensitively, as NOCASE does
+    except BaseException:
+        with _filters_lock:
+            _rebuild_log = None
+        raise
+    with _filters_lock:
+        # Signups committed after the snapshot was read
+        for username, email in _rebuild_log:
+            usernames.add(username)
+            emails.add(email)
+        _username_filter, _email_filter, _rebuild_log = usernames, emails, None
+        if rows:
+            _filters_last_id = max(_filters_last_id, rows[-1][0])
+
+
+def _catch_up():
+    # Adds the users created since the filters last looked, by whichever
+    # process (login.py signs up through database.create_user). A lookup on
+    # the primary key, nearly always empty. Returns whether it added any.
+    global _filters_last_id
+    rows = get_connection().execute(SELECT_IDENTITIES_AFTER, (_filters_last_id,)).fetchall()
+    if not rows:
+        return False
+    with _filters_lock:
+        for user_id, username, email in rows:
+            if user_id <= _filters_last_id:
+                continue  # another thread caught up with it first
+            email = fold_email(email)
+            _username_filter.add(username)
+            _email_filter.add(email)
+            if _rebuild_log is not None:
+                _rebuild_log.append((username, email))
+        _filters_last_id = max(_filters_last_id, rows[-1][0])
+        full = _rebuild_log is None and _username_filter.is_full()
+    if full:
+        rebuild_availability_filters()
+    return True
+
+
+def username_taken(username):
+    # A miss in the filter is trusted only once the filter has caught up with
+    # the table; a possible hit costs a lookup on the UNIQUE index
+    if username not in _username_filter:
+        if not _catch_up() or username not in _username_filter:
+            return False
+    return get_connection().execute(SELECT_USERNAME_EXISTS, (username,)).fetchone() is not None
+
+
+def email_taken(email):
+    if fold_email(email) not in _email_filter:
+        if not _catch_up() or fold_email(email) not in _email_filter:
+            return False
+    return get_connection().execute(SELECT_EMAIL_EXISTS, (email,)).fetchone() is not None
+
+
+def check_availability(username=None, email=None):
+    result = {}
+    if username:
+        result["username_available"] = not username_taken(username)
+    if email:
+        result["email_available"] = not email_taken(email)
+    return result
+
+
+rebuild_availability_filters()
 
 # -----------------------------
-# Generate hashed password
+# Signup write queue
 # -----------------------------
-def hash_password(password):
-    salt = os.urandom(16).hex()  # generate random salt
-    hashed = hashlib.sha256((password + salt).encode()).hexdigest()
-    return hashed, salt
-
-def verify_password(password, stored_hash, stored_salt):
-    hashed = hashlib.sha256((password + stored_salt).encode()).hexdigest()
-    return hashed == stored_hash
+class _PendingSignup:
+    def __init__(self, row):
+        self.row = row
+        self.result = None
+        self.done = threading.Event()
+
+
+class SignupWriter:
+    # Background writer that batches pending signups into one transaction.
+    # A commit takes whatever queued up while the previous one ran, at most
+    # max_batch rows, then waits up to max_latency for more. With the default
+    # of 0 it never waits: a lone signup is written right away and batches
+    # grow only under load.
+    def __init__(self, max_batch=SIGNUP_MAX_BATCH, max_latency=SIGNUP_MAX_LATENCY):
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max(0.0, max_latency)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, username, email, hashed, salt):
+        pending = _PendingSignup((username, email, hashed, salt))
+        self._ensure_started()
+        self._queue.put(pending)
+        pending.done.wait()
+        return pending.result
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="signup-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        conn = get_connection()
+        inserted = []
+        error = None
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for pending in batch:
+                    # A savepoint per row, so one duplicate doesn't abort the whole batch
+                    conn.execute("SAVEPOINT signup")
+                    try:
+                        conn.execute(INSERT_USER, pending.row)
+                        inserted.append(pending)
+                    except sqlite3.IntegrityError as e:
+                        conn.execute("ROLLBACK TO signup")
+                        if "UNIQUE constraint failed" in str(e):
+                            pending.result = (False, "Username or Email already taken.")
+                        else:
+                            pending.result = (False, str(e))
+                    conn.execute("RELEASE signup")
+        except Exception as e:
+            error = str(e)
+
+        for pending in inserted:
+            pending.result = (True, "User created successfully.") if error is None else (False, error)
+        for pending in batch:
+            if pending.result is None:
+                pending.result = (False, error)
+            pending.done.set()
+
+
+signup_writer = SignupWriter()
+
 # -----------------------------
 # Create a new user (FIXED)
 # -----------------------------
 def create_user(username, email, password): # FIX: Added 'email' to parameters
+    # Reject known duplicates before paying for a hash and a write transaction
+    if username_taken(username) or email_taken(email):
+        return False, "Username or Email already taken."
     hashed, salt = hash_password(password)
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute(
-            # FIX: Added 'email' to column list and value placeholders
-            "INSERT INTO users (username, email, password_hash, salt) VALUES (?, ?, ?, ?)",
-            (username, email, hashed, salt) # FIX: Added 'email' to values tuple
-        )
-        conn.commit()
-        return True, "User created successfully."
-    except Exception as e:
-        if "UNIQUE constraint failed" in str(e):
-            return False, "Username or Email already taken."
-        return False, str(e)
-    finally:
-        conn.close()
+    return signup_writer.submit(username, email, hashed, salt)
 
 # -----------------------------
 # Authenticate user
 # -----------------------------
-def authenticate(username, password):
+def authenticate_user(login, password):
+    # login may be a username or an email; returns (success, message, username)
     conn = get_connection()
-    cursor = conn.cursor()
     success = False
     message = "Login failed."
+    username = None
 
     try:
-        cursor.execute("SELECT password_hash, salt FROM users WHERE username = ?", (username,))
-        row = cursor.fetchone()
+        row = conn.execute(SELECT_LOGIN_BY_USERNAME, (login,)).fetchone()
+        if row is None and "@" in login:
+            row = conn.execute(SELECT_LOGIN_BY_EMAIL, (login,)).fetchone()
 
         if row is None:
             message = "User not found."
         else:
-            stored_hash, stored_salt = row
+            stored_username, stored_hash, stored_salt = row
 
             if verify_password(password, stored_hash, stored_salt):
                 success = True
                 message = "Login successful."
+                username = stored_username
             else:
                 message = "Incorrect password."
 
     except Exception as e:
         message = f"Database error during authentication: {e}"
 
-    finally:
-        # Guarantee connection closure
-        conn.close()
+    if success:
+        try:
+            rehash_password_if_needed(username, password, stored_hash)
+        except Exception as e:
+            # The login stands; the upgrade is tried again at the next one
+            logger.warning("Could not rehash the password of %s: %s", username, e)
+
+    return success, message, username
 
+def authenticate(login, password):
+    success, message, _ = authenticate_user(login, password)
     return success, message
@@ -0,0 +1,101 @@
+# backend/passwords.py
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+# Scheme and cost used for new hashes. Rows hashed with anything else are
+# upgraded at the user's next successful login (see needs_rehash).
+HASH_SCHEME = os.environ.get("WHISPA_HASH_SCHEME", "scrypt")
+SCRYPT_N = int(os.environ.get("WHISPA_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("WHISPA_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("WHISPA_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.environ.get("WHISPA_PBKDF2_ITERATIONS", "600000"))
+
+# hashlib's scrypt and pbkdf2 release the GIL, so a small thread pool runs
+# them in parallel while capping how many hashes burn CPU at once.
+HASH_WORKERS = int(os.environ.get("WHISPA_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hasher")
+
+# -----------------------------
+# Hashers
+# -----------------------------
+# Stored format: "<scheme>$<k=v,...>$<hex digest>".
+# Legacy rows hold a bare sha256 hex digest of password + salt.
+def _sha256(password, salt, params):
+    return hashlib.sha256((password + salt).encode()).hexdigest()
+
+def _scrypt(password, salt, params):
+    n, r, p = params["n"], params["r"], params["p"]
+    return hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024).hex()
+
+def _pbkdf2_sha256(password, salt, params):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), params["i"]).hex()
+
+HASHERS = {
+    "sha256": _sha256,
+    "scrypt": _scrypt,
+    "pbkdf2_sha256": _pbkdf2_sha256,
+}
+
+def default_params(scheme):
+    if scheme == "scrypt":
+        return {"n": SCRYPT_N, "r": SCRYPT_R, "p": SCRYPT_P}
+    if scheme == "pbkdf2_sha256":
+        return {"i": PBKDF2_ITERATIONS}
+    return {}
+
+def encode_hash(scheme, params, digest):
+    if scheme == "sha256":
+        return digest
+    encoded_params = ",".join(f"{key}={value}" for key, value in params.items())
+    return f"{scheme}${encoded_params}${digest}"
+
+def decode_hash(stored_hash):
+    if "$" not in stored_hash:
+        return "sha256", {}, stored_hash
+    scheme, encoded_params, digest = stored_hash.split("$", 2)
+    params = {}
+    for pair in filter(None, encoded_params.split(",")):
+        key, value = pair.split("=", 1)
+        params[key] = int(value)
+    return scheme, params, digest
+
+# -----------------------------
+# Public helpers
+# -----------------------------
+def compute_hash(password, salt, scheme=None, params=None):
+    # Runs on the calling thread; prefer hash_password/verify_password
+    scheme = scheme or HASH_SCHEME
+    params = default_params(scheme) if params is None else params
+    with metrics.Timer(metrics.HASH_LATENCY, scheme, "hash"):
+        digest = HASHERS[scheme](password, salt, params)
+    return encode_hash(scheme, params, digest)
+
+def hash_password(password, scheme=None, params=None):
+    salt = os.urandom(16).hex()  # generate random salt
+    hashed = _executor.submit(compute_hash, password, salt, scheme, params).result()
+    return hashed, salt
+
+def _verify(password, stored_hash, salt):
+    # A malformed stored hash (bad fields or parameters) matches no password
+    try:
+        scheme, params, digest = decode_hash(stored_hash)
+        hasher = HASHERS.get(scheme)
+        if hasher is None:
+            return False
+        with metrics.Timer(metrics.HASH_LATENCY, scheme, "verify"):
+            computed = hasher(password, salt, params)
+    except (ValueError, KeyError, TypeError):
+        return False
+    return hmac.compare_digest(computed, digest)
+
+def verify_password(password, stored_hash, salt):
+    return _executor.submit(_verify, password, stored_hash, salt).result()
+
+def needs_rehash(stored_hash):
+    scheme, params, _ = decode_hash(stored_hash)
+    return scheme != HASH_SCHEME or params != default_params(HASH_SCHEME)
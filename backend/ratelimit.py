@@ -0,0 +1,49 @@
+# backend/ratelimit.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Login limits: sustained attempts per second and burst size
+LOGIN_USER_RATE = float(os.environ.get("WHISPA_LOGIN_USER_RATE", "0.2"))
+LOGIN_USER_BURST = int(os.environ.get("WHISPA_LOGIN_USER_BURST", "5"))
+LOGIN_ADDRESS_RATE = float(os.environ.get("WHISPA_LOGIN_ADDRESS_RATE", "2"))
+LOGIN_ADDRESS_BURST = int(os.environ.get("WHISPA_LOGIN_ADDRESS_BURST", "20"))
+MAX_TRACKED_KEYS = 100000  # per limiter; least recently seen keys are forgotten first
+
+
+class TokenBucketLimiter:
+    # One bucket per key, refilled lazily on access. Memory is bounded by
+    # max_keys: a forgotten key simply starts again with a full bucket.
+    def __init__(self, rate, burst, max_keys=MAX_TRACKED_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            return False
+
+
+login_user_limiter = TokenBucketLimiter(LOGIN_USER_RATE, LOGIN_USER_BURST)
+login_address_limiter = TokenBucketLimiter(LOGIN_ADDRESS_RATE, LOGIN_ADDRESS_BURST)
+
+
+def allow_login(username, address):
+    # Address first, so a flooding client doesn't also drain the user's bucket
+    return login_address_limiter.allow(address) and login_user_limiter.allow(username.lower())
@@ -0,0 +1,218 @@
+# backend/sessions.py
+# Signed session tokens. The launcher and both players verify them locally
+# (HMAC + in-memory cache), so auth checks never touch users.db.
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SESSION_TTL = int(os.environ.get("WHISPA_SESSION_TTL", str(12 * 60 * 60)))  # seconds
+KEY_PATH = os.environ.get("WHISPA_SESSION_KEY", os.path.join(BASE_DIR, "session.key"))
+REVOKED_PATH = os.environ.get("WHISPA_REVOKED_SESSIONS", os.path.join(BASE_DIR, "revoked_sessions.txt"))
+
+CACHE_SIZE = 1024               # verified tokens kept in memory
+REVOCATION_CHECK_INTERVAL = 1.0  # seconds between checks of the revocation file
+REVOCATION_COMPACT_LINES = 256   # the file is rewritten without expired entries past this many lines
+SIGNATURE_BYTES = 16
+KEY_BYTES = 32
+
+_lock = threading.Lock()
+_key = None
+_cache = OrderedDict()  # token -> (username, expires, nonce)
+_revoked = {}           # nonce -> expires
+_revoked_mtime = None
+_revoked_lines = 0      # lines in the revocation file, expired ones included
+_revoked_checked = 0.0
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _to_base36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    text = ""
+    while number:
+        number, rem = divmod(number, 36)
+        text = digits[rem] + text
+    return text or "0"
+
+def _load_key():
+    # Shared by every Whispa process through a key file created on first use
+    global _key
+    if _key is None:
+        try:
+            with open(KEY_PATH, "rb") as f:
+                key = f.read()
+        except FileNotFoundError:
+            key = _create_key()
+        if len(key) != KEY_BYTES:
+            raise RuntimeError(f"{KEY_PATH} does not hold a {KEY_BYTES}-byte session key")
+        _key = key
+    return _key
+
+def _create_key():
+    # Written in full to a temporary file, then linked into place: no process
+    # ever reads a partial key, and if another one got there first its key wins
+    partial = f"{KEY_PATH}.{os.getpid()}.tmp"
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secrets.token_bytes(KEY_BYTES))
+    try:
+        os.link(partial, KEY_PATH)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(partial)
+    with open(KEY_PATH, "rb") as f:
+        return f.read()
+
+def _sign(payload):
+    digest = hmac.new(_load_key(), payload.encode(), hashlib.sha256).digest()
+    return _b64encode(digest[:SIGNATURE_BYTES])
+
+def _parse(token):
+    # Returns (username, expires, nonce) for a correctly signed token, else None
+    if not isinstance(token, str):
+        return None
+    try:
+        payload, signature = token.rsplit(".", 1)
+        if not hmac.compare_digest(_sign(payload), signature):
+            return None
+        encoded_user, expires, nonce = payload.split(".")
+        return _b64decode(encoded_user).decode(), int(expires, 36), nonce
+    except (ValueError, TypeError):  # TypeError: compare_digest refuses non-ASCII text
+        return None
+
+def _refresh_revocations(now):
+    # Re-reads the revocation file only when it changed, at most once per interval
+    global _revoked_mtime, _revoked_checked
+    if now - _revoked_checked < REVOCATION_CHECK_INTERVAL:
+        return
+    _revoked_checked = now
+    try:
+        mtime = os.stat(REVOKED_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return
+    if mtime == _revoked_mtime:
+        return
+    _revoked_mtime = mtime
+    _read_revocations(now)
+
+def _read_revocations(now):
+    global _revoked_lines
+    with open(REVOKED_PATH) as f:
+        lines = f.readlines()
+    _revoked_lines = len(lines)
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 2 and int(parts[1]) > now:
+            _revoked[parts[0]] = int(parts[1])
+    _prune_revocations(now)
+
+def _prune_revocations(now):
+    # An expired token fails verification anyway: its revocation can go
+    for nonce in [nonce for nonce, expires in _revoked.items() if expires <= now]:
+        del _revoked[nonce]
+
+@contextmanager
+def _revocations_locked():
+    # Appends and compaction hold this across processes, so a compaction never
+    # drops a line appended meanwhile. A separate lock file: compaction swaps
+    # in a new revocation file, and a lock on the old one would guard nothing.
+    with open(REVOKED_PATH + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # released when the file closes
+            yield
+            return
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _compact_revocations(now):
+    # Rewrites the file with only the live revocations; call with the file
+    # locked. Re-read first, for lines other processes appended since.
+    global _revoked_mtime, _revoked_lines
+    try:
+        _read_revocations(now)
+    except FileNotFoundError:
+        pass
+    partial = f"{REVOKED_PATH}.{os.getpid()}.tmp"
+    with open(partial, "w") as f:
+        f.writelines(f"{nonce} {expires}\n" for nonce, expires in _revoked.items())
+    os.replace(partial, REVOKED_PATH)
+    _revoked_lines = len(_revoked)
+    _revoked_mtime = os.stat(REVOKED_PATH).st_mtime_ns  # nothing new to read back
+
+# -----------------------------
+# Public API
+# -----------------------------
+def issue_token(username, ttl=SESSION_TTL):
+    expires = int(time.time()) + ttl
+    payload = f"{_b64encode(username.encode())}.{_to_base36(expires)}.{secrets.token_hex(6)}"
+    return f"{payload}.{_sign(payload)}"
+
+def verify_token(token):
+    # Returns the username for a valid, unexpired, unrevoked token, else None
+    if not token:
+        return None
+    now = time.time()
+    with _lock:
+        _refresh_revocations(now)
+        session = _cache.get(token)
+        if session is not None:
+            _cache.move_to_end(token)
+    if session is None:
+        session = _parse(token)
+        if session is None:
+            return None
+        with _lock:
+            _cache[token] = session
+            if len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    username, expires, nonce = session
+    if expires <= now or nonce in _revoked:
+        return None
+    return username
+
+def revoke_token(token):
+    global _revoked_lines
+    session = _parse(token) if token else None
+    if session is None:
+        return False
+    _, expires, nonce = session
+    now = time.time()
+    with _lock:
+        _cache.pop(token, None)
+        _refresh_revocations(now)  # counts the file's lines the first time
+        _prune_revocations(now)
+        if expires <= now:
+            return True  # expired already: nothing to record
+        _revoked[nonce] = expires
+        with _revocations_locked():
+            with open(REVOKED_PATH, "a") as f:
+                f.write(f"{nonce} {expires}\n")
+            _revoked_lines += 1
+            if _revoked_lines > max(REVOCATION_COMPACT_LINES, 2 * len(_revoked)):
+                _compact_revocations(now)
+    return True
@@ -0,0 +1,62 @@
+# backend/sync.py
+# Delta sync for per-user collections. Every write bumps the collection's
+# version counter; clients send the last version they saw and get back only
+# the rows changed after it, so a sync costs O(changes), not O(collection).
+from database import get_connection
+
+COLLECTIONS = ("favorites", "mylist")
+MAX_CHANGES_PER_SYNC = 1000
+
+SELECT_USER_ID = "SELECT id FROM users WHERE username = ?"
+SELECT_COLLECTION_VERSION = "SELECT version FROM collection_versions WHERE user_id = ? AND collection = ?"
+UPSERT_COLLECTION_VERSION = """
+    INSERT INTO collection_versions (user_id, collection, version) VALUES (?, ?, ?)
+    ON CONFLICT (user_id, collection) DO UPDATE SET version = excluded.version
+"""
+UPSERT_COLLECTION_ITEM = """
+    INSERT INTO collection_items (user_id, collection, item, version, deleted) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, collection, item) DO UPDATE SET version = excluded.version, deleted = excluded.deleted
+"""
+SELECT_CHANGES_SINCE = """
+    SELECT item, deleted, version FROM collection_items
+    WHERE user_id = ? AND collection = ? AND version > ? AND version != ?
+    ORDER BY version
+"""
+
+
+def valid_change(change):
+    # {"item": non-empty str, "deleted": bool (optional, default false)}
+    return (isinstance(change, dict) and isinstance(change.get("item"), str) and change["item"] != ""
+            and isinstance(change.get("deleted", False), bool))
+
+
+def sync_collection(username, collection, since, changes):
+    # changes: [{"item": str, "deleted": bool}, ...] made by the client since `since`,
+    # each one passing valid_change().
+    # Returns (new version, changes from other clients since `since`).
+    conn = get_connection()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")  # version bump and upserts land atomically
+        user = conn.execute(SELECT_USER_ID, (username,)).fetchone()
+        if user is None:
+            raise LookupError("User not found.")
+        user_id = user[0]
+        row = conn.execute(SELECT_COLLECTION_VERSION, (user_id, collection)).fetchone()
+        version = row[0] if row else 0
+        if since > version:
+            since = 0  # the client saw a version this database never had: resend everything
+
+        written = -1
+        if changes:
+            version += 1
+            written = version
+            conn.executemany(UPSERT_COLLECTION_ITEM, [
+                (user_id, collection, change["item"], version, 1 if change.get("deleted") else 0)
+                for change in changes
+            ])
+            conn.execute(UPSERT_COLLECTION_VERSION, (user_id, collection, version))
+
+        # Rows this request just wrote are the client's own changes; don't echo them
+        rows = conn.execute(SELECT_CHANGES_SINCE, (user_id, collection, since, written)).fetchall()
+
+    return version, [{"item": item, "deleted": bool(deleted)} for item, deleted, _ in rows]
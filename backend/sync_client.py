@@ -0,0 +1,149 @@
+# backend/sync_client.py
+# Client side of /sync/<collection>, shared by the music and movie players.
+# Keeps a local copy (plus unsent changes) on disk so nothing is lost on exit,
+# and exchanges only changes with the backend.
+import json
+import logging
+import os
+import threading
+import urllib.error
+import urllib.request
+
+API_URL = os.environ.get("WHISPA_API", "http://127.0.0.1:5000")
+STATE_DIR = os.environ.get("WHISPA_STATE_DIR", os.path.join(os.path.expanduser("~"), ".whispa"))
+SYNC_TIMEOUT = 5  # seconds
+MAX_CHANGES_PER_REQUEST = 1000  # the server refuses more (sync.MAX_CHANGES_PER_SYNC)
+
+logger = logging.getLogger(__name__)
+
+
+class SyncedCollection:
+    # Without a token/username it behaves as a plain in-memory collection
+    def __init__(self, collection, token=None, username=None, item_type=str):
+        self.collection = collection
+        self.token = token
+        self.item_type = item_type
+        self.version = 0
+        self._items = {}    # item -> None (a dict keeps insertion order)
+        self._pending = {}  # item as text -> deleted flag, not yet acknowledged by the server
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._path = None
+        if username:
+            self._path = os.path.join(STATE_DIR, f"{username}-{collection}.json")
+            self._load()
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._items
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._items))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def add(self, item):
+        with self._lock:
+            self._items[item] = None
+            self._pending[str(item)] = False
+            self._save()
+
+    def discard(self, item):
+        with self._lock:
+            self._items.pop(item, None)
+            self._pending[str(item)] = True
+            self._save()
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _load(self):
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.version = state.get("version", 0)
+        self._items = {self.item_type(item): None for item in state.get("items", [])}
+        self._pending = state.get("pending", {})
+
+    def _save(self):
+        if self._path is None:
+            return
+        os.makedirs(STATE_DIR, exist_ok=True)
+        state = {"version": self.version, "items": [str(item) for item in self._items], "pending": self._pending}
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path)
+
+    # -----------------------------
+    # Sync
+    # -----------------------------
+    def sync(self):
+        # Returns True when the server acknowledged all our changes; safe to call from any thread
+        if self.token is None or self._path is None:
+            return False
+        with self._sync_lock:
+            with self._lock:
+                pending = list(self._pending.items())
+            # No more per request than the server takes; each reply also brings
+            # what other clients changed since the previous one
+            for start in range(0, max(len(pending), 1), MAX_CHANGES_PER_REQUEST):
+                if not self._exchange(dict(pending[start:start + MAX_CHANGES_PER_REQUEST])):
+                    return False
+            return True
+
+    def _exchange(self, sent):
+        with self._lock:
+            since = self.version
+        body = json.dumps({
+            "since": since,
+            "changes": [{"item": item, "deleted": deleted} for item, deleted in sent.items()],
+        }).encode()
+        req = urllib.request.Request(f"{API_URL}/sync/{self.collection}", data=body, headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.token}",
+        })
+        try:
+            with urllib.request.urlopen(req, timeout=SYNC_TIMEOUT) as resp:
+                result = json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                return False  # the server's trouble: changes stay pending for the next sync
+            if e.code == 400:
+                # The server will never take these; kept, they would fail every sync after
+                logger.warning("Sync of %s refused %d changes, dropping them", self.collection, len(sent))
+                self._acknowledge(sent)
+            else:
+                logger.warning("Sync of %s refused: HTTP %d", self.collection, e.code)
+            return False
+        except (urllib.error.URLError, OSError, ValueError):
+            return False  # offline: changes stay pending for the next sync
+
+        with self._lock:
+            for change in result.get("changes", []):
+                if change["item"] in self._pending:
+                    continue  # changed locally again meanwhile; ours goes out next sync
+                item = self.item_type(change["item"])
+                if change["deleted"]:
+                    self._items.pop(item, None)
+                else:
+                    self._items[item] = None
+            self.version = result.get("version", self.version)
+            self._acknowledge(sent)
+        return True
+
+    def _acknowledge(self, sent):
+        # Done with the changes in `sent`, unless they changed again meanwhile
+        with self._lock:
+            for item, deleted in sent.items():
+                if self._pending.get(item) == deleted:
+                    del self._pending[item]
+            self._save()
+
+    def sync_in_background(self):
+        threading.Thread(target=self.sync, name=f"sync-{self.collection}", daemon=True).start()
@@ -0,0 +1,85 @@
+import queue
+import threading
+import time
+
+# Runs slow work (password hashing, database calls) off the Tk main thread.
+# Tk isn't thread-safe, so workers never touch widgets: results go into a
+# queue that the main thread drains from root.after.
+
+POLL_MS = 15
+
+class BackgroundRunner:
+    def __init__(self, root):
+        self.root = root
+        self.cancelled = False
+        self._results = queue.Queue()
+        self._running = 0
+        self._poll_id = None
+
+    @property
+    def busy(self):
+        return self._running > 0
+
+    def submit(self, work, on_done, on_error):
+        # work() runs on a worker thread; on_done(result) / on_error(exception) on the Tk thread
+        if self.cancelled:
+            return
+
+        def run():
+            try:
+                outcome = (True, work())
+            except Exception as e:
+                outcome = (False, e)
+            self._results.put((on_done, on_error, outcome))
+
+        self._running += 1
+        threading.Thread(target=run, name="ui-worker", daemon=True).start()
+        if self._poll_id is None:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                on_done, on_error, (ok, value) = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._running -= 1
+            if not self.cancelled:
+                (on_done if ok else on_error)(value)
+        if self._running and not self.cancelled:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def cancel(self):
+        # Window is closing: drop late results. Workers are daemon threads, so a
+        # hash still in progress doesn't keep the process alive.
+        self.cancelled = True
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+
+class StallMonitor:
+    # Schedules a tick every interval_ms and records how late each one fired,
+    # i.e. how long the event loop was unable to run callbacks
+    def __init__(self, root, interval_ms=5):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.delays = []
+        self._expected = None
+        self._after_id = None
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.delays.append(max(0.0, now - self._expected))
+        self._expected = now + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        return self.delays
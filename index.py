@@ -3,48 +3,50 @@ from tkinter import messagebox
 import subprocess
 import sys
 import os
+from backend.sessions import verify_token, revoke_token
 
 #helpers
 def resource_path(filename):
     return os.path.join(os.path.dirname(__file__), filename)
 
-def open_music_player():
+def open_music_player(token=None):
     folder = os.path.join(os.path.dirname(__file__), "Whispa Music Player", "frontend")
     path = os.path.join(folder, "player.py")
     if os.path.exists(path):
         try:
-            subprocess.Popen([sys.executable, path])
+            subprocess.Popen([sys.executable, path] + ([token] if token else []))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open Music Player:\n{e}")
     else:
         messagebox.showerror("Error", f"Music Player not found at:\n{path}")
 
-def open_movie_player():
+def open_movie_player(token=None):
     folder = os.path.join(os.path.dirname(__file__), "Whispa Movie Player")
     path = os.path.join(folder, "main.py")
     if os.path.exists(path):
         try:
-            subprocess.Popen([sys.executable, path])
+            subprocess.Popen([sys.executable, path] + ([token] if token else []))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open Movie Player:\n{e}")
     else:
         messagebox.showerror("Error", f"Movie Player not found at:\n{path}")
 
-def open_tetris():
+def open_tetris(token=None):
     folder = os.path.join(os.path.dirname(__file__), "Whispa Tetris")
     path = os.path.join(folder, "index.py")
     if os.path.exists(path):
         try:
-            subprocess.Popen([sys.executable, path])
+            subprocess.Popen([sys.executable, path] + ([token] if token else []))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open Tetris:\n{e}")
     else:
         messagebox.showerror("Error", f"Tetris not found at:\n{path}")
 
 class HomeWindow(tk.Tk):
-    def __init__(self, username=None):
+    def __init__(self, token=None):
         super().__init__()
-        self.username = username
+        self.token = token
+        self.username = verify_token(token)
         self.title("Whispa Home")
         self.geometry("500x400")
         self.configure(bg="#E8DEFF")
@@ -81,6 +83,14 @@ class HomeWindow(tk.Tk):
             fg="white"
         ).pack(pady=20)
 
+    def launch(self, opener):
+        # Re-check the session (local HMAC + cache) before every launch
+        if verify_token(self.token) is None:
+            messagebox.showerror("Session expired", "Please log in again.")
+            self.logout()
+            return
+        opener(self.token)
+
     def go_to_login(self):
         self.withdraw()  # Hide home window
         login_path = os.path.join(os.path.dirname(__file__), "login.py")
@@ -109,7 +119,7 @@ class HomeWindow(tk.Tk):
             font=("Segoe UI", 14),
             width=25,
             height=2,
-            command=open_music_player,
+            command=lambda: self.launch(open_music_player),
             bg="#6D33A7",
             fg="white"
         ).pack(pady=10)
@@ -120,7 +130,7 @@ class HomeWindow(tk.Tk):
             font=("Segoe UI", 14),
             width=25,
             height=2,
-            command=open_movie_player,
+            command=lambda: self.launch(open_movie_player),
             bg="#6D33A7",
             fg="white"
         ).pack(pady=10)
@@ -131,7 +141,7 @@ class HomeWindow(tk.Tk):
             font=("Segoe UI", 14),
             width=25,
             height=2,
-            command=open_tetris,
+            command=lambda: self.launch(open_tetris),
             bg="#6D33A7",
             fg="white"
         ).pack(pady=10)
@@ -160,14 +170,16 @@ class HomeWindow(tk.Tk):
         ).pack(pady=10)
 
     def logout(self):
+        revoke_token(self.token)
+        self.token = None
         self.username = None
         self.show_login_button()
 
 
 if __name__ == "__main__":
-    username = None
+    token = None
     if len(sys.argv) > 1:
-        username = sys.argv[1]
+        token = sys.argv[1]
 
-    app = HomeWindow(username)
+    app = HomeWindow(token)
     app.mainloop()
@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import messagebox
-from backend.database import get_user_by_username, create_user, verify_password
+from backend.database import get_user_by_login, create_user, verify_password, rehash_password_if_needed
+from backend.sessions import issue_token
+from background import BackgroundRunner
 import subprocess
 import sys
 import os
@@ -32,7 +34,42 @@ except Exception:
 
 card = tk.Frame(root, bg=CARD)
 card.place(relx=0.5, rely=0.5, anchor=tk.CENTER, width=460, height=400)
-tk.Label(card, text="Welcome to Whispa", font=("Segoe UI", 14, "bold"), fg=TEXT, bg=CARD).pack(pady=(12, 6))
+tk.Label(card, text="Welcome to Whispa", font=("Segoe UI", 14, "bold"), fg=TEXT, bg=CARD).pack(pady=(12, 0))
+status_label = tk.Label(card, text="", fg=ACCENT, bg=CARD)
+status_label.pack()
+
+#busy indicator while a worker thread checks credentials (hashing takes a while)
+runner = BackgroundRunner(root)
+action_buttons = []
+busy_after = None
+
+def animate_status(message, step=0):
+    global busy_after
+    status_label.config(text=message + "." * (step % 4))
+    busy_after = root.after(300, animate_status, message, step + 1)
+
+def set_busy(message):
+    for btn in action_buttons:
+        btn.config(state=tk.DISABLED)
+    root.config(cursor="watch")
+    animate_status(message)
+
+def set_idle():
+    global busy_after
+    if busy_after is not None:
+        root.after_cancel(busy_after)
+        busy_after = None
+    status_label.config(text="")
+    root.config(cursor="")
+    for btn in action_buttons:
+        btn.config(state=tk.NORMAL)
+
+def close_window():
+    # Closing mid-login drops the pending result instead of acting on it later
+    runner.cancel()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", close_window)
 
 # Pages dictionary
 pages = {}
@@ -56,8 +93,8 @@ pages["login"] = login_frame
 
 tk.Label(login_frame, text="Login", font=("Segoe UI", 12, "bold"), bg=CARD, fg=TEXT).pack(anchor="w", padx=6)
 
-# Username
-tk.Label(login_frame, text="Username", bg=CARD, fg=TEXT).pack(anchor="w", padx=6, pady=(8,0))
+# Username or email
+tk.Label(login_frame, text="Username or Email", bg=CARD, fg=TEXT).pack(anchor="w", padx=6, pady=(8,0))
 login_username = tk.Entry(login_frame, bd=1, relief=tk.FLAT)
 login_username.pack(fill="x", padx=6, ipady=6)
 
@@ -73,27 +110,48 @@ login_eye = tk.Button(pw_row, text="👁", bd=0, bg=CARD,
 login_eye.pack(side="left", padx=(6,0))
 
 # Login Action
+def check_login(login, password):
+    # Runs on a worker thread: database lookup and password hash, no widgets
+    user = get_user_by_login(login)
+    if not (user and verify_password(password, user[3], user[4])):
+        return None
+    username = user[1]  # the account name, also when logging in by email
+    rehash_password_if_needed(username, password, user[3])
+    return issue_token(username)
+
+def login_done(token):
+    set_idle()
+    if token is None:
+        messagebox.showerror("Error", "Invalid username or password!")
+        return
+    messagebox.showinfo("Success", "Login successful!")
+    close_window()  # Close login window
+    # Open index.py with a signed session token instead of the raw username
+    home_path = os.path.join(os.path.dirname(__file__), "index.py")
+    subprocess.Popen([sys.executable, home_path, token])
+
+def login_failed(error):
+    set_idle()
+    messagebox.showerror("Error", f"Could not log in: {error}")
+
 def do_login(event=None):
+    if runner.busy:
+        return
     username = login_username.get().strip()
     password = login_password.get().strip()
     if not username or not password:
-        messagebox.showerror("Error", "Please enter username and password")
+        messagebox.showerror("Error", "Please enter username (or email) and password")
         return
 
-    user = get_user_by_username(username)
-    if user and verify_password(password, user[3], user[4]):
-        messagebox.showinfo("Success", "Login successful!")
-        root.destroy()  # Close login window
-        # Open index.py with username
-        home_path = os.path.join(os.path.dirname(__file__), "index.py")
-        subprocess.Popen([sys.executable, home_path, username])
-    else:
-        messagebox.showerror("Error", "Invalid username or password!")
+    set_busy("Checking")
+    runner.submit(lambda: check_login(username, password), login_done, login_failed)
 
 # Buttons
 action_row = tk.Frame(login_frame, bg=CARD)
 action_row.pack(fill="x", padx=6, pady=(12,0))
-tk.Button(action_row, text="Login", bg=ACCENT, fg="white", bd=0, command=do_login).pack(side="left", fill="x", expand=True, ipady=8)
+login_button = tk.Button(action_row, text="Login", bg=ACCENT, fg="white", bd=0, command=do_login)
+login_button.pack(side="left", fill="x", expand=True, ipady=8)
+action_buttons.append(login_button)
 tk.Button(action_row, text="Go to Signup", bg="#FFFFFF", fg=ACCENT, bd=0,
           command=lambda: show_page("signup")).pack(side="left", padx=(8,0), ipady=8)
 
@@ -139,7 +197,22 @@ def valid_email(email):
     return re.match(r"[^@]+@[^@]+\.[^@]+", email)
 
 # Signup Action
+def signup_done(_):
+    set_idle()
+    messagebox.showinfo("Success", "Account created! Please log in.")
+    signup_username.delete(0, tk.END)
+    signup_email.delete(0, tk.END)
+    signup_password.delete(0, tk.END)
+    signup_confirm.delete(0, tk.END)
+    show_page("login")
+
+def signup_failed(error):
+    set_idle()
+    messagebox.showerror("Error", f"Could not create account: {error}")
+
 def do_signup(event=None):
+    if runner.busy:
+        return
     username = signup_username.get().strip()
     email = signup_email.get().strip()
     pw = signup_password.get().strip()
@@ -158,20 +231,14 @@ def do_signup(event=None):
         messagebox.showerror("Error", "Password must be at least 6 characters")
         return
 
-    try:
-        create_user(username, email, pw)
-        messagebox.showinfo("Success", "Account created! Please log in.")
-        signup_username.delete(0, tk.END)
-        signup_email.delete(0, tk.END)
-        signup_password.delete(0, tk.END)
-        signup_confirm.delete(0, tk.END)
-        show_page("login")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not create account: {e}")
+    set_busy("Creating account")
+    runner.submit(lambda: create_user(username, email, pw), signup_done, signup_failed)
 
 signup_row = tk.Frame(signup_frame, bg=CARD)
 signup_row.pack(fill="x", padx=6, pady=(12,0))
-tk.Button(signup_row, text="Create Account (Sign Up)", bg=ACCENT, fg="white", bd=0, command=do_signup).pack(side="left", fill="x", expand=True, ipady=8)
+signup_button = tk.Button(signup_row, text="Create Account (Sign Up)", bg=ACCENT, fg="white", bd=0, command=do_signup)
+signup_button.pack(side="left", fill="x", expand=True, ipady=8)
+action_buttons.append(signup_button)
 tk.Button(signup_row, text="Back to Login", bg="#FFFFFF", fg=ACCENT, bd=0,
           command=lambda: show_page("login")).pack(side="left", padx=(8,0), ipady=8)
 